@@ -1,60 +1,266 @@
 
-
 class NoIndice:
-    
+
     def __init__(self, chave, endereco_byte):
         self.chave = chave                       # A chave de acesso (ex: Código do Paciente)
         self.endereco_byte = endereco_byte       # O 'End' ou Offset no arquivo de dados
         self.esquerda = None
         self.direita = None
+        self.altura = 1                          # Altura da subárvore (balanceamento AVL)
 
 class ArvoreBinaria:
+    """
+    Índice em memória implementado como Árvore AVL (auto-balanceada).
+    Os códigos são gerados em sequência, então uma BST simples degeneraria
+    numa lista ligada; aqui a altura fica em O(log n) para qualquer ordem de
+    chegada das chaves. Inserção, busca e percurso são iterativos.
+    """
 
     def __init__(self):
         self.raiz = None
+        self.quantidade = 0
+
+    def __len__(self):
+        return self.quantidade
+
+    # --- AUXILIARES DE BALANCEAMENTO ---
+
+    @staticmethod
+    def _altura(no):
+        return no.altura if no else 0
+
+    def _atualizar_altura(self, no):
+        no.altura = 1 + max(self._altura(no.esquerda), self._altura(no.direita))
+
+    def _rotacionar_direita(self, no):
+        nova_raiz = no.esquerda
+        no.esquerda = nova_raiz.direita
+        nova_raiz.direita = no
+        self._atualizar_altura(no)
+        self._atualizar_altura(nova_raiz)
+        return nova_raiz
+
+    def _rotacionar_esquerda(self, no):
+        nova_raiz = no.direita
+        no.direita = nova_raiz.esquerda
+        nova_raiz.esquerda = no
+        self._atualizar_altura(no)
+        self._atualizar_altura(nova_raiz)
+        return nova_raiz
+
+    def _balancear(self, no):
+        """Recalcula a altura do nó e aplica a rotação necessária. Retorna a nova raiz da subárvore."""
+        self._atualizar_altura(no)
+        fator = self._altura(no.esquerda) - self._altura(no.direita)
+
+        if fator > 1:
+            if self._altura(no.esquerda.esquerda) < self._altura(no.esquerda.direita):
+                no.esquerda = self._rotacionar_esquerda(no.esquerda)   # Caso Esquerda-Direita
+            return self._rotacionar_direita(no)
+        if fator < -1:
+            if self._altura(no.direita.direita) < self._altura(no.direita.esquerda):
+                no.direita = self._rotacionar_direita(no.direita)      # Caso Direita-Esquerda
+            return self._rotacionar_esquerda(no)
+        return no
 
-  
-    def _inserir_recursivo(self, no_atual, chave, endereco_byte):
-        if no_atual is None:
-            return NoIndice(chave, endereco_byte)
-        
-       
-        if chave < no_atual.chave:
-            no_atual.esquerda = self._inserir_recursivo(no_atual.esquerda, chave, endereco_byte)
-        elif chave > no_atual.chave:
-            no_atual.direita = self._inserir_recursivo(no_atual.direita, chave, endereco_byte)
-        
-        return no_atual
+    # --- OPERAÇÕES DO ÍNDICE ---
 
     def inserir(self, chave, endereco_byte):
-        self.raiz = self._inserir_recursivo(self.raiz, chave, endereco_byte)
-
-  
-    def _buscar_recursivo(self, no_atual, chave):
-        if no_atual is None:
-            return None # Chave não encontrada
-        if no_atual.chave == chave:
-            return no_atual.endereco_byte   # Retorna o endereço (offset)
-        elif chave < no_atual.chave:
-            return self._buscar_recursivo(no_atual.esquerda, chave)
+        if self.raiz is None:
+            self.raiz = NoIndice(chave, endereco_byte)
+            self.quantidade = 1
+            return
+
+        # Desce até a posição de inserção guardando o caminho percorrido
+        caminho = []
+        no_atual = self.raiz
+        while no_atual is not None:
+            caminho.append(no_atual)
+            if chave < no_atual.chave:
+                no_atual = no_atual.esquerda
+            elif chave > no_atual.chave:
+                no_atual = no_atual.direita
+            else:
+                return # Chave duplicada: mantém o endereço já indexado
+
+        pai = caminho[-1]
+        if chave < pai.chave:
+            pai.esquerda = NoIndice(chave, endereco_byte)
         else:
-            return self._buscar_recursivo(no_atual.direita, chave)
+            pai.direita = NoIndice(chave, endereco_byte)
+        self.quantidade += 1
+
+        # Sobe pelo caminho rebalanceando e religando as subárvores
+        for i in range(len(caminho) - 1, -1, -1):
+            no = caminho[i]
+            altura_anterior = no.altura
+            nova_subraiz = self._balancear(no)
+
+            if i == 0:
+                self.raiz = nova_subraiz
+            else:
+                pai = caminho[i - 1]
+                if pai.esquerda is no:
+                    pai.esquerda = nova_subraiz
+                else:
+                    pai.direita = nova_subraiz
+
+            # Se a subárvore não mudou de altura, os ancestrais já estão balanceados
+            if nova_subraiz is no and no.altura == altura_anterior:
+                break
 
     def buscar(self, chave):
-        
-        return self._buscar_recursivo(self.raiz, chave)
-    
-    
-    def _percurso_recursivo_em_ordem(self, no_atual, lista_ordenada):
-      
-        if no_atual:
-            self._percurso_recursivo_em_ordem(no_atual.esquerda, lista_ordenada)
-            
-            lista_ordenada.append((no_atual.chave, no_atual.endereco_byte))
-            self._percurso_recursivo_em_ordem(no_atual.direita, lista_ordenada)
+        no_atual = self.raiz
+        while no_atual is not None:
+            if chave < no_atual.chave:
+                no_atual = no_atual.esquerda
+            elif chave > no_atual.chave:
+                no_atual = no_atual.direita
+            else:
+                return no_atual.endereco_byte   # Retorna o endereço (offset)
+        return None # Chave não encontrada
+
+    def remover(self, chave):
+        """
+        Remove a chave do índice (usado na exclusão lógica). Retorna True se existia.
+        A recursão é segura aqui: a altura da árvore AVL é O(log n).
+        """
+        removido = []
+
+        def remover_no(no, chave):
+            if no is None:
+                return None
+            if chave < no.chave:
+                no.esquerda = remover_no(no.esquerda, chave)
+            elif chave > no.chave:
+                no.direita = remover_no(no.direita, chave)
+            else:
+                removido.append(no)
+                if no.esquerda is None:
+                    return no.direita
+                if no.direita is None:
+                    return no.esquerda
+                # Dois filhos: o sucessor (menor da subárvore direita) assume a posição
+                sucessor = no.direita
+                while sucessor.esquerda is not None:
+                    sucessor = sucessor.esquerda
+                no.chave, no.endereco_byte = sucessor.chave, sucessor.endereco_byte
+                no.direita = remover_no_sucessor(no.direita)
+            return self._balancear(no)
+
+        def remover_no_sucessor(no):
+            if no.esquerda is None:
+                return no.direita
+            no.esquerda = remover_no_sucessor(no.esquerda)
+            return self._balancear(no)
+
+        self.raiz = remover_no(self.raiz, chave)
+        if removido:
+            self.quantidade -= 1
+            return True
+        return False
+
+    def iterar_em_ordem(self):
+        """Gera (chave, endereco) em ordem crescente; a pilha ocupa O(altura), não O(n)."""
+        pilha = []
+        no_atual = self.raiz
+
+        while pilha or no_atual is not None:
+            # Desce à esquerda empilhando os nós
+            while no_atual is not None:
+                pilha.append(no_atual)
+                no_atual = no_atual.esquerda
+
+            no_atual = pilha.pop()
+            yield no_atual.chave, no_atual.endereco_byte
+            no_atual = no_atual.direita
 
     def percurso_em_ordem(self):
-      
-        lista_ordenada = []
-        self._percurso_recursivo_em_ordem(self.raiz, lista_ordenada)
-        return lista_ordenada
\ No newline at end of file
+
+        return list(self.iterar_em_ordem())
+
+    def carregar_ordenados(self, pares_ordenados):
+        """
+        Substitui o conteúdo do índice por uma árvore perfeitamente balanceada
+        construída a partir de pares (chave, endereco) já ordenados e sem repetição.
+        Usado ao carregar o índice persistido em disco (O(n), sem rotações).
+        """
+        pares = list(pares_ordenados)
+
+        def construir(inicio, fim):
+            if inicio > fim:
+                return None
+            meio = (inicio + fim) // 2
+            chave, endereco_byte = pares[meio]
+            no = NoIndice(chave, endereco_byte)
+            no.esquerda = construir(inicio, meio - 1)
+            no.direita = construir(meio + 1, fim)
+            self._atualizar_altura(no)
+            return no
+
+        self.raiz = construir(0, len(pares) - 1)
+        self.quantidade = len(pares)
+
+
+class IndiceSecundario(ArvoreBinaria):
+    """
+    Índice secundário (chave não única): cada nó guarda a LISTA de endereços dos
+    registros com aquela chave, na ordem de inclusão. Mesma árvore AVL do
+    índice primário, com iteração ordenada por intervalo de chaves.
+    """
+
+    def inserir(self, chave, endereco_byte):
+        enderecos = super().buscar(chave)
+        if enderecos is None:
+            super().inserir(chave, [endereco_byte])
+        else:
+            enderecos.append(endereco_byte)
+
+    def remover_endereco(self, chave, endereco_byte):
+        """Remove um endereço da chave; a chave sai do índice quando fica sem endereços."""
+        enderecos = super().buscar(chave)
+        if enderecos is None or endereco_byte not in enderecos:
+            return False
+        enderecos.remove(endereco_byte)
+        if not enderecos:
+            self.remover(chave)
+        return True
+
+    def buscar(self, chave):
+        enderecos = super().buscar(chave)
+        return list(enderecos) if enderecos else []
+
+    def intervalo(self, inicio=None, fim=None):
+        """Gera (chave, [enderecos]) em ordem crescente para inicio <= chave <= fim (limites opcionais)."""
+        pilha = []
+        no_atual = self.raiz
+
+        while pilha or no_atual is not None:
+            while no_atual is not None:
+                if inicio is not None and no_atual.chave < inicio:
+                    no_atual = no_atual.direita # Subárvore esquerda inteira fica antes do início
+                else:
+                    pilha.append(no_atual)
+                    no_atual = no_atual.esquerda
+
+            if not pilha:
+                return
+            no_atual = pilha.pop()
+            if fim is not None and no_atual.chave > fim:
+                return
+            yield no_atual.chave, list(no_atual.endereco_byte)
+            no_atual = no_atual.direita
+
+    def pares_ordenados(self):
+        """Lista achatada [(chave, endereco), ...] ordenada pela chave (formato do arquivo .idx)."""
+        return [(chave, endereco) for chave, enderecos in self.intervalo() for endereco in enderecos]
+
+    def carregar_pares(self, pares_ordenados):
+        """Reconstrói o índice a partir da lista achatada gravada por pares_ordenados()."""
+        agrupados = []
+        for chave, endereco in pares_ordenados:
+            if agrupados and agrupados[-1][0] == chave:
+                agrupados[-1][1].append(endereco)
+            else:
+                agrupados.append((chave, [endereco]))
+        self.carregar_ordenados(agrupados)
@@ -1,79 +1,631 @@
 
 
 import os 
+import threading
+from contextlib import contextmanager, nullcontext
+from operator import itemgetter
 
 import ArvoreBinaria.persistencia as persistencia_mod
+import ArvoreBinaria.armazenamento_binario as binario_mod
 import ArvoreBinaria.ArvoreBinaria as arvore_mod
+import ArvoreBinaria.cache as cache_mod
+import ArvoreBinaria.concorrencia as concorrencia_mod
 
 class BaseDados:
-   
+
+    # Tipo da chave primária (primeiro campo do registro). Entidades com chave composta usam str.
+    TIPO_CHAVE = int
+
+    # Mantém o arquivo de dados aberto durante a vida do DAO, com cache de páginas para leituras pontuais
+    MANTER_ARQUIVO_ABERTO = True
+    PAGINAS_CACHE = 256
+
+    # Motor de armazenamento binário (registros de tamanho fixo, arquivo .dat).
+    # Cada entidade declara seu LAYOUT_BINARIO e opta pelo formato com FORMATO_BINARIO = True.
+    LAYOUT_BINARIO = None
+    FORMATO_BINARIO = False
+
+    # Compactação automática: quando a fração de bytes mortos (registros excluídos)
+    # passa de LIMIAR_COMPACTACAO e há pelo menos MINIMO_BYTES_COMPACTACAO a recuperar.
+    # None desativa o disparo automático (compactar() continua disponível).
+    LIMIAR_COMPACTACAO = None
+    MINIMO_BYTES_COMPACTACAO = 64 * 1024
+
+    # Em chaves repetidas na Área de Dados, indexa a última ocorrência (registros regravados por append)
+    DUPLICADAS_MANTER_ULTIMA = False
+
+    # Cache de registros desserializados (0 desativa). Indicado para tabelas pequenas e
+    # de leitura frequente (Cidades, Especialidades, Exames). Política: 'lru' ou 'fifo'.
+    TAMANHO_CACHE = 0
+    POLITICA_CACHE = 'lru'
+
     def __init__(self, nome_entidade):
         self.nome_entidade = nome_entidade
-        self.gerenciador_arquivo = persistencia_mod.GerenciadorArquivo(f'{nome_entidade}.txt')
-        self.indice = arvore_mod.ArvoreBinaria()
-        self._carregar_indice() # CRÍTICO: Carrega o índice ao iniciar cada DAO
+        if self.FORMATO_BINARIO:
+            self.gerenciador_arquivo = binario_mod.GerenciadorArquivoBinario(
+                f'{nome_entidade}.dat',
+                binario_mod.LayoutRegistro(self.LAYOUT_BINARIO),
+                manter_aberto=self.MANTER_ARQUIVO_ABERTO,
+                max_paginas_cache=self.PAGINAS_CACHE,
+            )
+        else:
+            self.gerenciador_arquivo = persistencia_mod.GerenciadorArquivo(
+                f'{nome_entidade}.txt',
+                manter_aberto=self.MANTER_ARQUIVO_ABERTO,
+                max_paginas_cache=self.PAGINAS_CACHE,
+            )
+        self.arquivo_indice = persistencia_mod.ArquivoIndice(self.gerenciador_arquivo.nome_arquivo)
+        self.cache = cache_mod.CacheRegistros(self.TAMANHO_CACHE, self.POLITICA_CACHE, nome_entidade)
+        self._indice = arvore_mod.ArvoreBinaria()
+        # Índices secundários (não únicos): nome -> função(campos) que extrai a chave
+        self._extratores_secundarios = self._definir_indices_secundarios()
+        self._indices_secundarios = {nome: arvore_mod.IndiceSecundario() for nome in self._extratores_secundarios}
+        self.bytes_mortos = 0 # Bytes ocupados por registros excluídos/obsoletos na Área de Dados
+        self._indice_alterado = False
+        self.journal = None
+        # Leituras concorrentes, um escritor por vez. Ordem das travas: journal -> tabela -> índice -> arquivo
+        self.trava = concorrencia_mod.TravaLeituraEscrita()
+        self._geracao = 0 # Muda quando os endereços deixam de valer (compactação, rollback)
+        self._leituras_abertas = 0 # Leituras por endereço (ler_enderecos) em andamento
+        # O índice é carregado no primeiro acesso (ou por garantir_indice(), ex: numa thread de fundo)
+        self._trava_indice = threading.RLock()
+        self._indice_carregado = False
+        self._carregando_indice = False
+
+    # --- CARGA SOB DEMANDA DO ÍNDICE ---
+
+    @property
+    def indice(self):
+        if not self._indice_carregado:
+            self.garantir_indice()
+        return self._indice
+
+    @indice.setter
+    def indice(self, indice):
+        self._indice = indice
+
+    @property
+    def indices_secundarios(self):
+        if not self._indice_carregado:
+            self.garantir_indice()
+        return self._indices_secundarios
+
+    @indices_secundarios.setter
+    def indices_secundarios(self, indices):
+        self._indices_secundarios = indices
+
+    def indice_carregado(self):
+        return self._indice_carregado
+
+    def garantir_indice(self):
+        """
+        Carrega os índices (do .idx ou varrendo a Área de Dados) se ainda não foram carregados.
+        Outras threads que precisarem do índice esperam a carga terminar.
+        """
+        with self._trava_indice:
+            if self._indice_carregado or self._carregando_indice:
+                return # Já carregado, ou acesso da própria carga em andamento
+            self._carregando_indice = True
+            try:
+                self._carregar_indice()
+            finally:
+                self._carregando_indice = False
+            self._indice_carregado = True
 
     def _carregar_indice(self):
+        # 1. Tenta o índice persistido (.idx), válido apenas se o arquivo de dados não mudou
+        conteudo = self.arquivo_indice.carregar()
+        secoes_esperadas = ['primario'] + [f'sec:{nome}' for nome in self.indices_secundarios]
+        if conteudo is not None and all(secao in conteudo[0] for secao in secoes_esperadas):
+            secoes, metadados = conteudo
+            self.indice.carregar_ordenados(secoes['primario'])
+            for nome, indice_secundario in self.indices_secundarios.items():
+                indice_secundario.carregar_pares(secoes[f'sec:{nome}'])
+            self.bytes_mortos = metadados.get('bytes_mortos', 0)
+            return
+
+        # 2. Índice ausente ou obsoleto: varre a Área de Dados e grava um novo .idx
+        self._reconstruir_indice()
+        # Sem a trava da tabela: a carga pode acontecer dentro de uma leitura
+        self._gravar_indice()
+
+    def _reconstruir_indice(self):
+        with self._trava_indice:
+            carregando, self._carregando_indice = self._carregando_indice, True
+            try:
+                self._reconstruir_indice_travado()
+            finally:
+                self._carregando_indice = carregando
+            self._indice_carregado = True
+
+    def _reconstruir_indice_travado(self):
+        self.indice = arvore_mod.ArvoreBinaria()
+        self.indices_secundarios = {nome: arvore_mod.IndiceSecundario() for nome in self._extratores_secundarios}
+        bytes_indexados = 0
+        for endereco, registro, tamanho in self.gerenciador_arquivo.iterar_com_enderecos():
+            campos = self._separar_campos(registro)
+            try:
+                # A chave (código) é sempre o primeiro campo
+                chave = self.TIPO_CHAVE(campos[0])
+            except ValueError:
+                # Ignora linhas inválidas se o primeiro campo não for do tipo da chave
+                continue
+            endereco_anterior = self.indice.buscar(chave)
+            if endereco_anterior is None:
+                self.indice.inserir(chave, endereco)
+                self._indexar_secundarios(campos, endereco)
+                bytes_indexados += tamanho
+            elif self.DUPLICADAS_MANTER_ULTIMA:
+                bytes_indexados -= self.gerenciador_arquivo.tamanho_registro(endereco_anterior)
+                self._desindexar_secundarios(endereco_anterior)
+                self.indice.remover(chave)
+                self.indice.inserir(chave, endereco)
+                self._indexar_secundarios(campos, endereco)
+                bytes_indexados += tamanho
+
+        # Tudo que não está indexado (excluídos, duplicados, linhas inválidas) é espaço recuperável
+        self.bytes_mortos = max(self.gerenciador_arquivo.tamanho_arquivo() - bytes_indexados, 0)
+
+    def _indexar_lote(self, novos, reconstruir=None):
+        """
+        Indexa de uma vez registros recém-gravados, dados como (chave, endereco, campos).
+        Lotes grandes em relação à tabela são intercalados com os pares atuais e a árvore é
+        reconstruída já balanceada (ordenação + carregar_ordenados, sem rotações); lotes
+        pequenos são inseridos um a um. As chaves precisam ser novas (não indexadas).
+        """
+        with self.trava.escrita():
+            self._indexar_lote_travado(novos, reconstruir)
+
+    def _indexar_lote_travado(self, novos, reconstruir):
+        if reconstruir is None:
+            reconstruir = len(novos) * 4 > len(self.indice)
+
+        if not reconstruir:
+            for chave, endereco, campos in novos:
+                self.indice.inserir(chave, endereco)
+                self._indexar_secundarios(campos, endereco)
+                self.cache.invalidar(chave)
+            self._indice_alterado = True
+            return
+
+        pares = self.indice.percurso_em_ordem()
+        pares_secundarios = {nome: indice.pares_ordenados() for nome, indice in self.indices_secundarios.items()}
+        for chave, endereco, campos in novos:
+            pares.append((chave, endereco))
+            for nome, extrator in self._extratores_secundarios.items():
+                pares_secundarios[nome].append((extrator(campos), endereco))
+
+        # Ordenação estável: numa chave secundária os endereços antigos continuam antes dos novos
+        pares.sort(key=itemgetter(0))
+        self.indice.carregar_ordenados(pares)
+        for nome, pares_indice in pares_secundarios.items():
+            pares_indice.sort(key=itemgetter(0))
+            self.indices_secundarios[nome].carregar_pares(pares_indice)
+        self.cache.invalidar()
+        self._indice_alterado = True
+
+    def indexar_a_partir_de(self, endereco_inicial):
+        """
+        Indexa numa única passada os registros acrescentados à Área de Dados a partir de
+        endereco_inicial (ex: depois de uma importação em massa com gravar_lote).
+        Retorna a quantidade de registros indexados.
+        """
+        def novos():
+            for endereco, registro, _ in self.gerenciador_arquivo.iterar_com_enderecos(endereco_inicial):
+                campos = self._separar_campos(registro)
+                try:
+                    yield self.TIPO_CHAVE(campos[0]), endereco, campos
+                except ValueError:
+                    continue # Linha inválida: fica fora do índice, como em _reconstruir_indice
+
+        with self.trava.escrita():
+            quantidade_anterior = len(self.indice)
+            self._indexar_lote(novos(), reconstruir=True)
+            return len(self.indice) - quantidade_anterior
+
+    # --- JOURNAL (WRITE-AHEAD LOG) ---
+
+    def definir_journal(self, journal):
+        """Liga a Área de Dados ao journal: as escritas passam a ser registradas antes de aplicadas."""
+        self.journal = journal
+        self.gerenciador_arquivo.journal = journal
+        journal.ao_desfazer(self.gerenciador_arquivo.nome_arquivo, self._apos_desfazer)
+
+    def transacao(self):
+        """
+        Unidade atômica de escritas (em uma ou várias tabelas ligadas ao mesmo journal).
+        Sem journal, o bloco executa normalmente, sem garantia de atomicidade.
+        """
+        return self.journal.transacao() if self.journal is not None else nullcontext()
+
+    def _exigir_journal(self):
+        """Para operações que prometem desfazer tudo numa falha: sem journal não há o que desfazer."""
+        if self.journal is None:
+            raise RuntimeError(f"{self.nome_entidade}: operação atômica sem journal (ligue-o com definir_journal).")
+
+    @contextmanager
+    def _escrita(self):
+        """
+        Transação + trava de escrita da tabela, nessa ordem (a mesma em todas as
+        tabelas, o que evita deadlock entre escritores de tabelas diferentes).
+        Use em operações de leitura-verificação-escrita (ex: checar vaga e gravar).
+        """
+        with self.transacao():
+            with self.trava.escrita():
+                yield
+
+    def _apos_desfazer(self):
+        # O rollback restaurou bytes e truncou anexos: descritor, caches e índices em memória ficaram obsoletos
+        with self.trava.escrita():
+            self.gerenciador_arquivo.fechar()
+            self.cache.invalidar()
+            self._reconstruir_indice()
+            self._geracao += 1
+            self._indice_alterado = True
+
+    @staticmethod
+    def _separar_campos(registro):
+        """Campos do registro lido do disco: a linha texto é separada por '|'; o formato binário já vem em tupla."""
+        if isinstance(registro, tuple):
+            return registro
+        return registro.split('|')
+
+    # --- ÍNDICES SECUNDÁRIOS ---
+
+    def _definir_indices_secundarios(self):
+        """
+        Sobrescrito pelas entidades que precisam de índices secundários.
+        Retorna {nome: funcao(campos) -> chave}; os campos são os do registro em disco.
+        """
+        return {}
+
+    def _indexar_secundarios(self, campos, endereco):
+        for nome, extrator in self._extratores_secundarios.items():
+            self.indices_secundarios[nome].inserir(extrator(campos), endereco)
+
+    def _desindexar_secundarios(self, endereco, registro=None):
+        if not self.indices_secundarios:
+            return
+        if registro is None:
+            registro = self.gerenciador_arquivo.ler_registro_por_endereco(endereco)
+            if registro is None:
+                return
+        campos = self._separar_campos(registro)
+        for nome, extrator in self._extratores_secundarios.items():
+            self.indices_secundarios[nome].remover_endereco(extrator(campos), endereco)
+
+    def enderecos_por_indice(self, nome_indice, inicio=None, fim=None):
+        """Endereços dos registros com inicio <= chave secundária <= fim, em ordem de chave (cópia)."""
+        with self.trava.leitura():
+            return [endereco
+                    for _, enderecos in self.indices_secundarios[nome_indice].intervalo(inicio, fim)
+                    for endereco in enderecos]
+
+    def iterar_por_indice(self, nome_indice, inicio=None, fim=None):
+        """Gera os registros (como lidos do disco) do intervalo de chaves do índice secundário."""
+        with self.trava.leitura():
+            geracao = self._geracao
+            enderecos = self.enderecos_por_indice(nome_indice, inicio, fim)
+        return self.ler_enderecos(enderecos, geracao)
+
+    # --- LEITURA CONCORRENTE ---
+
+    def existe(self, chave):
+        with self.trava.leitura():
+            return self.indice.buscar(chave) is not None
+
+    def pares_em_ordem(self):
+        """Cópia dos pares (chave, endereço) do índice primário, em ordem de chave."""
+        with self.trava.leitura():
+            return self.indice.percurso_em_ordem()
+
+    def ler_enderecos(self, enderecos, geracao=None):
+        """
+        Gera os registros dos endereços (tirados de pares_em_ordem / enderecos_por_indice).
+        A trava de leitura é mantida só durante cada leitura, não entre os yields, então
+        escritores não esperam o consumidor. Registros excluídos no meio do caminho são
+        pulados. Enquanto a leitura está aberta a compactação automática é adiada; se a
+        tabela mesmo assim for compactada (compactar() explícito ou rollback, os endereços
+        mudam), levanta RuntimeError. geracao: o _geracao lido junto com os endereços.
+        """
+        if geracao is None:
+            geracao = self._geracao
+        with self._trava_indice:
+            self._leituras_abertas += 1
         try:
-            # Acessa o arquivo para varrer linha por linha
-            with open(self.gerenciador_arquivo.nome_arquivo, 'r', encoding='utf-8') as f:
-                endereco_atual = 0
-                while True:
-                    #  Registra o offset ANTES de ler a linha
-                    endereco_atual = f.tell() 
-                    linha = f.readline() 
-                    
-                    if not linha:
-                        break # Fim do arquivo
-                    
-                    registro = linha.strip()
-                    # Ignora registros logicamente excluídos (começados por '*')
-                    if registro and not registro.startswith('*'):
-                        
-                        try:
-                            # A chave (código) é sempre o primeiro campo
-                            chave = registro.split('|')[0]
-                            # Tenta converter para int. Se a chave for string, remove o int()
-                            chave = int(chave) 
-                            self.indice.inserir(chave, endereco_atual)
-                        except ValueError:
-                            # Ignora linhas inválidas se o primeiro campo não for numérico
-                            pass 
-
-        except FileNotFoundError:
-            pass # O arquivo será criado na primeira inclusão
+            for endereco in enderecos:
+                with self.trava.leitura():
+                    if self._geracao != geracao:
+                        raise RuntimeError(f"A tabela {self.nome_entidade} foi compactada durante a leitura.")
+                    registro = self.gerenciador_arquivo.ler_registro_por_endereco(endereco)
+                if registro is not None:
+                    yield registro
+        finally:
+            with self._trava_indice:
+                self._leituras_abertas -= 1
+
+    def verificar_consistencia(self):
+        """
+        Confere índices x Área de Dados (sob a trava de leitura, numa visão estável):
+        cada chave do índice primário aponta para um registro ativo com a mesma chave,
+        os índices secundários apontam para os mesmos endereços com as chaves certas e
+        toda chave ativa no arquivo está indexada. Retorna a lista de problemas ([] = ok).
+        """
+        problemas = []
+        with self.trava.leitura():
+            enderecos_primario = set()
+            for chave, endereco in self.indice.iterar_em_ordem():
+                enderecos_primario.add(endereco)
+                registro = self.gerenciador_arquivo.ler_registro_por_endereco(endereco)
+                if registro is None:
+                    problemas.append(f"{self.nome_entidade}: chave {chave} aponta para {endereco}, sem registro ativo.")
+                    continue
+                campos = self._separar_campos(registro)
+                if self.TIPO_CHAVE(campos[0]) != chave:
+                    problemas.append(f"{self.nome_entidade}: chave {chave} aponta para o registro de {campos[0]}.")
+
+            for nome, indice_secundario in self.indices_secundarios.items():
+                extrator = self._extratores_secundarios[nome]
+                enderecos_secundario = set()
+                for chave, endereco in indice_secundario.pares_ordenados():
+                    enderecos_secundario.add(endereco)
+                    registro = self.gerenciador_arquivo.ler_registro_por_endereco(endereco)
+                    if registro is None or extrator(self._separar_campos(registro)) != chave:
+                        problemas.append(f"{self.nome_entidade}: índice '{nome}' tem {chave!r} -> {endereco} inválido.")
+                if enderecos_secundario != enderecos_primario:
+                    problemas.append(f"{self.nome_entidade}: índice '{nome}' cobre {len(enderecos_secundario)} "
+                                     f"endereços, o primário {len(enderecos_primario)}.")
+
+            chaves_ativas = set()
+            for registro in self.gerenciador_arquivo.iterar_registros():
+                try:
+                    chaves_ativas.add(self.TIPO_CHAVE(self._separar_campos(registro)[0]))
+                except ValueError:
+                    continue
+            nao_indexadas = [chave for chave in chaves_ativas if self.indice.buscar(chave) is None]
+            if nao_indexadas:
+                problemas.append(f"{self.nome_entidade}: {len(nao_indexadas)} registros ativos fora do índice "
+                                 f"(ex: {sorted(nao_indexadas)[:5]}).")
+            if len(chaves_ativas) != len(self.indice):
+                problemas.append(f"{self.nome_entidade}: {len(chaves_ativas)} chaves ativas no arquivo, "
+                                 f"{len(self.indice)} no índice.")
+        return problemas
+
+    def salvar_indice(self):
+        """Grava o índice atual no arquivo .idx (chamado ao reconstruir e ao fechar o DAO)."""
+        with self.trava.escrita():
+            if self._indice_carregado:
+                self._gravar_indice()
+
+    def _gravar_indice(self):
+        metadados = {'bytes_mortos': self.bytes_mortos}
+        secoes = {'primario': self.indice.percurso_em_ordem()}
+        for nome, indice_secundario in self.indices_secundarios.items():
+            secoes[f'sec:{nome}'] = indice_secundario.pares_ordenados()
+        if self.arquivo_indice.salvar(secoes, metadados):
+            self._indice_alterado = False
+
+    def fechar(self):
+        """Persiste o índice se houve alterações e libera o descritor do arquivo de dados."""
+        with self.trava.escrita():
+            if self._indice_alterado:
+                self.salvar_indice()
+            self.gerenciador_arquivo.fechar()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, rastreio):
+        self.fechar()
+        return False
 
     def incluir(self, registro_dados, chave):
-    
-        endereco = self.gerenciador_arquivo.gravar_registro(registro_dados)
-     
-        self.indice.inserir(chave, endereco)
-        return True
+        """Grava e indexa o registro. Retorna False se a chave já existe (verificado sob a trava)."""
+        with self._escrita():
+            if self.indice.buscar(chave) is not None:
+                return False
+
+            endereco = self.gerenciador_arquivo.gravar_registro(registro_dados)
+         
+            self.indice.inserir(chave, endereco)
+            if self.indices_secundarios:
+                self._indexar_secundarios(self._separar_campos(registro_dados), endereco)
+            self.cache.invalidar(chave)
+            self._indice_alterado = True
+            return True
+
+    def incluir_lote(self, itens):
+        """
+        Inclui vários registros com uma única gravação (gravar_lote) e indexa todos numa passada.
+        itens: [(registro_dados, chave), ...]. Retorna [(chave, sucesso, mensagem), ...] na ordem
+        dos itens; chaves já existentes ou repetidas no lote são rejeitadas sem interromper as demais.
+        """
+        with self._escrita():
+            resultados = []
+            aceitos = []
+            chaves_lote = set()
+            for registro_dados, chave in itens:
+                if chave in chaves_lote or self.indice.buscar(chave) is not None:
+                    resultados.append((chave, False, f"Código {chave} já existe."))
+                    continue
+                erro = self.gerenciador_arquivo.validar_registro(registro_dados)
+                if erro:
+                    resultados.append((chave, False, erro))
+                    continue
+                chaves_lote.add(chave)
+                aceitos.append((registro_dados, chave))
+                resultados.append((chave, True, "Incluído."))
+
+            if aceitos:
+                enderecos = self.gerenciador_arquivo.gravar_lote([registro for registro, _ in aceitos])
+                self._indexar_lote([
+                    (chave, endereco, self._separar_campos(registro))
+                    for (registro, chave), endereco in zip(aceitos, enderecos)
+                ])
+            return resultados
+
+    def _incluir_lote_validado(self, rotulo, linhas, formatar, validar=None):
+        """
+        Base dos incluir_*_lote das entidades. Cada linha é uma tupla de campos com o código
+        primeiro; validar(linha) retorna a mensagem de erro (ou None) e formatar(linha) o registro.
+        Linhas rejeitadas ficam fora da gravação. Retorna [(codigo, sucesso, mensagem), ...].
+        """
+        linhas = list(linhas)
+        resultados = [None] * len(linhas)
+        itens, posicoes = [], []
+        for posicao, linha in enumerate(linhas):
+            erro = validar(linha) if validar else None
+            if erro:
+                resultados[posicao] = (linha[0], False, erro)
+                continue
+            itens.append((formatar(linha), linha[0]))
+            posicoes.append(posicao)
+
+        for posicao, resultado in zip(posicoes, self.incluir_lote(itens)):
+            resultados[posicao] = resultado
+
+        incluidos = 0
+        for codigo, sucesso, mensagem in resultados:
+            if sucesso:
+                incluidos += 1
+            else:
+                print(f"ERRO: {rotulo} {codigo}: {mensagem}")
+        print(f"SUCESSO: {incluidos} de {len(resultados)} registros de {rotulo} incluídos em lote.")
+        return resultados
 
     def buscar_por_chave(self, chave):
     
-        endereco = self.indice.buscar(chave)
-        
-        if endereco is None:
-            return None 
-        
-      
-        return self.gerenciador_arquivo.ler_registro_por_endereco(endereco)
+        with self.trava.leitura():
+            endereco = self.indice.buscar(chave)
+            
+            if endereco is None:
+                return None 
+            
+          
+            return self.gerenciador_arquivo.ler_registro_por_endereco(endereco)
+
+    def atualizar_por_chave(self, chave, registro_dados):
+        """
+        Sobrescreve o registro da chave no próprio lugar (mesmo endereço, sem crescer o arquivo).
+        Retorna False se a chave não existe ou se o novo registro não cabe no espaço do atual.
+        """
+        with self._escrita():
+            endereco = self.indice.buscar(chave)
+            if endereco is None:
+                return False
+            erro = self.gerenciador_arquivo.validar_registro(registro_dados)
+            if erro:
+                print(f"ERRO: Registro {chave} de {self.nome_entidade} não atualizado: {erro}")
+                return False
+            registro_anterior = self.gerenciador_arquivo.ler_registro_por_endereco(endereco) if self.indices_secundarios else None
+            if self.gerenciador_arquivo.sobrescrever_registro(endereco, registro_dados):
+                if self.indices_secundarios:
+                    self._desindexar_secundarios(endereco, registro_anterior)
+                    self._indexar_secundarios(self._separar_campos(registro_dados), endereco)
+                self.cache.invalidar(chave)
+                self._indice_alterado = True # O arquivo de dados mudou: o .idx precisa ser recarimbado
+                return True
+            return False
 
     def excluir_por_chave(self, chave):
     
-        endereco = self.indice.buscar(chave)
-        
-        if endereco is None:
-            return False 
-        
-     
-        if self.gerenciador_arquivo.excluir_registro(endereco):
-         
-            return True 
-        
-        return False
+        with self._escrita():
+            endereco = self.indice.buscar(chave)
+            
+            if endereco is None:
+                return False 
+            
+            tamanho = self.gerenciador_arquivo.tamanho_registro(endereco)
+            # Lido antes da marcação: os índices secundários precisam das chaves do registro
+            registro = self.gerenciador_arquivo.ler_registro_por_endereco(endereco) if self.indices_secundarios else None
+            if not self.gerenciador_arquivo.excluir_registro(endereco):
+                return False
+            self._desindexar_secundarios(endereco, registro)
+            # A chave sai do índice: pode ser reutilizada numa nova inclusão
+            self.indice.remover(chave)
+            self.cache.invalidar(chave)
+            self.bytes_mortos += tamanho
+            self._indice_alterado = True
+
+        # Depois do commit: numa transação externa, a compactação é adiada para o commit dela
+        self._verificar_compactacao()
+        return True
+
+    def _obter_desserializado(self, chave):
+        """
+        Busca pela chave e desserializa, passando pelo cache de registros.
+        Retorna uma cópia (quem chama pode enriquecer o dicionário livremente) ou None.
+        """
+        registro = self.cache.obter(chave)
+        if registro is None:
+            with self.trava.leitura():
+                # Sob a trava: uma escrita não pode invalidar a chave entre a leitura e o guardar
+                registro_string = self.buscar_por_chave(chave)
+                if registro_string is None:
+                    return None
+                registro = self._deserializar(registro_string)
+                if registro is None:
+                    return None
+                self.cache.guardar(chave, registro)
+        return registro.copy()
+
+    def estatisticas_cache(self):
+        return self.cache.estatisticas()
 
     def ler_todos(self):
        
-        return self.gerenciador_arquivo.ler_arquivo_exaustivo()
\ No newline at end of file
+        return self.gerenciador_arquivo.ler_arquivo_exaustivo()
+
+    def iterar_todos(self):
+        """Versão preguiçosa de ler_todos(): gera os registros ativos sem materializar a tabela."""
+        return self.gerenciador_arquivo.iterar_registros()
+
+    # --- COMPACTAÇÃO (VACUUM) ---
+
+    def _verificar_compactacao(self):
+        if self.LIMIAR_COMPACTACAO is None or self.bytes_mortos < self.MINIMO_BYTES_COMPACTACAO:
+            return
+        if self._leituras_abertas:
+            return # Um relatório está lendo por endereço: a próxima exclusão tenta de novo
+        if self.journal is not None and self.journal.em_transacao():
+            # A troca do arquivo invalidaria os endereços da transação aberta: compacta após o commit
+            self.journal.apos_commit(self._verificar_compactacao)
+            return
+        tamanho = self.gerenciador_arquivo.tamanho_arquivo()
+        if tamanho and self.bytes_mortos / tamanho >= self.LIMIAR_COMPACTACAO:
+            self.compactar()
+
+    def compactar(self):
+        """
+        Reescreve a Área de Dados apenas com os registros indexados (ativos),
+        troca o arquivo de forma atômica e reconstrói o índice.
+        Retorna um relatório com o espaço recuperado.
+        """
+        exclusivo = self.journal.exclusivo() if self.journal is not None else nullcontext()
+        with exclusivo, self.trava.escrita():
+            bytes_antes = self.gerenciador_arquivo.tamanho_arquivo()
+            enderecos_ativos = {endereco for _, endereco in self.indice.iterar_em_ordem()}
+
+            bytes_depois = self.gerenciador_arquivo.compactar(enderecos_ativos)
+            self._reconstruir_indice()
+            self._geracao += 1
+            self.salvar_indice()
+
+        return {
+            "tabela": self.nome_entidade,
+            "registros": len(self.indice),
+            "bytes_antes": bytes_antes,
+            "bytes_depois": bytes_depois,
+            "bytes_recuperados": bytes_antes - bytes_depois,
+        }
+
+
+def compactar_tabelas(daos):
+    """Compacta todas as tabelas informadas e retorna a lista de relatórios (um por tabela)."""
+    relatorios = []
+    for dao in daos:
+        relatorio = dao.compactar()
+        print(f"SUCESSO: Tabela {relatorio['tabela']} compactada. "
+              f"{relatorio['bytes_recuperados']} bytes recuperados ({relatorio['registros']} registros ativos).")
+        relatorios.append(relatorio)
+    return relatorios
@@ -0,0 +1,256 @@
+
+import os
+import struct
+
+import ArvoreBinaria.persistencia as persistencia_mod
+
+ATIVO = b' '
+EXCLUIDO = b'*'
+
+
+class LayoutRegistro:
+    """
+    Layout de um registro de tamanho fixo, descrito como lista de (nome_campo, formato struct):
+      'q' -> inteiro (8 bytes), 'd' -> real (8 bytes), 'Ns' -> texto UTF-8 com até N bytes.
+    Cada registro começa com 1 byte de status (' ' ativo, '*' excluído logicamente).
+    """
+
+    def __init__(self, campos):
+        self.campos = list(campos)
+        self.nomes = [nome for nome, _ in self.campos]
+        self._struct = struct.Struct('<c' + ''.join(formato for _, formato in self.campos))
+        self.tamanho = self._struct.size
+        # Índices dos campos texto (precisam de encode/decode) e seus limites em bytes
+        self._campos_texto = {
+            i: int(formato[:-1] or 1)
+            for i, (_, formato) in enumerate(self.campos) if formato.endswith('s')
+        }
+        self._conversores = [
+            str if formato.endswith('s') else (float if formato == 'd' else int)
+            for _, formato in self.campos
+        ]
+
+    def empacotar(self, valores, status=ATIVO):
+        valores = list(valores)
+        for i, limite in self._campos_texto.items():
+            texto = str(valores[i]).encode('utf-8')
+            # Texto maior que o campo é recusado: truncar gravaria um valor diferente do informado
+            if len(texto) > limite:
+                raise ValueError(f"Campo '{self.nomes[i]}' excede {limite} bytes: {valores[i]!r}")
+            valores[i] = texto
+        return self._struct.pack(status, *valores)
+
+    def desempacotar(self, dados):
+        """Retorna (status, tupla_de_campos) sem nenhum parsing de texto além do decode."""
+        status, *valores = self._struct.unpack(dados)
+        for i in self._campos_texto:
+            valores[i] = valores[i].rstrip(b'\0').decode('utf-8')
+        return status, tuple(valores)
+
+    def converter_texto(self, registro_string):
+        """Converte uma linha no formato texto ('a|b|c') para a tupla tipada do layout."""
+        campos = registro_string.strip().split('|')
+        return tuple(converter(campo) for converter, campo in zip(self._conversores, campos))
+
+
+class GerenciadorArquivoBinario(persistencia_mod.GerenciadorArquivo):
+    """
+    Área de Dados com registros de tamanho fixo empacotados com struct.
+    O endereço do registro N é N * layout.tamanho, a leitura não faz split/strip
+    e um registro pode ser sobrescrito no próprio lugar.
+    Mantém a mesma interface do GerenciadorArquivo (registros lidos são tuplas).
+    """
+
+    def __init__(self, nome_arquivo, layout, manter_aberto=False, max_paginas_cache=0):
+        super().__init__(nome_arquivo, manter_aberto=manter_aberto, max_paginas_cache=max_paginas_cache)
+        self.layout = layout
+
+    def _para_valores(self, registro):
+        return self.layout.converter_texto(registro) if isinstance(registro, str) else registro
+
+    def endereco_do_registro(self, numero_registro):
+        return numero_registro * self.layout.tamanho
+
+    def quantidade_registros(self):
+        try:
+            return os.path.getsize(self.nome_arquivo) // self.layout.tamanho
+        except FileNotFoundError:
+            return 0
+
+    def _ler_intervalo(self, f, endereco_byte, tamanho):
+        if self.max_paginas_cache <= 0:
+            f.seek(endereco_byte)
+            return f.read(tamanho)
+
+        partes = []
+        restante = tamanho
+        inicio_pagina = endereco_byte - endereco_byte % self.TAMANHO_PAGINA
+        deslocamento = endereco_byte - inicio_pagina
+        while restante > 0:
+            pagina = self._ler_pagina(f, inicio_pagina)
+            trecho = pagina[deslocamento:deslocamento + restante]
+            partes.append(trecho)
+            restante -= len(trecho)
+            if len(pagina) < self.TAMANHO_PAGINA:
+                break # Fim do arquivo
+            inicio_pagina += self.TAMANHO_PAGINA
+            deslocamento = 0
+        return b''.join(partes)
+
+    def gravar_registro(self, registro_formatado):
+        dados = self.layout.empacotar(self._para_valores(registro_formatado))
+
+        with self._transacao():
+            f = self._abrir(criar=True)
+            try:
+                tamanho_arquivo = f.seek(0, os.SEEK_END)
+                # Um registro incompleto no final (gravação interrompida) é sobrescrito
+                endereco_byte = tamanho_arquivo - tamanho_arquivo % self.layout.tamanho
+                self._registrar_escrita(f, endereco_byte, dados, anexo=True)
+                f.seek(endereco_byte)
+                f.write(dados)
+                f.flush()
+                self.invalidar_cache(endereco_byte)
+            finally:
+                self._liberar(f)
+        return endereco_byte
+
+    def gravar_lote(self, registros_formatados):
+        tamanho = self.layout.tamanho
+        dados = [self.layout.empacotar(self._para_valores(registro)) for registro in registros_formatados]
+
+        with self._transacao():
+            f = self._abrir(criar=True)
+            try:
+                tamanho_arquivo = f.seek(0, os.SEEK_END)
+                inicio = tamanho_arquivo - tamanho_arquivo % tamanho
+                if dados:
+                    self._registrar_escrita(f, inicio, b''.join(dados), anexo=True)
+                    f.seek(inicio)
+                    f.write(b''.join(dados))
+                    f.flush()
+                    self._invalidar_intervalo(inicio, len(dados) * tamanho)
+            finally:
+                self._liberar(f)
+        return [inicio + i * tamanho for i in range(len(dados))]
+
+    def sobrescrever_registro(self, endereco_byte, registro_formatado):
+        """Atualização no próprio lugar (o registro tem tamanho fixo)."""
+        dados = self.layout.empacotar(self._para_valores(registro_formatado))
+        with self._transacao():
+            f = self._abrir()
+            if f is None:
+                return False
+            try:
+                self._registrar_escrita(f, endereco_byte, dados)
+                f.seek(endereco_byte)
+                f.write(dados)
+                f.flush()
+                self._invalidar_intervalo(endereco_byte, len(dados))
+            finally:
+                self._liberar(f)
+        return True
+
+    def validar_registro(self, registro_formatado):
+        try:
+            self.layout.empacotar(self._para_valores(registro_formatado))
+        except (ValueError, struct.error) as e:
+            return str(e)
+        return None
+
+    def tamanho_registro(self, endereco_byte):
+        return self.layout.tamanho
+
+    def _copiar_registros(self, origem, destino, enderecos_manter):
+        tamanho = self.layout.tamanho
+        endereco = 0
+        while True:
+            dados = origem.read(tamanho)
+            if len(dados) < tamanho:
+                break
+            if endereco in enderecos_manter:
+                destino.write(dados)
+            endereco += tamanho
+
+    def ler_registro_por_endereco(self, endereco_byte):
+        f = self._abrir()
+        if f is None:
+            return None
+        try:
+            dados = self._ler_intervalo(f, endereco_byte, self.layout.tamanho)
+        finally:
+            self._liberar(f)
+
+        if len(dados) < self.layout.tamanho:
+            return None
+        status, valores = self.layout.desempacotar(dados)
+        if status == EXCLUIDO:
+            return None
+        return valores
+
+    def excluir_registro(self, endereco_byte):
+        try:
+            with self._transacao():
+                f = self._abrir()
+                if f is None:
+                    return False
+                try:
+                    self._registrar_escrita(f, endereco_byte, EXCLUIDO)
+                    f.seek(endereco_byte)
+                    f.write(EXCLUIDO)
+                    f.flush()
+                    self.invalidar_cache(endereco_byte)
+                finally:
+                    self._liberar(f)
+            return True
+        except Exception:
+            return False
+
+    def iterar_com_enderecos(self, endereco_inicial=0):
+        tamanho = self.layout.tamanho
+        try:
+            with open(self.nome_arquivo, 'rb') as f:
+                endereco_atual = endereco_inicial - endereco_inicial % tamanho
+                f.seek(endereco_atual)
+                while True:
+                    dados = f.read(tamanho)
+                    if len(dados) < tamanho:
+                        break
+                    status, valores = self.layout.desempacotar(dados)
+                    if status != EXCLUIDO:
+                        yield endereco_atual, valores, tamanho
+                    endereco_atual += tamanho
+        except FileNotFoundError:
+            return
+
+    def iterar_registros(self):
+        for _, registro, _ in self.iterar_com_enderecos():
+            yield registro
+
+
+def converter_texto_para_binario(nome_entidade, layout_campos):
+    """
+    Converte a Área de Dados texto de uma entidade (<nome>.txt) para o formato binário (<nome>.dat).
+    Apenas registros ativos são copiados. Retorna a quantidade de registros convertidos.
+    Levanta ValueError (e não grava o .dat) se algum texto não cabe no campo do layout.
+
+    Exemplo:
+        from Classes.Pacientes import Pacientes
+        converter_texto_para_binario('Pacientes', Pacientes.LAYOUT_BINARIO)
+    """
+    layout = LayoutRegistro(layout_campos)
+    origem = persistencia_mod.GerenciadorArquivo(f'{nome_entidade}.txt')
+    destino = f'{nome_entidade}.dat'
+    temporario = destino + '.tmp'
+
+    quantidade = 0
+    try:
+        with open(temporario, 'wb') as f:
+            for _, registro, _ in origem.iterar_com_enderecos():
+                f.write(layout.empacotar(layout.converter_texto(registro)))
+                quantidade += 1
+    except ValueError:
+        os.remove(temporario)
+        raise
+    os.replace(temporario, destino)
+    return quantidade
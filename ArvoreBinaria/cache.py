@@ -0,0 +1,74 @@
+
+import threading
+from collections import OrderedDict
+
+
+class CacheRegistros:
+    """
+    Cache em memória de registros já desserializados, indexado pela chave primária.
+    Limitado a tamanho_maximo entradas (0 desativa), com política de remoção
+    'lru' (menos recentemente usado) ou 'fifo' (mais antigo inserido).
+    Contadores de acertos/falhas ficam disponíveis em estatisticas().
+    Seguro para uso por várias threads (a ordem LRU muda até nas leituras).
+    """
+
+    POLITICAS = ('lru', 'fifo')
+
+    def __init__(self, tamanho_maximo=1024, politica='lru', nome=None):
+        if politica not in self.POLITICAS:
+            raise ValueError(f"Política de cache inválida: {politica}. Use {self.POLITICAS}.")
+        self.tamanho_maximo = tamanho_maximo
+        self.politica = politica
+        self.nome = nome # Tabela dona do cache (rótulo nas métricas)
+        self._entradas = OrderedDict()
+        self._trava = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def obter(self, chave):
+        """Retorna o registro em cache ou None (falha)."""
+        with self._trava:
+            registro = self._entradas.get(chave)
+            if registro is None:
+                self.falhas += 1
+                return None
+            if self.politica == 'lru':
+                self._entradas.move_to_end(chave)
+            self.acertos += 1
+            return registro
+
+    def guardar(self, chave, registro):
+        if self.tamanho_maximo <= 0 or registro is None:
+            return
+        with self._trava:
+            self._entradas[chave] = registro
+            if self.politica == 'lru':
+                self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.tamanho_maximo:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self, chave=None):
+        """Remove a entrada da chave (ou todas, se None)."""
+        with self._trava:
+            if chave is None:
+                self._entradas.clear()
+            else:
+                self._entradas.pop(chave, None)
+
+    def estatisticas(self):
+        consultas = self.acertos + self.falhas
+        return {
+            "acertos": self.acertos,
+            "falhas": self.falhas,
+            "taxa_acerto": round(self.acertos / consultas, 4) if consultas else 0.0,
+            "entradas": len(self._entradas),
+            "tamanho_maximo": self.tamanho_maximo,
+            "politica": self.politica,
+        }
+
+    def zerar_estatisticas(self):
+        self.acertos = 0
+        self.falhas = 0
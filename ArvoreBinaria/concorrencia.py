@@ -0,0 +1,84 @@
+
+import threading
+from contextlib import contextmanager
+
+
+class TravaLeituraEscrita:
+    """
+    Trava de leitores/escritor: várias threads leem ao mesmo tempo, a escrita é exclusiva.
+
+    Escritores têm preferência (um escritor esperando bloqueia novos leitores), o que
+    evita a inanição das inclusões durante relatórios longos. A escrita é reentrante,
+    o escritor também pode ler e leituras aninhadas na mesma thread são permitidas.
+    Promover uma leitura em escrita (pedir a escrita segurando a leitura) levanta
+    RuntimeError em vez de travar o programa.
+    """
+
+    def __init__(self):
+        self._condicao = threading.Condition(threading.Lock())
+        self._leitores = {}             # thread -> profundidade de leituras
+        self._escritor = None
+        self._profundidade_escrita = 0
+        self._escritores_esperando = 0
+
+    def adquirir_leitura(self):
+        eu = threading.get_ident()
+        with self._condicao:
+            if self._escritor == eu or eu in self._leitores:
+                # Leitura aninhada: não espera (um escritor na fila travaria a própria thread)
+                self._leitores[eu] = self._leitores.get(eu, 0) + 1
+                return
+            while self._escritor is not None or self._escritores_esperando:
+                self._condicao.wait()
+            self._leitores[eu] = 1
+
+    def liberar_leitura(self):
+        eu = threading.get_ident()
+        with self._condicao:
+            profundidade = self._leitores[eu] - 1
+            if profundidade:
+                self._leitores[eu] = profundidade
+                return
+            del self._leitores[eu]
+            if not self._leitores:
+                self._condicao.notify_all()
+
+    def adquirir_escrita(self):
+        eu = threading.get_ident()
+        with self._condicao:
+            if self._escritor == eu:
+                self._profundidade_escrita += 1
+                return
+            if eu in self._leitores:
+                raise RuntimeError("A thread já tem a trava de leitura: não é possível promovê-la a escrita.")
+            self._escritores_esperando += 1
+            try:
+                while self._escritor is not None or self._leitores:
+                    self._condicao.wait()
+            finally:
+                self._escritores_esperando -= 1
+            self._escritor = eu
+            self._profundidade_escrita = 1
+
+    def liberar_escrita(self):
+        with self._condicao:
+            self._profundidade_escrita -= 1
+            if self._profundidade_escrita == 0:
+                self._escritor = None
+                self._condicao.notify_all()
+
+    @contextmanager
+    def leitura(self):
+        self.adquirir_leitura()
+        try:
+            yield
+        finally:
+            self.liberar_leitura()
+
+    @contextmanager
+    def escrita(self):
+        self.adquirir_escrita()
+        try:
+            yield
+        finally:
+            self.liberar_escrita()
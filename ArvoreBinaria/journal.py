@@ -0,0 +1,378 @@
+
+import os
+import struct
+import threading
+import zlib
+from contextlib import contextmanager
+
+# Tipos de registro do journal
+OPERACAO = 1
+COMMIT = 2
+ABORT = 3
+
+
+class Journal:
+    """
+    Write-ahead log (journal) físico das Áreas de Dados.
+
+    Cada escrita de um GerenciadorArquivo ligado ao journal é registrada como
+    (arquivo, endereço, bytes anteriores, bytes novos) ANTES de ser aplicada ao
+    arquivo de dados. As escritas de uma transacao() formam uma unidade atômica
+    (ex: a consulta em Consultas.txt e o contador em Diarias.txt); escritas fora
+    de uma transação explícita viram transações de uma operação só.
+
+    Anexos grandes (acima de LIMITE_IMAGEM_ANEXO bytes, ex: o lote de uma importação)
+    não têm os bytes copiados para o journal: basta o tamanho anterior do arquivo
+    (o undo trunca) e o arquivo de dados recebe fsync antes do COMMIT, então o redo
+    não precisa deles.
+
+    Ao iniciar, recuperar() reaplica (redo) as transações confirmadas e desfaz
+    (undo) a transação incompleta, se houver, sem varrer as tabelas. Um checkpoint
+    (fsync dos arquivos de dados + truncamento do journal) acontece ao fechar, antes
+    de uma compactação e sempre que o journal passa de LIMITE_CHECKPOINT bytes.
+
+    Política de fsync do journal:
+      'sempre' -> fsync em todo commit e antes de cada sobrescrita no próprio lugar
+                  (o registro está em disco antes do dado que ele desfaz): durável
+                  também em queda de energia;
+      'grupo'  -> group commit: o commit só retorna depois de um fsync, mas o fsync é
+                  feito fora da trava do journal e compartilhado por todos os commits
+                  gravados enquanto o anterior rodava. O commit é durável como em
+                  'sempre'; numa queda de energia, porém, uma sobrescrita de uma
+                  transação ainda não confirmada pode chegar ao disco antes do seu
+                  registro e não ser desfeita;
+      'nunca'  -> apenas flush para o sistema operacional (protege contra queda
+                  do programa, não do sistema).
+    """
+
+    POLITICAS = ('sempre', 'grupo', 'nunca')
+    LIMITE_IMAGEM_ANEXO = 64 * 1024
+    LIMITE_CHECKPOINT = 4 * 1024 * 1024
+
+    _CABECALHO = struct.Struct('<II')     # tamanho do corpo, crc32 do corpo
+    _REGISTRO = struct.Struct('<BQ')      # tipo, número da transação
+    _OPERACAO = struct.Struct('<H?QII')   # tamanho do nome, anexo, endereço, tamanho anterior, tamanho novo
+
+    def __init__(self, nome_arquivo='Clinica.wal', politica='grupo'):
+        if politica not in self.POLITICAS:
+            raise ValueError(f"Política de fsync inválida: {politica}. Use {self.POLITICAS}.")
+        self.nome_arquivo = nome_arquivo
+        self.politica = politica
+        self._arquivo = None
+        self._trava = threading.RLock()
+        self._transacao = None          # Número da transação aberta
+        self._dono = None               # Thread dona da transação aberta
+        self._profundidade = 0
+        self._operacoes = []            # (arquivo, endereço, anteriores, novos, anexo) da transação aberta
+        self._anexos_sem_imagem = set() # Arquivos de dados que precisam de fsync antes do COMMIT
+        self._apos_commit = []
+        self._proxima_transacao = 1
+        # Group commit: commits gravados x cobertos por um fsync (protegidos por _sincronia)
+        self._sincronia = threading.Condition(threading.Lock())
+        self._commits_gravados = 0
+        self._commits_duraveis = 0
+        self._sincronizando = False
+        self._arquivos_alterados = set()
+        self._ao_desfazer = {}          # arquivo de dados -> função chamada após um rollback
+
+    # --- GRAVAÇÃO DO JOURNAL ---
+
+    def _abrir(self):
+        if self._arquivo is None:
+            self._arquivo = open(self.nome_arquivo, 'ab')
+        return self._arquivo
+
+    def _gravar(self, tipo, transacao, carga=b''):
+        corpo = self._REGISTRO.pack(tipo, transacao) + carga
+        f = self._abrir()
+        f.write(self._CABECALHO.pack(len(corpo), zlib.crc32(corpo)) + corpo)
+        f.flush()
+
+    def _sincronizar(self):
+        if self._arquivo is not None:
+            self._arquivo.flush()
+            os.fsync(self._arquivo.fileno())
+
+    def _aguardar_fsync(self, numero):
+        """
+        Retorna quando o commit número `numero` estiver coberto por um fsync. Chamado sem a
+        trava do journal: o primeiro a chegar faz o fsync (líder) e os commits gravados
+        enquanto ele roda esperam e são cobertos juntos pelo fsync seguinte.
+        """
+        with self._sincronia:
+            while self._commits_duraveis < numero:
+                if self._sincronizando:
+                    self._sincronia.wait()
+                    continue
+                self._sincronizando = True
+                alvo = self._commits_gravados
+                arquivo = self._arquivo
+                sincronizado = False
+                self._sincronia.release()
+                try:
+                    if arquivo is not None:
+                        os.fsync(arquivo.fileno())
+                    sincronizado = True
+                finally:
+                    self._sincronia.acquire()
+                    self._sincronizando = False
+                    if sincronizado:
+                        self._commits_duraveis = max(self._commits_duraveis, alvo)
+                    self._sincronia.notify_all()
+
+    def tamanho(self):
+        try:
+            return os.path.getsize(self.nome_arquivo)
+        except FileNotFoundError:
+            return 0
+
+    # --- TRANSAÇÕES ---
+
+    def em_transacao(self):
+        return self._transacao is not None and self._dono == threading.get_ident()
+
+    @contextmanager
+    def transacao(self):
+        """
+        Agrupa as escritas feitas dentro do bloco numa unidade atômica. Transações
+        aninhadas (na mesma thread) fazem parte da transação externa. Se o bloco
+        levantar uma exceção, as escritas são desfeitas e a exceção é propagada.
+        """
+        numero = None
+        with self._trava:
+            if self.em_transacao():
+                self._profundidade += 1
+                try:
+                    yield self
+                finally:
+                    self._profundidade -= 1
+                return
+
+            self._transacao = self._proxima_transacao
+            self._proxima_transacao += 1
+            self._dono = threading.get_ident()
+            self._operacoes = []
+            self._apos_commit = []
+            try:
+                yield self
+            except BaseException:
+                self._desfazer()
+                raise
+            else:
+                numero = self._confirmar()
+        if numero is not None:
+            self._aguardar_fsync(numero)
+
+    @contextmanager
+    def exclusivo(self):
+        """Detém o journal sem abrir transação (ex: compactação, que exige um checkpoint)."""
+        with self._trava:
+            yield self
+
+    def registrar(self, arquivo, endereco, anteriores, novos, anexo=False):
+        """
+        Registra uma escrita física antes de ela ser aplicada à Área de Dados.
+        anexo=True: escrita no fim do arquivo (o undo trunca o arquivo no endereço).
+        """
+        if anexo and len(novos) > self.LIMITE_IMAGEM_ANEXO:
+            # Só o endereço (tamanho anterior) vai para o journal; o redo de b'' não faz nada
+            novos = b''
+            self._anexos_sem_imagem.add(arquivo)
+        nome = arquivo.encode('utf-8')
+        carga = (self._OPERACAO.pack(len(nome), anexo, endereco, len(anteriores), len(novos))
+                 + nome + anteriores + novos)
+        self._gravar(OPERACAO, self._transacao, carga)
+        if not anexo and self.politica == 'sempre':
+            # A sobrescrita apaga os bytes anteriores: a imagem para o undo vai ao disco antes
+            self._sincronizar()
+        self._operacoes.append((arquivo, endereco, anteriores, novos, anexo))
+        self._arquivos_alterados.add(arquivo)
+
+    def apos_commit(self, funcao):
+        """Executa funcao depois do commit da transação aberta (ou já, se não houver uma)."""
+        if self.em_transacao():
+            self._apos_commit.append(funcao)
+        else:
+            funcao()
+
+    def ao_desfazer(self, arquivo, funcao):
+        """Registra funcao() para ser chamada quando um rollback alterar o arquivo de dados."""
+        self._ao_desfazer[arquivo] = funcao
+
+    def _encerrar(self):
+        self._transacao = None
+        self._dono = None
+        self._operacoes = []
+        self._anexos_sem_imagem = set()
+
+    def _confirmar(self):
+        """Grava o COMMIT. Retorna o número do commit que a thread deve esperar (política 'grupo')."""
+        pendentes = self._apos_commit
+        numero = None
+        if self._operacoes:
+            if self.politica != 'nunca':
+                # Anexos sem imagem no journal: os dados têm de estar em disco antes do COMMIT
+                for arquivo in self._anexos_sem_imagem:
+                    with open(arquivo, 'r+b') as f:
+                        os.fsync(f.fileno())
+            self._gravar(COMMIT, self._transacao)
+            if self.politica == 'sempre':
+                self._sincronizar()
+            elif self.politica == 'grupo':
+                with self._sincronia:
+                    self._commits_gravados += 1
+                    numero = self._commits_gravados
+        self._encerrar()
+
+        if self.tamanho() > self.LIMITE_CHECKPOINT:
+            self.checkpoint()
+        for funcao in pendentes:
+            funcao()
+        return numero
+
+    def _desfazer(self):
+        operacoes = self._operacoes
+        if operacoes:
+            self._aplicar_undo(operacoes)
+            self._gravar(ABORT, self._transacao)
+        self._encerrar()
+
+        for arquivo in {operacao[0] for operacao in operacoes}:
+            funcao = self._ao_desfazer.get(arquivo)
+            if funcao is not None:
+                funcao()
+
+    # --- REDO / UNDO ---
+
+    @staticmethod
+    def _aplicar_redo(operacoes):
+        for arquivo, endereco, _, novos, _ in operacoes:
+            modo = 'r+b' if os.path.exists(arquivo) else 'w+b'
+            with open(arquivo, modo) as f:
+                f.seek(endereco)
+                f.write(novos)
+
+    @staticmethod
+    def _aplicar_undo(operacoes):
+        for arquivo, endereco, anteriores, _, anexo in reversed(operacoes):
+            if not os.path.exists(arquivo):
+                continue
+            with open(arquivo, 'r+b') as f:
+                if anexo:
+                    f.truncate(min(endereco, f.seek(0, os.SEEK_END)))
+                else:
+                    f.seek(endereco)
+                    f.write(anteriores)
+
+    def _ler_registros(self):
+        """Gera (tipo, transacao, operacao) até o fim do journal ou até um registro incompleto/corrompido."""
+        try:
+            with open(self.nome_arquivo, 'rb') as f:
+                conteudo = f.read()
+        except FileNotFoundError:
+            return
+
+        posicao = 0
+        while posicao + self._CABECALHO.size <= len(conteudo):
+            tamanho, crc = self._CABECALHO.unpack_from(conteudo, posicao)
+            inicio = posicao + self._CABECALHO.size
+            corpo = conteudo[inicio:inicio + tamanho]
+            if len(corpo) < tamanho or zlib.crc32(corpo) != crc:
+                return # Cauda gravada pela metade (queda durante a escrita do journal)
+            posicao = inicio + tamanho
+
+            tipo, transacao = self._REGISTRO.unpack_from(corpo)
+            operacao = None
+            if tipo == OPERACAO:
+                deslocamento = self._REGISTRO.size
+                tam_nome, anexo, endereco, tam_anteriores, tam_novos = self._OPERACAO.unpack_from(corpo, deslocamento)
+                deslocamento += self._OPERACAO.size
+                arquivo = corpo[deslocamento:deslocamento + tam_nome].decode('utf-8')
+                deslocamento += tam_nome
+                anteriores = corpo[deslocamento:deslocamento + tam_anteriores]
+                deslocamento += tam_anteriores
+                novos = corpo[deslocamento:deslocamento + tam_novos]
+                operacao = (arquivo, endereco, anteriores, novos, anexo)
+            yield tipo, transacao, operacao
+
+    def recuperar(self):
+        """
+        Recuperação na inicialização (antes de os DAOs carregarem os índices).
+        Reaplica, na ordem do journal, as transações confirmadas; desfaz as abortadas
+        e a incompleta. Ao final faz um checkpoint. Retorna um resumo da recuperação.
+        """
+        with self._trava:
+            transacoes = {}     # número -> [operacoes, estado]
+            ordem = []
+            for tipo, transacao, operacao in self._ler_registros():
+                if transacao not in transacoes:
+                    transacoes[transacao] = [[], None]
+                    ordem.append(transacao)
+                if tipo == OPERACAO:
+                    transacoes[transacao][0].append(operacao)
+                else:
+                    transacoes[transacao][1] = tipo
+
+            resumo = {"confirmadas": 0, "desfeitas": 0, "operacoes": 0}
+            for transacao in ordem:
+                operacoes, estado = transacoes[transacao]
+                self._arquivos_alterados.update(operacao[0] for operacao in operacoes)
+                resumo["operacoes"] += len(operacoes)
+                if estado == COMMIT:
+                    self._aplicar_redo(operacoes)
+                    resumo["confirmadas"] += 1
+                else:
+                    # Abortada ou interrompida: o estado anterior é restaurado pelas imagens antigas
+                    self._aplicar_redo(operacoes)
+                    self._aplicar_undo(operacoes)
+                    resumo["desfeitas"] += 1
+
+            self.checkpoint()
+            if resumo["operacoes"]:
+                print(f"AVISO: Journal recuperado: {resumo['confirmadas']} transações reaplicadas, "
+                      f"{resumo['desfeitas']} desfeitas.")
+            return resumo
+
+    # --- CHECKPOINT ---
+
+    def checkpoint(self):
+        """
+        Garante em disco os arquivos de dados alterados e esvazia o journal.
+        Não faz nada (retorna False) com uma transação aberta.
+        """
+        with self._trava:
+            if self._transacao is not None:
+                return False
+            # Nenhum fsync de grupo pode estar usando o descritor que será fechado
+            with self._sincronia:
+                while self._sincronizando:
+                    self._sincronia.wait()
+                self._sincronizando = True
+            try:
+                self._esvaziar()
+            finally:
+                with self._sincronia:
+                    self._sincronizando = False
+                    self._sincronia.notify_all()
+            return True
+
+    def _esvaziar(self):
+        for arquivo in self._arquivos_alterados:
+            try:
+                with open(arquivo, 'r+b') as f:
+                    os.fsync(f.fileno())
+            except FileNotFoundError:
+                continue
+        self._arquivos_alterados.clear()
+
+        if self._arquivo is not None:
+            self._arquivo.close()
+            self._arquivo = None
+        with open(self.nome_arquivo, 'wb') as f:
+            os.fsync(f.fileno())
+        # Os dados confirmados já estão em disco: nenhum commit precisa mais do fsync do journal
+        with self._sincronia:
+            self._commits_duraveis = self._commits_gravados
+
+    def fechar(self):
+        self.checkpoint()
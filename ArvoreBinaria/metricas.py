@@ -0,0 +1,440 @@
+"""
+Métricas de instrumentação da camada de armazenamento e dos DAOs.
+
+Desativadas por padrão e sem custo nenhum nesse estado: ativar() instala versões
+medidas de open() (nos módulos de persistência), de ArvoreBinaria.buscar, dos caches
+e dos métodos incluir_*/consultar_*/excluir_*/iterar_*... das subclasses de
+BaseDados já importadas; desativar() devolve as originais. Exemplo:
+
+    import ArvoreBinaria.metricas as metricas_mod
+    metricas_mod.ativar()
+    clinica.consultas_manager.faturamento_por_dia('01/01/2024')
+    metricas_mod.valor('arquivo_aberturas_total', arquivo='Consultas.txt')
+    print(metricas_mod.para_prometheus())
+
+Os logs por registro (ex: o JOIN do motor de relatórios, em DEBUG) vão para o logger
+'clinica' e só aparecem com configurar_log() ou a variável de ambiente CLINICA_LOG=DEBUG.
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import types
+import weakref
+from functools import wraps
+
+import ArvoreBinaria.persistencia as persistencia_mod
+import ArvoreBinaria.armazenamento_binario as binario_mod
+import ArvoreBinaria.journal as journal_mod
+import ArvoreBinaria.ArvoreBinaria as arvore_mod
+import ArvoreBinaria.cache as cache_mod
+import ArvoreBinaria.BaseDados as base_mod
+
+
+PREFIXO_PROMETHEUS = 'clinica_'
+
+# Métodos dos DAOs com histograma de latência (prefixos do nome)
+PREFIXOS_METODOS = ('incluir_', 'consultar_', 'excluir_', 'atualizar_', 'faturamento_', 'historico_', 'relatorio_',
+                    'iterar_')
+
+LIMITES_DURACAO = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+LIMITES_NOS = (1, 2, 4, 8, 12, 16, 20, 24, 32, 48)
+
+MODULOS_ARQUIVO = (persistencia_mod, binario_mod, journal_mod)
+
+
+class Histograma:
+    """Contagens acumuladas por faixa (limite superior inclusivo, como no Prometheus)."""
+
+    __slots__ = ('limites', 'contagens', 'soma', 'total')
+
+    def __init__(self, limites):
+        self.limites = limites
+        self.contagens = [0] * (len(limites) + 1) # A última faixa é +Inf
+        self.soma = 0
+        self.total = 0
+
+    def observar(self, valor):
+        for i, limite in enumerate(self.limites):
+            if valor <= limite:
+                break
+        else:
+            i = len(self.limites)
+        self.contagens[i] += 1
+        self.soma += valor
+        self.total += 1
+
+    def para_dict(self):
+        return {
+            "limites": list(self.limites),
+            "contagens": list(self.contagens),
+            "soma": self.soma,
+            "total": self.total,
+            "media": self.soma / self.total if self.total else 0.0,
+        }
+
+
+class RegistroMetricas:
+    """Contadores e histogramas identificados por (nome, rótulos)."""
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self.contadores = {}
+        self.histogramas = {}
+
+    @staticmethod
+    def _chave(nome, rotulos):
+        return nome, tuple(sorted(rotulos.items()))
+
+    def incrementar(self, nome, quantidade=1, **rotulos):
+        chave = self._chave(nome, rotulos)
+        with self._trava:
+            self.contadores[chave] = self.contadores.get(chave, 0) + quantidade
+
+    def observar(self, nome, valor, limites, **rotulos):
+        chave = self._chave(nome, rotulos)
+        with self._trava:
+            histograma = self.histogramas.get(chave)
+            if histograma is None:
+                histograma = self.histogramas[chave] = Histograma(limites)
+            histograma.observar(valor)
+
+    def valor(self, nome, **rotulos):
+        return self.contadores.get(self._chave(nome, rotulos), 0)
+
+    def histograma(self, nome, **rotulos):
+        histograma = self.histogramas.get(self._chave(nome, rotulos))
+        return histograma.para_dict() if histograma is not None else None
+
+    def zerar(self):
+        with self._trava:
+            self.contadores.clear()
+            self.histogramas.clear()
+
+    def instantaneo(self):
+        with self._trava:
+            return {
+                "contadores": [
+                    {"nome": nome, "rotulos": dict(rotulos), "valor": valor}
+                    for (nome, rotulos), valor in sorted(self.contadores.items())
+                ],
+                "histogramas": [
+                    {"nome": nome, "rotulos": dict(rotulos), **histograma.para_dict()}
+                    for (nome, rotulos), histograma in sorted(self.histogramas.items(), key=lambda item: item[0])
+                ],
+            }
+
+
+coletor = RegistroMetricas()
+
+_trava_ativacao = threading.Lock()
+_originais = [] # (dono, atributo, valor original ou None se não existia)
+_com_descritor = weakref.WeakSet() # Gerenciadores/journals cujo descritor persistente foi envolvido
+_ativo = False
+
+
+# --- PONTOS DE MEDIÇÃO ---
+
+def _nome_arquivo(caminho):
+    return os.path.basename(os.fspath(caminho))
+
+
+class _ArquivoMedido:
+    """Envolve um arquivo aberto contando bytes lidos/escritos (só existe com as métricas ativas)."""
+
+    def __init__(self, arquivo, nome):
+        self._arquivo = arquivo
+        self._nome = nome
+
+    def _contar(self, metrica, dados):
+        if _ativo and dados:
+            tamanho = len(dados.encode('utf-8')) if isinstance(dados, str) else len(dados)
+            coletor.incrementar(metrica, tamanho, arquivo=self._nome)
+        return dados
+
+    def read(self, *args):
+        return self._contar('arquivo_bytes_lidos_total', self._arquivo.read(*args))
+
+    def readline(self, *args):
+        return self._contar('arquivo_bytes_lidos_total', self._arquivo.readline(*args))
+
+    def write(self, dados):
+        self._contar('arquivo_bytes_escritos_total', dados)
+        return self._arquivo.write(dados)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self._contar('arquivo_bytes_lidos_total', next(self._arquivo))
+
+    def __enter__(self):
+        self._arquivo.__enter__()
+        return self
+
+    def __exit__(self, tipo, valor, rastreio):
+        return self._arquivo.__exit__(tipo, valor, rastreio)
+
+    def __getattr__(self, atributo):
+        return getattr(self._arquivo, atributo)
+
+
+def _open_medido(arquivo, *args, **kwargs):
+    f = open(arquivo, *args, **kwargs)
+    nome = _nome_arquivo(arquivo)
+    coletor.incrementar('arquivo_aberturas_total', arquivo=nome)
+    return _ArquivoMedido(f, nome)
+
+
+def _trava_descritor(dono):
+    # GerenciadorArquivo protege o descritor com _mutex; o Journal, com _trava
+    return getattr(dono, '_mutex', None) or dono._trava
+
+
+def _medir_abertura(original):
+    @wraps(original)
+    def _abrir(self, *args, **kwargs):
+        # Descritores persistentes abertos antes de ativar() passam a ser medidos também
+        with _trava_descritor(self):
+            arquivo = self._arquivo
+            if arquivo is not None and not isinstance(arquivo, _ArquivoMedido):
+                self._arquivo = _ArquivoMedido(arquivo, _nome_arquivo(self.nome_arquivo))
+            _com_descritor.add(self)
+        return original(self, *args, **kwargs)
+    return _abrir
+
+
+def _buscar_medido(self, chave):
+    visitados = 0
+    encontrado = None
+    no_atual = self.raiz
+    while no_atual is not None:
+        visitados += 1
+        if chave < no_atual.chave:
+            no_atual = no_atual.esquerda
+        elif chave > no_atual.chave:
+            no_atual = no_atual.direita
+        else:
+            encontrado = no_atual.endereco_byte
+            break
+    # super().buscar() do IndiceSecundario também passa por aqui
+    indice = 'secundario' if isinstance(self, arvore_mod.IndiceSecundario) else 'primario'
+    coletor.incrementar('indice_buscas_total', indice=indice)
+    coletor.observar('indice_nos_visitados', visitados, LIMITES_NOS, indice=indice)
+    return encontrado
+
+
+def _medir_cache(original, tipo):
+    @wraps(original)
+    def obter(self, chave):
+        resultado = original(self, chave)
+        metrica = 'cache_falhas_total' if resultado is None else 'cache_acertos_total'
+        coletor.incrementar(metrica, cache=tipo, tabela=self.nome or '')
+        return resultado
+    return obter
+
+
+def _medir_paginas(original):
+    @wraps(original)
+    def _ler_pagina(self, f, inicio_pagina):
+        acertos = self.acertos_cache
+        pagina = original(self, f, inicio_pagina)
+        metrica = 'cache_acertos_total' if self.acertos_cache > acertos else 'cache_falhas_total'
+        coletor.incrementar(metrica, cache='paginas', tabela=_nome_arquivo(self.nome_arquivo))
+        return pagina
+    return _ler_pagina
+
+
+def _medir_iteracao(gerador, gasto, rotulo):
+    # Soma só o tempo dentro do gerador: o do consumidor entre um item e outro fica de fora
+    try:
+        while True:
+            inicio = time.perf_counter()
+            try:
+                item = next(gerador)
+            except StopIteration:
+                return
+            finally:
+                gasto += time.perf_counter() - inicio
+            yield item
+    finally:
+        gerador.close()
+        coletor.observar('metodo_duracao_segundos', gasto, LIMITES_DURACAO, metodo=rotulo)
+
+
+def _medir_duracao(original, rotulo):
+    @wraps(original)
+    def medido(*args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            resultado = original(*args, **kwargs)
+        except BaseException:
+            coletor.observar('metodo_duracao_segundos', time.perf_counter() - inicio, LIMITES_DURACAO, metodo=rotulo)
+            raise
+        gasto = time.perf_counter() - inicio
+        if isinstance(resultado, types.GeneratorType):
+            # iterar_* (e os que devolvem um gerador): medido até o fim da iteração, não só a criação
+            return _medir_iteracao(resultado, gasto, rotulo)
+        coletor.observar('metodo_duracao_segundos', gasto, LIMITES_DURACAO, metodo=rotulo)
+        return resultado
+    return medido
+
+
+def _subclasses(classe):
+    for subclasse in classe.__subclasses__():
+        yield subclasse
+        yield from _subclasses(subclasse)
+
+
+def _substituir(dono, atributo, novo):
+    _originais.append((dono, atributo, vars(dono).get(atributo)))
+    setattr(dono, atributo, novo)
+
+
+# --- ATIVAÇÃO ---
+
+def ativo():
+    return _ativo
+
+
+def ativar():
+    """
+    Instala os pontos de medição. Os DAOs são instrumentados por classe: chame depois de
+    importar as entidades (ex: depois de criar a Clinica).
+    """
+    global _ativo
+    with _trava_ativacao:
+        if _ativo:
+            return
+        for modulo in MODULOS_ARQUIVO:
+            _substituir(modulo, 'open', _open_medido)
+        for classe in (persistencia_mod.GerenciadorArquivo, journal_mod.Journal):
+            _substituir(classe, '_abrir', _medir_abertura(classe._abrir))
+        _substituir(arvore_mod.ArvoreBinaria, 'buscar', _buscar_medido)
+        _substituir(cache_mod.CacheRegistros, 'obter', _medir_cache(cache_mod.CacheRegistros.obter, 'registros'))
+        _substituir(persistencia_mod.GerenciadorArquivo, '_ler_pagina',
+                    _medir_paginas(persistencia_mod.GerenciadorArquivo._ler_pagina))
+
+        for classe in _subclasses(base_mod.BaseDados):
+            for atributo, metodo in list(vars(classe).items()):
+                if atributo.startswith(PREFIXOS_METODOS) and isinstance(metodo, types.FunctionType):
+                    _substituir(classe, atributo, _medir_duracao(metodo, f'{classe.__name__}.{atributo}'))
+        _ativo = True
+
+
+def desativar():
+    """Devolve as implementações originais. Os valores coletados continuam disponíveis."""
+    global _ativo
+    with _trava_ativacao:
+        while _originais:
+            dono, atributo, original = _originais.pop()
+            if original is None:
+                delattr(dono, atributo) # open: volta a ser o builtin
+            else:
+                setattr(dono, atributo, original)
+        for dono in list(_com_descritor):
+            with _trava_descritor(dono):
+                if isinstance(dono._arquivo, _ArquivoMedido):
+                    dono._arquivo = dono._arquivo._arquivo
+        _com_descritor.clear()
+        _ativo = False
+
+
+# --- CONSULTA E EXPORTAÇÃO ---
+
+def valor(nome, **rotulos):
+    return coletor.valor(nome, **rotulos)
+
+
+def histograma(nome, **rotulos):
+    return coletor.histograma(nome, **rotulos)
+
+
+def zerar():
+    coletor.zerar()
+
+
+def instantaneo():
+    return coletor.instantaneo()
+
+
+def para_json(indent=2):
+    return json.dumps(instantaneo(), ensure_ascii=False, indent=indent)
+
+
+def _formatar_rotulos(rotulos):
+    if not rotulos:
+        return ''
+    escapar = lambda valor: str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{nome}="{escapar(valor)}"' for nome, valor in rotulos) + '}'
+
+
+def para_prometheus():
+    """Formato de exposição em texto do Prometheus."""
+    linhas = []
+    tipos_declarados = set()
+
+    def declarar(nome, tipo):
+        if nome not in tipos_declarados:
+            tipos_declarados.add(nome)
+            linhas.append(f'# TYPE {nome} {tipo}')
+
+    with coletor._trava:
+        contadores = sorted(coletor.contadores.items())
+        histogramas = sorted(
+            ((chave, h.para_dict()) for chave, h in coletor.histogramas.items()),
+            key=lambda item: item[0],
+        )
+
+    for (nome, rotulos), quantidade in contadores:
+        nome = PREFIXO_PROMETHEUS + nome
+        declarar(nome, 'counter')
+        linhas.append(f'{nome}{_formatar_rotulos(rotulos)} {quantidade}')
+
+    for (nome, rotulos), dados in histogramas:
+        nome = PREFIXO_PROMETHEUS + nome
+        declarar(nome, 'histogram')
+        acumulado = 0
+        limites = [repr(float(limite)) for limite in dados["limites"]] + ['+Inf']
+        for limite, contagem in zip(limites, dados["contagens"]):
+            acumulado += contagem
+            linhas.append(f'{nome}_bucket{_formatar_rotulos(rotulos + (("le", limite),))} {acumulado}')
+        linhas.append(f'{nome}_sum{_formatar_rotulos(rotulos)} {dados["soma"]}')
+        linhas.append(f'{nome}_count{_formatar_rotulos(rotulos)} {dados["total"]}')
+
+    return '\n'.join(linhas) + '\n'
+
+
+# --- LOG ---
+
+LOG_RAIZ = 'clinica'
+logging.getLogger(LOG_RAIZ).addHandler(logging.NullHandler())
+
+
+def obter_log(nome):
+    """
+    Logger 'clinica.<nome>'. Sem configurar_log() o nível efetivo é o do logger raiz (WARNING):
+    DEBUG e INFO são descartados, mas WARNING ou acima propagam e aparecem se a aplicação
+    tiver configurado o logging (ex: logging.basicConfig()).
+    """
+    return logging.getLogger(f'{LOG_RAIZ}.{nome}')
+
+
+def configurar_log(nivel='DEBUG', destino=None):
+    """Liga os logs da clínica no nível dado (nome ou número), em destino (padrão: stderr)."""
+    log = logging.getLogger(LOG_RAIZ)
+    log.setLevel(nivel.upper() if isinstance(nivel, str) else nivel)
+    if not any(getattr(h, '_clinica', False) for h in log.handlers):
+        manipulador = logging.StreamHandler(destino or sys.stderr)
+        manipulador.setFormatter(logging.Formatter('[%(levelname)s] %(name)s: %(message)s'))
+        manipulador._clinica = True
+        log.addHandler(manipulador)
+    log.propagate = False
+    return log
+
+
+if os.environ.get('CLINICA_LOG'):
+    configurar_log(os.environ['CLINICA_LOG'])
@@ -0,0 +1,179 @@
+"""
+Modo de perfil (profiling) para relatórios e outras operações longas.
+
+Desligado por padrão. Liga com a variável de ambiente CLINICA_PERFIL (ou configurar(),
+chamado pela opção --perfil do main.py):
+    CLINICA_PERFIL=pstats    -> cProfile; grava <nome>-<data>-<n>.pstats (abrir com pstats/snakeviz);
+                                1, true e sim também ligam este modo
+    CLINICA_PERFIL=amostras  -> amostragem da pilha a cada INTERVALO_AMOSTRAGEM segundos; grava
+                                <nome>-<data>-<n>.folded (pilhas colapsadas, para flamegraph.pl/speedscope)
+Os arquivos vão para CLINICA_PERFIL_DIR (padrão: ./perfis), um por execução.
+Qualquer outro valor (exceto 0, nao, false) gera um AVISO e deixa o perfil desligado.
+
+Funções marcadas com @perfilado abrem uma sessão por chamada; chamadas aninhadas (ex: o
+relatório da GUI que chama faturamento_por_dia) entram na sessão mais externa. Quando a
+função retorna um gerador, a sessão dura até o gerador terminar. Desligado, o custo é um
+teste de variável por chamada.
+"""
+
+import cProfile
+import itertools
+import os
+import sys
+import threading
+import time
+import types
+from collections import Counter
+from functools import wraps
+
+MODOS = ('pstats', 'amostras')
+INTERVALO_AMOSTRAGEM = 0.002
+
+_modo = None
+_diretorio = 'perfis'
+_local = threading.local()
+_sequencia = itertools.count(1)
+
+
+def configurar(modo, diretorio=None):
+    """Liga o perfil no modo dado ('pstats' ou 'amostras'); None desliga."""
+    global _modo, _diretorio
+    if modo is not None and modo not in MODOS:
+        raise ValueError(f"Modo de perfil inválido: {modo}. Use {MODOS}.")
+    _modo = modo
+    if diretorio is not None:
+        _diretorio = diretorio
+
+
+def ativo():
+    return _modo is not None
+
+
+class _Rastreador:
+    """cProfile: tempo exato por função (inclui o custo do próprio rastreamento)."""
+
+    EXTENSAO = 'pstats'
+
+    def __init__(self):
+        self._perfil = cProfile.Profile()
+
+    def retomar(self):
+        self._perfil.enable()
+
+    def pausar(self):
+        self._perfil.disable()
+
+    def gravar(self, caminho):
+        self._perfil.dump_stats(caminho)
+
+
+class _Amostrador:
+    """Amostra a pilha da thread observada; cada pilha colapsada conta uma amostra."""
+
+    EXTENSAO = 'folded'
+
+    def __init__(self):
+        self.pilhas = Counter()
+        self._alvo = None
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._amostrar, name="perfil", daemon=True)
+        self._thread.start()
+
+    def retomar(self):
+        self._alvo = threading.get_ident()
+
+    def pausar(self):
+        self._alvo = None
+
+    @staticmethod
+    def _nome_quadro(quadro):
+        codigo = quadro.f_code
+        modulo = os.path.splitext(os.path.basename(codigo.co_filename))[0]
+        return f"{modulo}:{getattr(codigo, 'co_qualname', codigo.co_name)}".replace(' ', '_').replace(';', ',')
+
+    def _amostrar(self):
+        while not self._parar.wait(INTERVALO_AMOSTRAGEM):
+            alvo = self._alvo
+            quadro = sys._current_frames().get(alvo) if alvo is not None else None
+            pilha = []
+            while quadro is not None:
+                pilha.append(self._nome_quadro(quadro))
+                quadro = quadro.f_back
+            if pilha:
+                self.pilhas[';'.join(reversed(pilha))] += 1
+
+    def gravar(self, caminho):
+        self._parar.set()
+        self._thread.join()
+        with open(caminho, 'w', encoding='utf-8') as f:
+            for pilha, amostras in sorted(self.pilhas.items()):
+                f.write(f"{pilha} {amostras}\n")
+
+
+class _Sessao:
+
+    def __init__(self, nome):
+        self.nome = nome
+        self._coletor = _Amostrador() if _modo == 'amostras' else _Rastreador()
+
+    def retomar(self):
+        _local.sessao = self
+        self._coletor.retomar()
+
+    def pausar(self):
+        self._coletor.pausar()
+        _local.sessao = None
+
+    def encerrar(self):
+        self.pausar()
+        os.makedirs(_diretorio, exist_ok=True)
+        caminho = os.path.join(
+            _diretorio,
+            f"{self.nome}-{time.strftime('%Y%m%d-%H%M%S')}-{next(_sequencia)}.{self._coletor.EXTENSAO}",
+        )
+        self._coletor.gravar(caminho)
+        print(f"AVISO: Perfil de {self.nome} gravado em {caminho}")
+        return caminho
+
+
+def _continuar(sessao, gerador):
+    # A sessão fica pausada entre a criação do gerador e o primeiro next()
+    sessao.retomar()
+    try:
+        yield from gerador
+    finally:
+        sessao.encerrar()
+
+
+def perfilado(funcao):
+    """Executa funcao dentro de uma sessão de perfil quando o modo de perfil está ligado."""
+    nome = funcao.__qualname__
+
+    @wraps(funcao)
+    def executar(*args, **kwargs):
+        if _modo is None or getattr(_local, 'sessao', None) is not None:
+            return funcao(*args, **kwargs)
+
+        sessao = _Sessao(nome)
+        sessao.retomar()
+        try:
+            resultado = funcao(*args, **kwargs)
+        except BaseException:
+            sessao.encerrar()
+            raise
+        if isinstance(resultado, types.GeneratorType):
+            sessao.pausar()
+            return _continuar(sessao, resultado)
+        sessao.encerrar()
+        return resultado
+
+    return executar
+
+
+_ambiente = os.environ.get('CLINICA_PERFIL', '').strip().lower()
+if _ambiente in MODOS or _ambiente in ('1', 'true', 'sim'):
+    configurar(_ambiente if _ambiente in MODOS else 'pstats', os.environ.get('CLINICA_PERFIL_DIR'))
+elif _ambiente and _ambiente not in ('0', 'nao', 'não', 'false'):
+    # stderr: no cli.py a saída padrão é só dos dados
+    print(f"AVISO: CLINICA_PERFIL={_ambiente} não reconhecido (use 1, {' ou '.join(MODOS)}); perfil desligado.",
+          file=sys.stderr)
@@ -1,61 +1,495 @@
 
 import os
+import struct
+import threading
+from collections import OrderedDict
+from contextlib import nullcontext
 
 class GerenciadorArquivo:
-   
-    def __init__(self, nome_arquivo):
+    """
+    Acesso à Área de Dados (arquivo texto, um registro por linha).
+
+    Com manter_aberto=True o descritor do arquivo fica aberto durante toda a vida
+    do DAO (evita um open()/close() por operação) e as leituras pontuais são
+    servidas por um cache de páginas (LRU, limitado a max_paginas_cache páginas
+    de TAMANHO_PAGINA bytes, indexadas pelo offset inicial da página).
+    Os endereços continuam sendo offsets em bytes, compatíveis com o índice.
+
+    Com um journal (ArvoreBinaria.journal.Journal) atribuído, toda escrita é
+    registrada no write-ahead log antes de ser aplicada ao arquivo.
+
+    O descritor persistente e o cache de páginas são compartilhados: _abrir()
+    adquire uma trava interna (reentrante) que _liberar() devolve, então cada
+    seek+read/write acontece sem intercalação entre threads.
+    """
+
+    TAMANHO_PAGINA = 4096
+
+    def __init__(self, nome_arquivo, manter_aberto=False, max_paginas_cache=0):
         self.nome_arquivo = nome_arquivo
+        self.manter_aberto = manter_aberto
+        self.max_paginas_cache = max_paginas_cache
+        self._arquivo = None                # Handle persistente ('r+b')
+        self._mutex = threading.RLock()     # Protege o handle persistente e o cache de páginas
+        self._paginas = OrderedDict()       # offset da página -> bytes
+        self.acertos_cache = 0
+        self.falhas_cache = 0
+        self.journal = None
+
+    # --- CICLO DE VIDA DO DESCRITOR ---
+
+    def _abrir(self, criar=False):
+        """
+        Retorna o handle de leitura/escrita (o persistente, se houver) com a trava interna
+        adquirida; devolva-o com _liberar(). None (sem a trava) se o arquivo não existe.
+        """
+        self._mutex.acquire()
+        try:
+            if self._arquivo is not None:
+                return self._arquivo
+            try:
+                f = open(self.nome_arquivo, 'r+b')
+            except FileNotFoundError:
+                if not criar:
+                    self._mutex.release()
+                    return None
+                f = open(self.nome_arquivo, 'w+b')
+        except BaseException:
+            self._mutex.release()
+            raise
+        if self.manter_aberto:
+            self._arquivo = f
+        return f
+
+    def _liberar(self, f):
+        # Só fecha handles temporários; o persistente continua aberto
+        try:
+            if f is not self._arquivo:
+                f.close()
+        finally:
+            self._mutex.release()
+
+    def fechar(self):
+        """Fecha o descritor persistente e descarta o cache de páginas."""
+        with self._mutex:
+            if self._arquivo is not None:
+                self._arquivo.close()
+                self._arquivo = None
+            self.invalidar_cache()
+
+    close = fechar
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, rastreio):
+        self.fechar()
+        return False
+
+    # --- CACHE DE PÁGINAS ---
+
+    def invalidar_cache(self, endereco_byte=None):
+        """Descarta a página que contém o endereço (ou todo o cache, se None)."""
+        with self._mutex:
+            if endereco_byte is None:
+                self._paginas.clear()
+            else:
+                self._paginas.pop(endereco_byte - endereco_byte % self.TAMANHO_PAGINA, None)
+
+    def _invalidar_intervalo(self, endereco_byte, tamanho):
+        for endereco in range(endereco_byte, endereco_byte + tamanho, self.TAMANHO_PAGINA):
+            self.invalidar_cache(endereco)
+        self.invalidar_cache(endereco_byte + tamanho - 1)
+
+    def _ler_pagina(self, f, inicio_pagina):
+        pagina = self._paginas.get(inicio_pagina)
+        if pagina is not None:
+            self._paginas.move_to_end(inicio_pagina)
+            self.acertos_cache += 1
+            return pagina
+
+        self.falhas_cache += 1
+        f.seek(inicio_pagina)
+        pagina = f.read(self.TAMANHO_PAGINA)
+        self._paginas[inicio_pagina] = pagina
+        if len(self._paginas) > self.max_paginas_cache:
+            self._paginas.popitem(last=False) # Remove a página menos recentemente usada
+        return pagina
+
+    def _ler_linha(self, f, endereco_byte):
+        """Lê os bytes da linha que começa no endereço, via cache de páginas quando habilitado."""
+        if self.max_paginas_cache <= 0:
+            f.seek(endereco_byte)
+            return f.readline()
+
+        partes = []
+        inicio_pagina = endereco_byte - endereco_byte % self.TAMANHO_PAGINA
+        deslocamento = endereco_byte - inicio_pagina
+        while True:
+            pagina = self._ler_pagina(f, inicio_pagina)
+            fim_linha = pagina.find(b'\n', deslocamento)
+            if fim_linha != -1:
+                partes.append(pagina[deslocamento:fim_linha + 1])
+                break
+            partes.append(pagina[deslocamento:])
+            if len(pagina) < self.TAMANHO_PAGINA:
+                break # Fim do arquivo
+            inicio_pagina += self.TAMANHO_PAGINA
+            deslocamento = 0
+        return b''.join(partes)
+
+    # --- JOURNAL ---
+
+    def _transacao(self):
+        """Escritas fora de uma transação explícita viram uma transação de uma operação."""
+        return self.journal.transacao() if self.journal is not None else nullcontext()
+
+    def _registrar_escrita(self, f, endereco_byte, dados, anexo=False):
+        """Registra a escrita (com a imagem anterior dos bytes) no journal, antes de aplicá-la."""
+        if self.journal is None:
+            return
+        anteriores = b''
+        if not anexo:
+            f.seek(endereco_byte)
+            anteriores = f.read(len(dados))
+        self.journal.registrar(self.nome_arquivo, endereco_byte, anteriores, dados, anexo)
+
+    # --- OPERAÇÕES DE REGISTRO ---
 
     def gravar_registro(self, registro_formatado):
-       
-        with open(self.nome_arquivo, 'a+', encoding='utf-8') as f:
-            # tell() retorna o endereço (offset) atual (o início da nova gravação)
-            endereco_byte = f.tell() 
-            
-            if not registro_formatado.endswith('\n'):
-                registro_formatado += '\n'
-            
-            f.write(registro_formatado)
-            
-            return endereco_byte
+
+        if not registro_formatado.endswith('\n'):
+            registro_formatado += '\n'
+        dados = registro_formatado.encode('utf-8')
+
+        with self._transacao():
+            f = self._abrir(criar=True)
+            try:
+                f.seek(0, os.SEEK_END)
+                # tell() retorna o endereço (offset) atual (o início da nova gravação)
+                endereco_byte = f.tell()
+                self._registrar_escrita(f, endereco_byte, dados, anexo=True)
+                f.seek(endereco_byte)
+                f.write(dados)
+                f.flush()
+                # A última página (parcial) mudou de conteúdo
+                self.invalidar_cache(endereco_byte)
+            finally:
+                self._liberar(f)
+        return endereco_byte
+
+    def gravar_lote(self, registros_formatados):
+        """
+        Acrescenta vários registros com uma única escrita (e um único flush).
+        Retorna a lista de endereços, na ordem dos registros.
+        """
+        enderecos = []
+        partes = []
+        with self._transacao():
+            f = self._abrir(criar=True)
+            try:
+                endereco_byte = f.seek(0, os.SEEK_END)
+                inicio = endereco_byte
+                for registro_formatado in registros_formatados:
+                    if not registro_formatado.endswith('\n'):
+                        registro_formatado += '\n'
+                    dados = registro_formatado.encode('utf-8')
+                    enderecos.append(endereco_byte)
+                    partes.append(dados)
+                    endereco_byte += len(dados)
+                if partes:
+                    dados = b''.join(partes)
+                    self._registrar_escrita(f, inicio, dados, anexo=True)
+                    f.seek(inicio)
+                    f.write(dados)
+                    f.flush()
+                    self._invalidar_intervalo(inicio, endereco_byte - inicio)
+            finally:
+                self._liberar(f)
+        return enderecos
 
     def ler_registro_por_endereco(self, endereco_byte):
-       
+
+        f = self._abrir()
+        if f is None:
+            return None
         try:
-            with open(self.nome_arquivo, 'r', encoding='utf-8') as f:
-              
+            registro = self._ler_linha(f, endereco_byte).decode('utf-8').strip()
+        finally:
+            self._liberar(f)
+
+        if registro and registro.startswith('*'):
+            return None
+
+        return registro
+
+    def sobrescrever_registro(self, endereco_byte, registro_formatado):
+        """
+        Atualização no próprio lugar. No formato texto só é possível quando o novo
+        conteúdo tem exatamente o mesmo tamanho em bytes da linha atual; caso
+        contrário retorna False e nada é gravado.
+        """
+        dados = registro_formatado.rstrip('\n').encode('utf-8')
+        with self._transacao():
+            f = self._abrir()
+            if f is None:
+                return False
+            try:
+                atual = self._ler_linha(f, endereco_byte).rstrip(b'\r\n')
+                if len(atual) != len(dados) or atual.startswith(b'*'):
+                    return False
+                self._registrar_escrita(f, endereco_byte, dados)
                 f.seek(endereco_byte)
-                registro = f.readline().strip() 
-                
-                
-                if registro and registro.startswith('*'):
-                    return None 
-                
-                return registro
-        except FileNotFoundError:
-            return None 
+                f.write(dados)
+                f.flush()
+                self._invalidar_intervalo(endereco_byte, len(dados))
+            finally:
+                self._liberar(f)
+        return True
 
     def excluir_registro(self, endereco_byte):
         try:
-            # r+ permite leitura e escrita (sobrescrita)
-            with open(self.nome_arquivo, 'r+', encoding='utf-8') as f:
-                f.seek(endereco_byte)
-                f.write('*') 
+            with self._transacao():
+                # r+b permite leitura e escrita (sobrescrita)
+                f = self._abrir()
+                if f is None:
+                    return False
+                try:
+                    self._registrar_escrita(f, endereco_byte, b'*')
+                    f.seek(endereco_byte)
+                    f.write(b'*')
+                    f.flush()
+                    self.invalidar_cache(endereco_byte)
+                finally:
+                    self._liberar(f)
             return True
         except Exception:
             return False
 
-    def ler_arquivo_exaustivo(self):
-      
-        registros = []
+    def iterar_com_enderecos(self, endereco_inicial=0):
+        """
+        Varre o arquivo sequencialmente e gera (endereco, registro, tamanho_bytes) dos registros ativos.
+        Leitura binária: o offset de cada linha é acumulado pelo tamanho em bytes,
+        sem precisar de um f.tell() (caro em modo texto) por linha.
+        endereco_inicial (início de uma linha) limita a varredura ao trecho gravado depois dele.
+        """
+        try:
+            with open(self.nome_arquivo, 'rb') as f:
+                f.seek(endereco_inicial)
+                endereco_atual = endereco_inicial
+                for linha_bytes in f:
+                    endereco_linha = endereco_atual
+                    endereco_atual += len(linha_bytes)
+
+                    registro = linha_bytes.decode('utf-8').strip()
+                    # Ignora registros logicamente excluídos (começados por '*')
+                    if registro and not registro.startswith('*'):
+                        yield endereco_linha, registro, len(linha_bytes)
+        except FileNotFoundError:
+            return # O arquivo será criado na primeira inclusão
+
+    def tamanho_arquivo(self):
+        try:
+            return os.path.getsize(self.nome_arquivo)
+        except FileNotFoundError:
+            return 0
+
+    def validar_registro(self, registro_formatado):
+        """Mensagem de erro se o registro não pode ser gravado neste arquivo, None se pode."""
+        return None
+
+    def tamanho_registro(self, endereco_byte):
+        """Tamanho em bytes (com a quebra de linha) do registro que começa no endereço."""
+        f = self._abrir()
+        if f is None:
+            return 0
+        try:
+            return len(self._ler_linha(f, endereco_byte))
+        finally:
+            self._liberar(f)
+
+    def _copiar_registros(self, origem, destino, enderecos_manter):
+        for linha_bytes, endereco in self._linhas_com_enderecos(origem):
+            if endereco in enderecos_manter:
+                destino.write(linha_bytes if linha_bytes.endswith(b'\n') else linha_bytes + b'\n')
+
+    @staticmethod
+    def _linhas_com_enderecos(f):
+        endereco = 0
+        for linha_bytes in f:
+            yield linha_bytes, endereco
+            endereco += len(linha_bytes)
+
+    def compactar(self, enderecos_manter):
+        """
+        Reescreve a Área de Dados apenas com os registros cujos endereços estão em
+        enderecos_manter (os indexados), num arquivo temporário que substitui o
+        original de forma atômica (os.replace). Os endereços mudam: o índice deve
+        ser reconstruído em seguida. Retorna o novo tamanho do arquivo.
+        """
+        if not os.path.exists(self.nome_arquivo):
+            return 0
+        if self.journal is not None and not self.journal.checkpoint():
+            # Os endereços registrados no journal deixariam de valer depois da troca do arquivo
+            raise RuntimeError("A compactação não pode ocorrer dentro de uma transação do journal.")
+
+        with self._mutex:
+            # O descritor persistente e o cache apontam para o arquivo antigo
+            self.fechar()
+
+            temporario = self.nome_arquivo + '.tmp'
+            with open(self.nome_arquivo, 'rb') as origem, open(temporario, 'wb') as destino:
+                self._copiar_registros(origem, destino, enderecos_manter)
+                destino.flush()
+                os.fsync(destino.fileno())
+            os.replace(temporario, self.nome_arquivo)
+            return self.tamanho_arquivo()
+
+    def iterar_registros(self):
+        """Gera os registros ativos um a um (memória constante, independente do tamanho da tabela)."""
+        # Varredura sequencial usa um handle próprio para não disputar a posição do persistente
         try:
             with open(self.nome_arquivo, 'r', encoding='utf-8') as f:
-                f.seek(0)
                 for linha in f:
                     registro = linha.strip()
-                 
+
                     if registro and not registro.startswith('*'):
-                        registros.append(registro)
-            return registros
+                        yield registro
+        except FileNotFoundError:
+            return
+
+    def ler_arquivo_exaustivo(self):
+        return list(self.iterar_registros())
+
+
+class ArquivoIndice:
+    """
+    Persiste o índice de uma entidade em formato binário compacto ao lado do
+    arquivo de dados (ex: Consultas.txt -> Consultas.idx), para que a
+    inicialização não precise varrer a Área de Dados inteira.
+
+    O cabeçalho guarda o tamanho e o mtime do arquivo de dados no momento da
+    gravação; se qualquer um deles divergir, o índice é considerado obsoleto.
+    O arquivo é organizado em seções (nome -> pares chave/endereço ordenados),
+    seguidas de metadados inteiros nomeados (ex: bytes_mortos da Área de Dados).
+    """
+
+    ASSINATURA = b'CIDX'
+    VERSAO = 2
+    _CABECALHO = struct.Struct('<4sHQqIH')  # assinatura, versão, tamanho dados, mtime_ns, nº de seções, nº de metadados
+    _METADADO = struct.Struct('<Hq')        # tamanho do nome, valor
+    _SECAO = struct.Struct('<HBI')          # tamanho do nome, tipo da chave, nº de entradas
+    _PAR_INT = struct.Struct('<qQ')         # chave inteira, endereço
+    _TAM_STR = struct.Struct('<H')
+    _ENDERECO = struct.Struct('<Q')
+
+    TIPO_INT = 0
+    TIPO_STR = 1
+
+    def __init__(self, nome_arquivo_dados):
+        self.nome_arquivo_dados = nome_arquivo_dados
+        self.nome_arquivo = os.path.splitext(nome_arquivo_dados)[0] + '.idx'
+
+    def _assinatura_dados(self):
+        try:
+            estado = os.stat(self.nome_arquivo_dados)
         except FileNotFoundError:
-            return []
\ No newline at end of file
+            return None
+        return estado.st_size, estado.st_mtime_ns
+
+    def carregar(self):
+        """
+        Lê o arquivo de índice em uma única leitura.
+        Retorna ({nome_secao: [(chave, endereco), ...]}, {nome_metadado: valor})
+        ou None se ausente, obsoleto ou corrompido.
+        """
+        assinatura_dados = self._assinatura_dados()
+        if assinatura_dados is None:
+            return None
+        try:
+            with open(self.nome_arquivo, 'rb') as f:
+                conteudo = f.read()
+        except FileNotFoundError:
+            return None
+
+        try:
+            assinatura, versao, tamanho, mtime_ns, n_secoes, n_metadados = self._CABECALHO.unpack_from(conteudo, 0)
+            if assinatura != self.ASSINATURA or versao != self.VERSAO:
+                return None
+            if (tamanho, mtime_ns) != assinatura_dados:
+                return None # Arquivo de dados mudou desde a gravação do índice
+
+            pos = self._CABECALHO.size
+            secoes = {}
+            for _ in range(n_secoes):
+                tam_nome, tipo, n_entradas = self._SECAO.unpack_from(conteudo, pos)
+                pos += self._SECAO.size
+                nome = conteudo[pos:pos + tam_nome].decode('utf-8')
+                pos += tam_nome
+
+                if tipo == self.TIPO_INT:
+                    fim = pos + n_entradas * self._PAR_INT.size
+                    if fim > len(conteudo):
+                        return None
+                    pares = list(self._PAR_INT.iter_unpack(conteudo[pos:fim]))
+                    pos = fim
+                else:
+                    pares = []
+                    for _ in range(n_entradas):
+                        (tam_chave,) = self._TAM_STR.unpack_from(conteudo, pos)
+                        pos += self._TAM_STR.size
+                        chave = conteudo[pos:pos + tam_chave].decode('utf-8')
+                        pos += tam_chave
+                        (endereco,) = self._ENDERECO.unpack_from(conteudo, pos)
+                        pos += self._ENDERECO.size
+                        pares.append((chave, endereco))
+                secoes[nome] = pares
+
+            metadados = {}
+            for _ in range(n_metadados):
+                tam_nome, valor = self._METADADO.unpack_from(conteudo, pos)
+                pos += self._METADADO.size
+                metadados[conteudo[pos:pos + tam_nome].decode('utf-8')] = valor
+                pos += tam_nome
+            return secoes, metadados
+        except (struct.error, UnicodeDecodeError):
+            return None # Índice corrompido: será reconstruído
+
+    def salvar(self, secoes, metadados=None):
+        """
+        Grava as seções {nome: [(chave, endereco), ...]} e os metadados de forma atômica
+        (arquivo temporário + os.replace), carimbando o estado atual dos dados.
+        """
+        assinatura_dados = self._assinatura_dados()
+        if assinatura_dados is None:
+            return False
+
+        metadados = metadados or {}
+        partes = [self._CABECALHO.pack(self.ASSINATURA, self.VERSAO, assinatura_dados[0],
+                                       assinatura_dados[1], len(secoes), len(metadados))]
+        for nome, pares in secoes.items():
+            nome_bytes = nome.encode('utf-8')
+            tipo = self.TIPO_STR if pares and isinstance(pares[0][0], str) else self.TIPO_INT
+            partes.append(self._SECAO.pack(len(nome_bytes), tipo, len(pares)))
+            partes.append(nome_bytes)
+            if tipo == self.TIPO_INT:
+                partes.extend(self._PAR_INT.pack(chave, endereco) for chave, endereco in pares)
+            else:
+                for chave, endereco in pares:
+                    chave_bytes = chave.encode('utf-8')
+                    partes.append(self._TAM_STR.pack(len(chave_bytes)))
+                    partes.append(chave_bytes)
+                    partes.append(self._ENDERECO.pack(endereco))
+        for nome, valor in metadados.items():
+            nome_bytes = nome.encode('utf-8')
+            partes.append(self._METADADO.pack(len(nome_bytes), valor))
+            partes.append(nome_bytes)
+
+        temporario = self.nome_arquivo + '.tmp'
+        try:
+            with open(temporario, 'wb') as f:
+                f.write(b''.join(partes))
+            os.replace(temporario, self.nome_arquivo)
+            return True
+        except OSError:
+            return False
@@ -0,0 +1,159 @@
+
+import json
+import os
+import threading
+
+
+class AgregadosFaturamento:
+    """
+    Agregados materializados de faturamento (quantidade e valor total) por dia,
+    por médico e por especialidade, mantidos incrementalmente pela inclusão e
+    exclusão de consultas e gravados em Consultas.agg.
+
+    Assim como o .idx, o arquivo carimba o tamanho e o mtime de Consultas.txt:
+    se a Área de Dados mudou sem os agregados serem gravados (ex: queda do
+    programa), eles são reconstruídos do zero na primeira consulta.
+    Cada consulta entra com o valor gravado no seu registro no agendamento
+    (Consultas.valor_agendado), tanto na manutenção incremental quanto em
+    reconstruir(); só registros antigos, sem esse valor, usam os preços atuais.
+
+    registrar() é chamado com a trava de escrita de Consultas e reconstruir()
+    lê Consultas sob a trava de leitura, então uma consulta nunca é contada
+    duas vezes (ou nenhuma) quando as duas coisas acontecem ao mesmo tempo.
+    """
+
+    VERSAO = 1
+    DIMENSOES = ("dia", "medico", "especialidade")
+
+    def __init__(self, consultas_manager):
+        self.consultas = consultas_manager
+        self.nome_arquivo = os.path.splitext(consultas_manager.gerenciador_arquivo.nome_arquivo)[0] + '.agg'
+        self._dados = None      # None: ainda não carregado ou obsoleto (reconstruído sob demanda)
+        self._alterado = False
+        self._trava = threading.RLock()
+        self._carregar()
+
+    # --- PERSISTÊNCIA ---
+
+    def _assinatura_dados(self):
+        try:
+            estado = os.stat(self.consultas.gerenciador_arquivo.nome_arquivo)
+        except FileNotFoundError:
+            return [0, 0]
+        return [estado.st_size, estado.st_mtime_ns]
+
+    def _carregar(self):
+        try:
+            with open(self.nome_arquivo, 'r', encoding='utf-8') as f:
+                conteudo = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        if conteudo.get("versao") != self.VERSAO or conteudo.get("assinatura") != self._assinatura_dados():
+            return # Obsoleto: será reconstruído quando for usado
+
+        self._dados = {
+            "dia": {chave: valores for chave, valores in conteudo["dia"].items()},
+            "medico": {int(chave): valores for chave, valores in conteudo["medico"].items()},
+            "especialidade": {int(chave): valores for chave, valores in conteudo["especialidade"].items()},
+        }
+
+    def salvar(self):
+        with self._trava:
+            if self._dados is None:
+                return False
+            conteudo = {"versao": self.VERSAO, "assinatura": self._assinatura_dados()}
+            conteudo.update(self._dados)
+            temporario = self.nome_arquivo + '.tmp'
+            try:
+                with open(temporario, 'w', encoding='utf-8') as f:
+                    json.dump(conteudo, f)
+                os.replace(temporario, self.nome_arquivo)
+                self._alterado = False
+                return True
+            except OSError:
+                return False
+
+    def fechar(self):
+        if self._alterado:
+            self.salvar()
+
+    # --- MANUTENÇÃO ---
+
+    def _vazio(self):
+        return {dimensao: {} for dimensao in self.DIMENSOES}
+
+    @staticmethod
+    def _somar(tabela, chave, quantidade, valor):
+        atual = tabela.setdefault(chave, [0, 0.0])
+        atual[0] += quantidade
+        atual[1] = round(atual[1] + valor, 2)
+        if atual[0] <= 0:
+            del tabela[chave]
+
+    def _aplicar(self, dados, data, cod_medico, cod_especialidade, valor, sinal):
+        self._somar(dados["dia"], data, sinal, sinal * valor)
+        self._somar(dados["medico"], cod_medico, sinal, sinal * valor)
+        self._somar(dados["especialidade"], cod_especialidade, sinal, sinal * valor)
+
+    def registrar(self, data, cod_medico, cod_especialidade, valor_total, sinal=1):
+        """Aplica a inclusão (sinal=1) ou exclusão (sinal=-1) de uma consulta nos agregados."""
+        with self._trava:
+            if self._dados is None:
+                return # Ainda não materializado: a reconstrução já vai ler esta consulta do disco
+            self._aplicar(self._dados, data, cod_medico, cod_especialidade, valor_total, sinal)
+            self._alterado = True
+
+    def invalidar(self):
+        """Descarta os agregados em memória (ex: após um rollback); são reconstruídos no próximo uso."""
+        with self._trava:
+            self._dados = None
+            self._alterado = False
+
+    def reconstruir(self):
+        """Recalcula todos os agregados a partir de Consultas (uma passada com HASH JOIN)."""
+        # Mesma ordem dos escritores: trava de Consultas antes da trava dos agregados
+        with self.consultas.trava.leitura(), self._trava:
+            dados = self._vazio()
+            for consulta in self.consultas.iterar_consultas_com_valor():
+                self._aplicar(dados, consulta["data"], consulta["cod_medico"], consulta["cod_especialidade"],
+                              self.consultas.valor_agendado(consulta), 1)
+            self._dados = dados
+            self.salvar()
+
+    def _garantir(self):
+        if self._dados is None:
+            self.reconstruir()
+        return self._dados
+
+    # --- CONSULTAS DE TOTAIS ---
+
+    @staticmethod
+    def _resumo(valores):
+        quantidade, valor_total = valores if valores else (0, 0.0)
+        return {"quantidade": quantidade, "valor_total": round(valor_total, 2)}
+
+    def _obter(self, dimensao, chave):
+        dados = self._garantir()
+        with self._trava:
+            return list(dados[dimensao].get(chave) or ())
+
+    def totais_dia(self, data):
+        return self._resumo(self._obter("dia", data))
+
+    def totais_periodo(self, data_inicial, data_final):
+        if data_inicial > data_final:
+            data_inicial, data_final = data_final, data_inicial
+        quantidade, valor_total = 0, 0.0
+        dados = self._garantir()
+        with self._trava:
+            for data, (qtd, valor) in dados["dia"].items():
+                if data_inicial <= data <= data_final:
+                    quantidade += qtd
+                    valor_total += valor
+        return self._resumo((quantidade, valor_total))
+
+    def totais_medico(self, cod_medico):
+        return self._resumo(self._obter("medico", cod_medico))
+
+    def totais_especialidade(self, cod_especialidade):
+        return self._resumo(self._obter("especialidade", cod_especialidade))
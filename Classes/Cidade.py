@@ -1,10 +1,17 @@
 
 
 from ArvoreBinaria.BaseDados import BaseDados
+from Classes.Registros import Cidade
 
 class Cidades(BaseDados):
-   
-    
+
+    # Layout de tamanho fixo para o motor binário (opcional; ative com FORMATO_BINARIO = True)
+    LAYOUT_BINARIO = [("codigo", "q"), ("descricao", "60s"), ("estado", "8s")]
+    FORMATO_BINARIO = False
+
+    # Tabela pequena e muito lida nos JOINs: mantém os registros desserializados em memória
+    TAMANHO_CACHE = 1024
+
     def __init__(self):
        
         super().__init__('Cidades')
@@ -19,38 +26,50 @@ class Cidades(BaseDados):
         registro_formatado = f"{codigo}|{descricao}|{estado}"
         
         
-        self.incluir(registro_formatado, codigo)
+        try:
+            incluido = self.incluir(registro_formatado, codigo)
+        except ValueError as e:
+            print(f"ERRO: Cidade {codigo} não incluída: {e}")
+            return False
+        if not incluido:
+            print(f"ERRO: Cidade com código {codigo} já existe.")
+            return False
         print(f"SUCESSO: Cidade {descricao} ({codigo}) incluída.")
         return True
     
+    def incluir_cidades_lote(self, cidades):
+        """cidades: [(codigo, descricao, estado), ...]. Retorna [(codigo, sucesso, mensagem), ...]."""
+        return self._incluir_lote_validado(
+            "Cidade", cidades,
+            formatar=lambda linha: "|".join(str(campo) for campo in linha),
+        )
+
     def _deserializar(self, registro_string):
        
         try:
-            campos = registro_string.split('|')
-            return {
-                "codigo": int(campos[0]),
-                "descricao": campos[1],
-                "estado": campos[2],
-            }
+            campos = self._separar_campos(registro_string)
+            return Cidade(
+                codigo=int(campos[0]),
+                descricao=campos[1],
+                estado=campos[2],
+            )
         except Exception:
             return None
 
     def consultar_cidade(self, codigo):
        
-        registro_string = self.buscar_por_chave(codigo)
-        if registro_string is None:
-            return None
-        return self._deserializar(registro_string)
+        return self._obter_desserializado(codigo)
+
+    def iterar_cidades(self):
+        """Cidades ativas (codigo, descricao, estado), na ordem do arquivo."""
+        for reg_str in self.iterar_todos():
+            registro = self._deserializar(reg_str)
+            if registro is not None:
+                yield registro
 
     def listar_todas(self):
         
-        registros_strings = self.ler_todos()
-        cidades_listadas = [
-            self._deserializar(reg_str) 
-            for reg_str in registros_strings 
-            if self._deserializar(reg_str) is not None
-        ]
-        return cidades_listadas
+        return list(self.iterar_cidades())
 
     def excluir_cidade(self, codigo):
         
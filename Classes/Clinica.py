@@ -0,0 +1,70 @@
+
+import Classes.Cidade as cid_mod
+import Classes.Especialidades as esp_mod
+import Classes.Pacientes as pac_mod
+import Classes.Medicos as med_mod
+import Classes.Exames as exa_mod
+import Classes.Consultas as con_mod
+import Classes.Diarias as dia_mod
+from ArvoreBinaria.BaseDados import compactar_tabelas
+import ArvoreBinaria.journal as journal_mod
+
+
+class Clinica:
+    """
+    Cria todos os DAOs com as dependências injetadas, na ordem correta.
+    Usado pela GUI e pelas ferramentas de linha de comando.
+
+    Todas as tabelas compartilham um journal (write-ahead log): operações que
+    alteram mais de um arquivo (ex: consulta + diária) são atômicas, e uma
+    queda do programa é recuperada na próxima inicialização.
+
+    Criar a Clinica não lê as Áreas de Dados: o índice de cada tabela é carregado no
+    primeiro acesso ou antes, em segundo plano, com dao.garantir_indice() (como faz a GUI).
+    """
+
+    ARQUIVO_JOURNAL = 'Clinica.wal'
+    POLITICA_FSYNC = 'grupo'    # 'sempre', 'grupo' (group commit) ou 'nunca'
+
+    def __init__(self, politica_fsync=None):
+        # 0. Recuperação: antes de qualquer DAO carregar índices a partir das Áreas de Dados
+        self.journal = journal_mod.Journal(self.ARQUIVO_JOURNAL, politica_fsync or self.POLITICA_FSYNC)
+        self.journal.recuperar()
+
+        # 1. Classes Raiz
+        self.cidades_db = cid_mod.Cidades()
+        self.especialidades_db = esp_mod.Especialidades()
+        self.diarias_db = dia_mod.Diarias()
+
+        # 2. Classes Dependentes (Resolvendo a ordem de dependência)
+        self.pacientes_db = pac_mod.Pacientes(cidades_manager=self.cidades_db)
+        self.exames_db = exa_mod.Exames(especialidades_manager=self.especialidades_db)
+        self.medicos_db = med_mod.Medicos(
+            cidades_manager=self.cidades_db,
+            especialidades_manager=self.especialidades_db
+        )
+
+        # Consultas (Depende de TODOS)
+        self.consultas_db = con_mod.Consultas(
+            pacientes_manager=self.pacientes_db,
+            medicos_manager=self.medicos_db,
+            exames_manager=self.exames_db,
+            diarias_manager=self.diarias_db,
+            especialidades_manager=self.especialidades_db
+        )
+
+        for dao in self.daos():
+            dao.definir_journal(self.journal)
+
+    def daos(self):
+        return [self.cidades_db, self.especialidades_db, self.diarias_db, self.pacientes_db,
+                self.exames_db, self.medicos_db, self.consultas_db]
+
+    def compactar(self):
+        """Compacta todas as tabelas (remove registros excluídos) e retorna os relatórios."""
+        return compactar_tabelas(self.daos())
+
+    def fechar(self):
+        for dao in self.daos():
+            dao.fechar()
+        self.journal.fechar()
@@ -1,12 +1,16 @@
 # Classes/Consultas.py - CÓDIGO FINAL E ESTÁVEL
 
 from ArvoreBinaria.BaseDados import BaseDados
+import ArvoreBinaria.perfil as perfil_mod
 # Importações de módulo para uso interno (objetos serão injetados)
 import Classes.Pacientes as pac_mod
 import Classes.Medicos as med_mod
 import Classes.Exames as exa_mod
 import Classes.Diarias as dia_mod
 import Classes.Especialidades as esp_mod
+from Classes.MotorRelatorios import MotorRelatorios
+from Classes.Registros import Consulta, ConsultaCompleta
+from Classes.AgregadosFaturamento import AgregadosFaturamento
 from datetime import datetime
 
 class Consultas(BaseDados):
@@ -14,7 +18,14 @@ class Consultas(BaseDados):
     Gerencia a tabela Consultas, totalmente injetada com todas as dependências.
     Implementa a lógica de Relatórios (Item 6) e Ordenação (Item 7).
     """
-    
+
+    # Layout de tamanho fixo para o motor binário (opcional; ative com FORMATO_BINARIO = True)
+    LAYOUT_BINARIO = [
+        ("codigo", "q"), ("cod_paciente", "q"), ("cod_medico", "q"), ("cod_exame", "q"),
+        ("data", "10s"), ("hora", "8s"), ("valor_total", "d"),
+    ]
+    FORMATO_BINARIO = False
+
     # CONSTRUTOR CORRIGIDO PARA INJEÇÃO DE DEPENDÊNCIA (DI)
     def __init__(self, pacientes_manager, medicos_manager, exames_manager, diarias_manager, especialidades_manager):
         super().__init__('Consultas')
@@ -23,29 +34,58 @@ class Consultas(BaseDados):
         self.exames_manager = exames_manager
         self.diarias_manager = diarias_manager 
         self.especialidades_manager = especialidades_manager
+
+        # Totais de faturamento por dia/médico/especialidade mantidos incrementalmente
+        self.agregados = AgregadosFaturamento(self)
         
     # --- FUNÇÕES AUXILIARES ---
 
+    def _definir_indices_secundarios(self):
+        """
+        Índices secundários: data (AAAAMMDD) para os relatórios por dia e por período,
+        e as chaves estrangeiras de médico e paciente (faturamento por médico/especialidade
+        e histórico do paciente).
+        """
+        return {
+            "data": lambda campos: self._limpar_data(campos[4]),
+            "cod_medico": lambda campos: int(campos[2]),
+            "cod_paciente": lambda campos: int(campos[1]),
+        }
+
+    @staticmethod
+    def _limpar_data(data_raw):
+        """Normaliza a data lida do arquivo para o formato AAAAMMDD (remove '/', '-' e espaços)."""
+        return data_raw.replace('/', '').replace('-', '').replace(' ', '').strip()
+
     def _deserializar(self, registro_string):
-        """Converte a string do disco em um dicionário básico."""
+        """Converte a string do disco em um registro Consulta (slots, acesso como dict)."""
         try:
-            campos = registro_string.split('|')
-            return {
-                "codigo": int(campos[0]), 
-                "cod_paciente": int(campos[1]), 
-                "cod_medico": int(campos[2]), 
-                "cod_exame": int(campos[3]),
-                "data": campos[4], # Data que pode vir com barras do arquivo
-                "hora": campos[5], 
-            }
+            campos = self._separar_campos(registro_string)
+            consulta = Consulta(
+                codigo=int(campos[0]), 
+                cod_paciente=int(campos[1]), 
+                cod_medico=int(campos[2]), 
+                cod_exame=int(campos[3]),
+                data=campos[4], # Data que pode vir com barras do arquivo
+                hora=campos[5], 
+            )
+            if len(campos) > 6:
+                consulta["valor_total"] = float(campos[6])
+            return consulta
         except Exception:
             return None
 
+    @staticmethod
+    def valor_agendado(consulta):
+        """Valor somado nos agregados: o gravado no agendamento ou, em registros antigos, o dos preços atuais."""
+        return consulta.get("valor_total", consulta.get("valor_total_a_pagar", 0.0))
+
     def _realizar_lookups(self, consulta_data):
         """
         Realiza todos os lookups e cálculos necessários (JOIN).
         Lança ValueError se alguma dependência essencial não for encontrada.
         """
+        consulta_data = ConsultaCompleta.de_registro(consulta_data)
         
         # 1. Lookup de Médico, Especialidade e Limite Diário
         medico_completo = self.medicos_manager.consultar_medico(consulta_data["cod_medico"])
@@ -95,29 +135,122 @@ class Consultas(BaseDados):
         cod_especialidade = medico.get("cod_especialidade")
         limite_diario = medico.get("limite_diario", 0)
         
-        diaria = self.diarias_manager.consultar_diaria(data, cod_especialidade)
-        vagas_ocupadas = diaria.get("quantidade", 0) 
-        
-        if vagas_ocupadas >= limite_diario:
-            print(f"ERRO: Limite de consultas diárias ({limite_diario}) para esta especialidade/dia atingido.")
-            return False
-            
-        if not all([self.pacientes_manager.buscar_por_chave(cod_paciente), 
-                     self.exames_manager.buscar_por_chave(cod_exame)]):
+        exame = self.exames_manager.consultar_exame(cod_exame)
+        if not all([self.pacientes_manager.buscar_por_chave(cod_paciente), exame]):
             print("ERRO: Paciente ou Exame não encontrado. Inclusão abortada.")
             return False
-        if self.buscar_por_chave(codigo) is not None:
-            print(f"ERRO: Consulta com código {codigo} já existe.")
-            return False
 
-        registro_formatado = f"{codigo}|{cod_paciente}|{cod_medico}|{cod_exame}|{data}|{hora}"
-        self.incluir(registro_formatado, codigo)
-        
-        self.diarias_manager.atualizar_quantidade(data, cod_especialidade, 1)
+        valor_total = round(medico.get("valor_consulta", 0.0) + exame["valor_exame"], 2)
+        registro_formatado = f"{codigo}|{cod_paciente}|{cod_medico}|{cod_exame}|{data}|{hora}|{valor_total}"
+        self._exigir_journal()
+        try:
+            # Consulta e contador de Diárias são gravados como uma unidade atômica (journal).
+            # Vaga e código são conferidos sob a trava de escrita: duas inclusões simultâneas
+            # não ocupam a mesma última vaga nem gravam o mesmo código.
+            with self._escrita():
+                diaria = self.diarias_manager.consultar_diaria(data, cod_especialidade)
+                vagas_ocupadas = diaria.get("quantidade", 0) 
+                
+                if vagas_ocupadas >= limite_diario:
+                    print(f"ERRO: Limite de consultas diárias ({limite_diario}) para esta especialidade/dia atingido.")
+                    return False
+                if not self.incluir(registro_formatado, codigo):
+                    print(f"ERRO: Consulta com código {codigo} já existe.")
+                    return False
+                if not self.diarias_manager.atualizar_quantidade(data, cod_especialidade, 1):
+                    raise RuntimeError(f"falha ao atualizar a diária {data}/{cod_especialidade}")
+                self.agregados.registrar(self._limpar_data(data), cod_medico, cod_especialidade, valor_total)
+        except Exception as e:
+            print(f"ERRO: Consulta {codigo} não agendada ({e}). Nenhuma alteração foi gravada.")
+            return False
         
         print(f"SUCESSO: Consulta {codigo} agendada. Vagas restantes: {limite_diario - (vagas_ocupadas + 1)}")
         return True
 
+    def incluir_consultas_lote(self, consultas):
+        """
+        Agendamento em lote (ex: a agenda semanal de um médico).
+        consultas: [(codigo, cod_paciente, cod_medico, cod_exame, data, hora), ...].
+        Valida tudo antes de gravar (médico, paciente, exame, vagas do dia contando as do
+        próprio lote), grava as aceitas com um único append e atualiza cada diária uma vez.
+        Retorna [(codigo, sucesso, mensagem), ...] na ordem recebida; se a gravação falhar,
+        o lote inteiro é desfeito pelo journal (RuntimeError se a tabela não tem um) e todas
+        as linhas voltam com sucesso=False.
+        """
+        consultas = list(consultas)
+        medicos, exames, pacientes, ocupadas = {}, {}, {}, {}
+        aceitas = {}
+        codigos_lote = set()
+
+        def validar(linha):
+            codigo, cod_paciente, cod_medico, cod_exame, data, _ = linha
+            if cod_medico not in medicos:
+                medicos[cod_medico] = self.medicos_manager.consultar_medico(cod_medico)
+            medico = medicos[cod_medico]
+            if not medico:
+                return "Médico não encontrado."
+            if cod_exame not in exames:
+                exames[cod_exame] = self.exames_manager.consultar_exame(cod_exame)
+            if cod_paciente not in pacientes:
+                pacientes[cod_paciente] = self.pacientes_manager.existe(cod_paciente)
+            if not (pacientes[cod_paciente] and exames[cod_exame]):
+                return "Paciente ou Exame não encontrado."
+            if codigo in codigos_lote or self.existe(codigo):
+                return f"Consulta com código {codigo} já existe."
+            valor_total = round(medico.get("valor_consulta", 0.0) + exames[cod_exame]["valor_exame"], 2)
+            registro_formatado = "|".join(str(campo) for campo in (*linha, valor_total))
+            erro = self.gerenciador_arquivo.validar_registro(registro_formatado)
+            if erro:
+                return erro
+
+            # Vaga reservada por último: com as verificações de incluir_lote já feitas acima,
+            # toda linha que chega aqui é gravada, e uma linha recusada não ocupa vaga do lote
+            cod_especialidade = medico.get("cod_especialidade")
+            limite_diario = medico.get("limite_diario", 0)
+            chave_diaria = (data, cod_especialidade)
+            if chave_diaria not in ocupadas:
+                ocupadas[chave_diaria] = self.diarias_manager.consultar_diaria(data, cod_especialidade).get("quantidade", 0)
+            if ocupadas[chave_diaria] >= limite_diario:
+                return f"Limite de consultas diárias ({limite_diario}) para esta especialidade/dia atingido."
+
+            ocupadas[chave_diaria] += 1
+            codigos_lote.add(codigo)
+            aceitas[codigo] = (chave_diaria, valor_total, registro_formatado)
+            return None
+
+        self._exigir_journal()
+        resultados = []
+        try:
+            with self._escrita():
+                resultados = self._incluir_lote_validado(
+                    "Consulta", consultas,
+                    formatar=lambda linha: aceitas[linha[0]][2],
+                    validar=validar,
+                )
+
+                # Diárias: um incremento por (data, especialidade), não um por consulta
+                incrementos = {}
+                for (codigo, sucesso, _), linha in zip(resultados, consultas):
+                    if sucesso:
+                        chave_diaria = aceitas[codigo][0]
+                        incrementos[chave_diaria] = incrementos.get(chave_diaria, 0) + 1
+                for (data, cod_especialidade), quantidade in incrementos.items():
+                    if not self.diarias_manager.atualizar_quantidade(data, cod_especialidade, quantidade):
+                        raise RuntimeError(f"falha ao atualizar a diária {data}/{cod_especialidade}")
+
+                for (codigo, sucesso, _), linha in zip(resultados, consultas):
+                    if sucesso:
+                        (data, cod_especialidade), valor_total, _ = aceitas[codigo]
+                        self.agregados.registrar(self._limpar_data(data), linha[2], cod_especialidade, valor_total)
+        except Exception as e:
+            # O journal já desfez o lote inteiro: nenhuma consulta dele foi agendada
+            print(f"ERRO: Lote de consultas não agendado ({e}). Nenhuma alteração foi gravada.")
+            if not resultados:
+                return [(linha[0], False, f"Lote não agendado: {e}") for linha in consultas]
+            return [(codigo, False, f"Lote não agendado: {e}") if sucesso else (codigo, sucesso, mensagem)
+                    for codigo, sucesso, mensagem in resultados]
+        return resultados
+
     def consultar_consulta(self, codigo):
         """Retorna a consulta enriquecida."""
         registro_string = self.buscar_por_chave(codigo)
@@ -127,8 +260,7 @@ class Consultas(BaseDados):
         if consulta_data is None: return None
         
         # CRÍTICO: Limpa a data do dado lido do arquivo antes de enriquecer
-        data_raw = consulta_data.get('data', '')
-        consulta_data['data'] = data_raw.replace('/', '').replace('-', '').replace(' ', '').strip()
+        consulta_data['data'] = self._limpar_data(consulta_data.get('data', ''))
         
         return self._realizar_lookups(consulta_data)
 
@@ -139,115 +271,163 @@ class Consultas(BaseDados):
             print(f"ERRO: Consulta {codigo} não encontrada para exclusão.")
             return False
 
-        if self.excluir_por_chave(codigo):
-            cod_especialidade = consulta.get("cod_especialidade")
-            data = consulta["data"]
-            
-            if cod_especialidade and self.diarias_manager.atualizar_quantidade(data, cod_especialidade, -1):
-                print(f"SUCESSO: Consulta {codigo} excluída e vaga liberada no controle diário.")
-                return True
-            else:
-                print(f"AVISO: Consulta {codigo} excluída, mas falha ao decrementar vaga no Diárias. Verifique a diária {data}/{cod_especialidade}.")
-                return True
-        else:
+        cod_especialidade = consulta.get("cod_especialidade")
+        data = consulta["data"]
+        self._exigir_journal()
+        try:
+            # Exclusão lógica e liberação da vaga em Diárias: ou as duas, ou nenhuma
+            with self._escrita():
+                if not self.excluir_por_chave(codigo):
+                    return False
+                if not (cod_especialidade and self.diarias_manager.atualizar_quantidade(data, cod_especialidade, -1)):
+                    raise RuntimeError(f"falha ao decrementar a vaga da diária {data}/{cod_especialidade}")
+                # Subtrai o que o agendamento somou, não o valor pelos preços de hoje
+                self.agregados.registrar(data, consulta["cod_medico"], cod_especialidade,
+                                         self.valor_agendado(consulta), sinal=-1)
+        except Exception as e:
+            print(f"ERRO: Consulta {codigo} não excluída ({e}). Nenhuma alteração foi gravada.")
             return False
 
+        print(f"SUCESSO: Consulta {codigo} excluída e vaga liberada no controle diário.")
+        return True
+
+    def _apos_desfazer(self):
+        super()._apos_desfazer()
+        # Os agregados podem ter contado a consulta desfeita: recalculados no próximo uso
+        self.agregados.invalidar()
+
+    def compactar(self):
+        relatorio = super().compactar()
+        # Os agregados não mudam, mas o carimbo de Consultas.txt sim
+        self.agregados.salvar()
+        return relatorio
+
+    def fechar(self):
+        self.agregados.fechar()
+        super().fechar()
+
     # --- MÉTODOS DE RELATÓRIO (Item 6 e 7) ---
 
-    def _obter_consultas_com_valor(self):
-        """Lê todas as consultas ATIVAS e as enriquece. Útil para qualquer relatório."""
-        registros_strings = self.ler_todos() 
-        consultas_completas = []
-        
-        print(f"\n[DEBUG] Total de registros ATIVOS lidos do disco (Consulta): {len(registros_strings)}")
-        
-        for reg_str in registros_strings:
+    def iterar_consultas(self):
+        """Consultas ativas sem JOIN (data em AAAAMMDD), na ordem do arquivo."""
+        for reg_str in self.iterar_todos():
             consulta_data = self._deserializar(reg_str)
-            if consulta_data:
-                # CRÍTICO: Limpa a data do dado lido do arquivo para o formato AAAAMMDD
-                data_raw = consulta_data.get('data', '')
-                consulta_data['data'] = data_raw.replace('/', '').replace('-', '').replace(' ', '').strip()
-                
-                try:
-                    consulta_completa = self._realizar_lookups(consulta_data)
-                    print(f"[DEBUG] Sucesso JOIN Cód: {consulta_completa['codigo']} | Data: {consulta_completa['data']}")
-                    consultas_completas.append(consulta_completa)
-                except Exception as e:
-                    print(f"[AVISO CRÍTICO] Falha no JOIN/Lookup da Consulta {consulta_data.get('codigo')}. Erro: {e}. O registro é ignorado no faturamento.")
-                    
-        return consultas_completas
+            if consulta_data is not None:
+                consulta_data['data'] = self._limpar_data(consulta_data.get('data', ''))
+                yield consulta_data
 
-    def faturamento_por_dia(self, data):
+    @perfil_mod.perfilado
+    def iterar_consultas_com_valor(self, filtro=None, registros=None, progresso=None, cancelar=None):
+        """
+        Versão em streaming de _obter_consultas_com_valor: gera cada consulta enriquecida
+        sem acumular a tabela em memória (para exportações e totais de relatórios grandes).
+        progresso/cancelar: acompanhamento em segundo plano (ver MotorRelatorios).
+        """
+        motor = MotorRelatorios(self, progresso, cancelar)
+        return motor.iterar_consultas_com_valor(filtro, registros)
+
+    def _obter_consultas_com_valor(self, filtro=None, registros=None, progresso=None, cancelar=None):
+        """
+        Lê as consultas ATIVAS e enriquece (HASH JOIN) apenas as que passam no filtro.
+        O filtro recebe o registro bruto (antes do JOIN). Útil para qualquer relatório.
+        """
+        return list(self.iterar_consultas_com_valor(filtro, registros, progresso, cancelar))
+
+    @perfil_mod.perfilado
+    def faturamento_por_dia(self, data, somente_totais=False, progresso=None, cancelar=None):
         """
         Item 6.1: Retorna a lista de consultas detalhadas do dia.
-        CORRIGIDO: Retorna a LISTA filtrada.
+        Lê apenas os registros do dia, pelo índice secundário de data.
+        Com somente_totais=True retorna {"quantidade", "valor_total"} dos agregados, sem ler Consultas.
         """
-        consultas = self._obter_consultas_com_valor()
-        
-        # Filtra as consultas pela data (AAAAMMDD limpa)
-        relatorio_filtrado = [cons for cons in consultas if cons.get('data') == data]
-        
-        return relatorio_filtrado
+        if somente_totais:
+            return self.agregados.totais_dia(data)
+        return list(self.iterar_faturamento_por_dia(data, progresso, cancelar))
+
+    @perfil_mod.perfilado
+    def iterar_faturamento_por_dia(self, data, progresso=None, cancelar=None):
+        return self.iterar_consultas_com_valor(registros=self.iterar_por_indice("data", data, data),
+                                               progresso=progresso, cancelar=cancelar)
 
-    def faturamento_por_periodo(self, data_inicial, data_final):
+    @perfil_mod.perfilado
+    def faturamento_por_periodo(self, data_inicial, data_final, somente_totais=False, progresso=None, cancelar=None):
         """
         Item 6.2: Retorna a lista de consultas detalhadas do período.
-        CORRIGIDO: Retorna a LISTA filtrada.
+        Lê apenas os registros do período, pelo índice secundário de data.
+        Com somente_totais=True soma os agregados diários do período (O(dias)).
         """
+        if somente_totais:
+            return self.agregados.totais_periodo(data_inicial, data_final)
+        return list(self.iterar_faturamento_por_periodo(data_inicial, data_final, progresso, cancelar))
+
+    @perfil_mod.perfilado
+    def iterar_faturamento_por_periodo(self, data_inicial, data_final, progresso=None, cancelar=None):
         if data_inicial > data_final:
             data_inicial, data_final = data_final, data_inicial
-            
-        consultas = self._obter_consultas_com_valor()
-        
-        # Filtra as consultas pelo período de datas (AAAAMMDD limpas)
-        relatorio_filtrado = [
-            cons for cons in consultas 
-            if data_inicial <= cons.get('data', '') <= data_final
-        ]
 
-        return relatorio_filtrado
+        # Percorre o intervalo de datas (AAAAMMDD limpas) no índice secundário, em ordem de data
+        return self.iterar_consultas_com_valor(registros=self.iterar_por_indice("data", data_inicial, data_final),
+                                               progresso=progresso, cancelar=cancelar)
         
-    def faturamento_por_medico(self, cod_medico):
+    @perfil_mod.perfilado
+    def faturamento_por_medico(self, cod_medico, somente_totais=False, progresso=None, cancelar=None):
         """
         Item 6.3: Retorna a lista de consultas detalhadas do médico.
-        CORRIGIDO: Retorna a LISTA filtrada.
+        Lê apenas as consultas do médico, pelo índice secundário cod_medico.
+        Com somente_totais=True retorna os totais agregados do médico.
         """
-        consultas = self._obter_consultas_com_valor()
-        relatorio_filtrado = [cons for cons in consultas if cons.get('cod_medico') == cod_medico]
-        return relatorio_filtrado
+        if somente_totais:
+            return self.agregados.totais_medico(cod_medico)
+        return list(self.iterar_faturamento_por_medico(cod_medico, progresso, cancelar))
+
+    @perfil_mod.perfilado
+    def iterar_faturamento_por_medico(self, cod_medico, progresso=None, cancelar=None):
+        return self.iterar_consultas_com_valor(registros=self.iterar_por_indice("cod_medico", cod_medico, cod_medico),
+                                               progresso=progresso, cancelar=cancelar)
 
-    def faturamento_por_especialidade(self, cod_especialidade):
+    @perfil_mod.perfilado
+    def faturamento_por_especialidade(self, cod_especialidade, somente_totais=False, progresso=None, cancelar=None):
         """
         Item 6.4: Retorna a lista de consultas detalhadas da especialidade.
-        CORRIGIDO: Retorna a LISTA filtrada.
+        Resolve primeiro os médicos da especialidade e lê apenas as consultas deles
+        pelo índice secundário cod_medico.
+        Com somente_totais=True retorna os totais agregados da especialidade.
         """
-        consultas = self._obter_consultas_com_valor()
-        relatorio_filtrado = [cons for cons in consultas if cons.get('cod_especialidade') == cod_especialidade]
-        return relatorio_filtrado
+        if somente_totais:
+            return self.agregados.totais_especialidade(cod_especialidade)
+        return list(self.iterar_faturamento_por_especialidade(cod_especialidade, progresso, cancelar))
+
+    @perfil_mod.perfilado
+    def iterar_faturamento_por_especialidade(self, cod_especialidade, progresso=None, cancelar=None):
+        motor = MotorRelatorios(self, progresso, cancelar)
+        medicos = motor.medicos_da_especialidade(cod_especialidade)
+        if not medicos:
+            return iter(())
+        registros = (
+            registro
+            for cod_medico in sorted(medicos)
+            for registro in self.iterar_por_indice("cod_medico", cod_medico, cod_medico)
+        )
+        return motor.iterar_consultas_com_valor(registros=registros)
+
+    @perfil_mod.perfilado
+    def historico_paciente(self, cod_paciente, progresso=None, cancelar=None):
+        """Todas as consultas do paciente (enriquecidas), pelo índice secundário cod_paciente."""
+        return list(self.iterar_historico_paciente(cod_paciente, progresso, cancelar))
+
+    @perfil_mod.perfilado
+    def iterar_historico_paciente(self, cod_paciente, progresso=None, cancelar=None):
+        return self.iterar_consultas_com_valor(registros=self.iterar_por_indice("cod_paciente", cod_paciente, cod_paciente),
+                                               progresso=progresso, cancelar=cancelar)
     
-    def relatorio_ordenado(self):
+    @perfil_mod.perfilado
+    def relatorio_ordenado(self, progresso=None, cancelar=None):
         """
         Item 7: Retorna a lista completa de consultas ordenadas por código (usando índice).
         """
-        
-        chaves_ordenadas = self.indice.percurso_em_ordem() 
-        lista_consultas_ordenadas = []
-        
-        for codigo_consulta, endereco_byte in chaves_ordenadas:
-            
-            registro_string = self.gerenciador_arquivo.ler_registro_por_endereco(endereco_byte)
-            if registro_string is None: continue 
-            
-            consulta_data = self._deserializar(registro_string)
-            if consulta_data:
-                # Limpa a data do dado lido do arquivo para o formato AAAAMMDD
-                data_raw = consulta_data.get('data', '')
-                consulta_data['data'] = data_raw.replace('/', '').replace('-', '').replace(' ', '').strip()
-
-                try:
-                    consulta_completa = self._realizar_lookups(consulta_data)
-                    lista_consultas_ordenadas.append(consulta_completa)
-                except Exception as e:
-                    print(f"[AVISO CRÍTICO] Falha na Consulta {codigo_consulta} durante a ordenação. Erro: {e}")
-
-        return lista_consultas_ordenadas
\ No newline at end of file
+        return MotorRelatorios(self, progresso, cancelar).relatorio_ordenado()
+
+    @perfil_mod.perfilado
+    def iterar_relatorio_ordenado(self, progresso=None, cancelar=None):
+        """Item 7 em streaming: gera as consultas enriquecidas em ordem de código."""
+        return MotorRelatorios(self, progresso, cancelar).iterar_relatorio_ordenado()
@@ -3,8 +3,20 @@
 from ArvoreBinaria.BaseDados import BaseDados
 
 class Diarias(BaseDados):
-  
-    
+
+    # Chave composta "data-especialidade" (não numérica)
+    TIPO_CHAVE = str
+
+    # Layout de tamanho fixo para o motor binário (opcional; ative com FORMATO_BINARIO = True)
+    LAYOUT_BINARIO = [("chave", "32s"), ("quantidade", "q")]
+    FORMATO_BINARIO = False
+
+    # A quantidade é gravada com largura fixa para que o contador seja atualizado no próprio lugar
+    LARGURA_QUANTIDADE = 6
+
+    # Arquivos antigos regravavam o contador por append: a última linha é a vigente
+    DUPLICADAS_MANTER_ULTIMA = True
+
     def __init__(self):
         super().__init__('Diarias')
 
@@ -16,7 +28,7 @@ class Diarias(BaseDados):
      
         try:
          
-            chave, quantidade = registro_string.split('|')
+            chave, quantidade = self._separar_campos(registro_string)
             return {
                 "chave": chave, 
                 "quantidade": int(quantidade) 
@@ -36,6 +48,11 @@ class Diarias(BaseDados):
         return self._deserializar(registro_string)
 
     def atualizar_quantidade(self, data, cod_especialidade, delta):
+        # Ler o contador e gravar o novo valor é uma única operação para as outras threads
+        with self._escrita():
+            return self._atualizar_quantidade(data, cod_especialidade, delta)
+
+    def _atualizar_quantidade(self, data, cod_especialidade, delta):
         
         chave = self._gerar_chave_diaria(data, cod_especialidade)
         diaria_atual = self.consultar_diaria(data, cod_especialidade)
@@ -46,27 +63,56 @@ class Diarias(BaseDados):
             print("AVISO: Tentativa de decrementar a quantidade de consultas para um valor negativo. Corrigido para 0.")
             nova_quantidade = 0 
             
-        registro_formatado = f"{chave}|{nova_quantidade}"
+        registro_formatado = f"{chave}|{nova_quantidade:0{self.LARGURA_QUANTIDADE}d}"
         
         try:
-            
+            # Contador existente: sobrescreve no mesmo endereço (O(1) de E/S, o arquivo não cresce)
+            if self.atualizar_por_chave(chave, registro_formatado):
+                return True
+
+            # Contador novo, ou linha antiga sem largura fixa: grava uma linha no formato fixo
+            if self.existe(chave):
+                self.excluir_por_chave(chave)
             self.incluir(registro_formatado, chave)
             return True
         except Exception as e:
             print(f"Erro ao atualizar diária {chave}: {e}")
             return False
 
+    def gravar_contadores(self, contadores):
+        """
+        Grava de uma vez os contadores {chave: quantidade} já calculados (importação em massa).
+        Contadores existentes são sobrescritos no próprio lugar; os novos vão num único append
+        e são indexados numa passada.
+        """
+        with self._escrita():
+            novos = []
+            for chave, quantidade in contadores.items():
+                registro_formatado = f"{chave}|{max(quantidade, 0):0{self.LARGURA_QUANTIDADE}d}"
+                if self.atualizar_por_chave(chave, registro_formatado):
+                    continue
+                if self.existe(chave):
+                    self.excluir_por_chave(chave) # Linha antiga sem largura fixa
+                novos.append(registro_formatado)
+
+            if novos:
+                endereco_inicial = self.gerenciador_arquivo.tamanho_arquivo()
+                self.gerenciador_arquivo.gravar_lote(novos)
+                self.indexar_a_partir_de(endereco_inicial)
+            return len(contadores)
+
     
 
+    def iterar_diarias(self):
+        """Contadores {chave: "AAAAMMDD-especialidade", quantidade}, na ordem do arquivo."""
+        for reg_str in self.iterar_todos():
+            registro = self._deserializar(reg_str)
+            if registro is not None:
+                yield registro
+
     def listar_todas(self):
         
-        registros_strings = self.ler_todos()
-        diarias_listadas = [
-            self._deserializar(reg_str) 
-            for reg_str in registros_strings 
-            if self._deserializar(reg_str) is not None
-        ]
-        return diarias_listadas
+        return list(self.iterar_diarias())
 
     def excluir_diaria(self, data, cod_especialidade):
         
@@ -1,10 +1,17 @@
 
 
 from ArvoreBinaria.BaseDados import BaseDados
+from Classes.Registros import Especialidade
 
 class Especialidades(BaseDados):
-    
-    
+
+    # Layout de tamanho fixo para o motor binário (opcional; ative com FORMATO_BINARIO = True)
+    LAYOUT_BINARIO = [("codigo", "q"), ("descricao", "60s"), ("valor_consulta", "d"), ("limite_diario", "q")]
+    FORMATO_BINARIO = False
+
+    # Tabela pequena e muito lida nos JOINs: mantém os registros desserializados em memória
+    TAMANHO_CACHE = 1024
+
     def __init__(self):
         super().__init__('Especialidades')
 
@@ -16,40 +23,52 @@ class Especialidades(BaseDados):
 
         # Salva o valor da consulta e limite diário
         registro_formatado = f"{codigo}|{descricao}|{valor_consulta}|{limite_diario}"
-        self.incluir(registro_formatado, codigo)
+        try:
+            incluido = self.incluir(registro_formatado, codigo)
+        except ValueError as e:
+            print(f"ERRO: Especialidade {codigo} não incluída: {e}")
+            return False
+        if not incluido:
+            print(f"ERRO: Especialidade com código {codigo} já existe.")
+            return False
         print(f"SUCESSO: Especialidade {descricao} ({codigo}) incluída.")
         return True
     
+    def incluir_especialidades_lote(self, especialidades):
+        """especialidades: [(codigo, descricao, valor_consulta, limite_diario), ...]."""
+        return self._incluir_lote_validado(
+            "Especialidade", especialidades,
+            formatar=lambda linha: "|".join(str(campo) for campo in linha),
+        )
+
     def _deserializar(self, registro_string):
        
         try:
-            campos = registro_string.split('|')
-            return {
-                "codigo": int(campos[0]),
-                "descricao": campos[1],
+            campos = self._separar_campos(registro_string)
+            return Especialidade(
+                codigo=int(campos[0]),
+                descricao=campos[1],
                 # CRÍTICO: Conversão para float e int para cálculos
-                "valor_consulta": float(campos[2]), 
-                "limite_diario": int(campos[3]), 
-            }
+                valor_consulta=float(campos[2]), 
+                limite_diario=int(campos[3]), 
+            )
         except Exception:
             return None
 
     def consultar_especialidade(self, codigo):
         
-        registro_string = self.buscar_por_chave(codigo)
-        if registro_string is None:
-            return None
-        return self._deserializar(registro_string)
+        return self._obter_desserializado(codigo)
+
+    def iterar_especialidades(self):
+        """Especialidades ativas com valor da consulta e limite diário, na ordem do arquivo."""
+        for reg_str in self.iterar_todos():
+            registro = self._deserializar(reg_str)
+            if registro is not None:
+                yield registro
 
     def listar_todas(self):
-     
-        registros_strings = self.ler_todos()
-        especialidades_listadas = [
-            self._deserializar(reg_str) 
-            for reg_str in registros_strings 
-            if self._deserializar(reg_str) is not None
-        ]
-        return especialidades_listadas
+        
+        return list(self.iterar_especialidades())
 
     def excluir_especialidade(self, codigo):
         if self.excluir_por_chave(codigo):
@@ -1,11 +1,18 @@
 
 
 from ArvoreBinaria.BaseDados import BaseDados
+from Classes.Registros import Exame
 
 
 class Exames(BaseDados):
-  
-    
+
+    # Layout de tamanho fixo para o motor binário (opcional; ative com FORMATO_BINARIO = True)
+    LAYOUT_BINARIO = [("codigo", "q"), ("descricao", "60s"), ("cod_especialidade", "q"), ("valor_exame", "d")]
+    FORMATO_BINARIO = False
+
+    # Tabela pequena e muito lida nos JOINs: mantém os registros desserializados em memória
+    TAMANHO_CACHE = 1024
+
     def __init__(self, especialidades_manager):
         super().__init__('Exames')
         
@@ -16,14 +23,14 @@ class Exames(BaseDados):
     def _deserializar(self, registro_string):
         
         try:
-            campos = registro_string.split('|')
-            return {
-                "codigo": int(campos[0]),
-                "descricao": campos[1],
-                "cod_especialidade": int(campos[2]),
+            campos = self._separar_campos(registro_string)
+            return Exame(
+                codigo=int(campos[0]),
+                descricao=campos[1],
+                cod_especialidade=int(campos[2]),
                
-                "valor_exame": float(campos[3]), 
-            }
+                valor_exame=float(campos[3]), 
+            )
         except Exception:
             return None
     
@@ -42,17 +49,35 @@ class Exames(BaseDados):
 
         
         registro_formatado = f"{codigo}|{descricao}|{cod_especialidade}|{valor_exame}"
-        self.incluir(registro_formatado, codigo)
+        try:
+            incluido = self.incluir(registro_formatado, codigo)
+        except ValueError as e:
+            print(f"ERRO: Exame {codigo} não incluído: {e}")
+            return False
+        if not incluido:
+            print(f"ERRO: Exame com código {codigo} já existe.")
+            return False
         print(f"SUCESSO: Exame '{descricao}' ({codigo}) incluído.")
         return True
 
+    def incluir_exames_lote(self, exames):
+        """exames: [(codigo, descricao, cod_especialidade, valor_exame), ...]."""
+        def validar(linha):
+            if not self.especialidades_manager.buscar_por_chave(linha[2]):
+                return f"Código da Especialidade {linha[2]} não encontrado."
+            return None
+
+        return self._incluir_lote_validado(
+            "Exame", exames,
+            formatar=lambda linha: "|".join(str(campo) for campo in linha),
+            validar=validar,
+        )
+
     def consultar_exame(self, codigo):
         
-        registro_string = self.buscar_por_chave(codigo)
-        if registro_string is None:
-            return None 
-        
-        exame_data = self._deserializar(registro_string)
+        # O cache guarda o exame sem o enriquecimento: a descrição da especialidade
+        # vem do cache de Especialidades, que é invalidado de forma independente
+        exame_data = self._obter_desserializado(codigo)
         if exame_data is None:
             return None
         
@@ -65,20 +90,18 @@ class Exames(BaseDados):
             
         return exame_data
     
-    def listar_todos(self):
-     
-        registros_strings = self.ler_todos()
-        exames_completos = []
-        
-        for reg_str in registros_strings:
+    def iterar_exames(self):
+        """Exames ativos com a descrição da especialidade, na ordem do arquivo."""
+        for reg_str in self.iterar_todos():
             exame_data = self._deserializar(reg_str)
             if exame_data:
-              
                 especialidade = self.especialidades_manager.consultar_especialidade(exame_data["cod_especialidade"])
                 exame_data["especialidade_desc"] = especialidade["descricao"] if especialidade else "N/A"
-                
-                exames_completos.append(exame_data)
-        return exames_completos
+                yield exame_data
+
+    def listar_todos(self):
+
+        return list(self.iterar_exames())
 
     def excluir_exame(self, codigo):
         
@@ -0,0 +1,308 @@
+
+import csv
+import json
+import os
+
+
+class ImportadorLote:
+    """
+    Importação em massa de dados históricos (CSV com cabeçalho ou JSONL), por entidade.
+
+    Diferente de chamar incluir_* linha a linha, as chaves estrangeiras são validadas
+    contra conjuntos de chaves em memória (montados uma vez a partir dos índices), os
+    registros são gravados em lotes grandes (um write por lote), indexados numa passada
+    por lote e, para Consultas, os contadores de Diárias são calculados em memória e
+    gravados de uma vez por lote.
+
+    Exemplo:
+        importador = ImportadorLote(Clinica())
+        importador.importar('pacientes', 'pacientes.csv')
+        importador.importar('consultas', 'historico.jsonl')
+    """
+
+    TAMANHO_LOTE = 10000
+    MAXIMO_ERROS_LISTADOS = 100
+
+    # entidade -> (atributo do DAO na Clinica, campos na ordem do registro em disco;
+    # Consultas ainda recebe o valor total do agendamento, calculado na validação)
+    ENTIDADES = {
+        "cidades": ("cidades_db", [("codigo", int), ("descricao", str), ("estado", str)]),
+        "especialidades": ("especialidades_db", [
+            ("codigo", int), ("descricao", str), ("valor_consulta", float), ("limite_diario", int),
+        ]),
+        "pacientes": ("pacientes_db", [
+            ("codigo", int), ("nome", str), ("data_nascimento", str), ("endereco", str),
+            ("telefone", str), ("cod_cidade", int), ("peso", float), ("altura", float),
+        ]),
+        "medicos": ("medicos_db", [
+            ("codigo", int), ("nome", str), ("endereco", str), ("telefone", str),
+            ("cod_cidade", int), ("cod_especialidade", int),
+        ]),
+        "exames": ("exames_db", [
+            ("codigo", int), ("descricao", str), ("cod_especialidade", int), ("valor_exame", float),
+        ]),
+        "consultas": ("consultas_db", [
+            ("codigo", int), ("cod_paciente", int), ("cod_medico", int), ("cod_exame", int),
+            ("data", str), ("hora", str),
+        ]),
+    }
+
+    def __init__(self, clinica, tamanho_lote=None):
+        self.clinica = clinica
+        self.tamanho_lote = tamanho_lote or self.TAMANHO_LOTE
+
+    # --- LEITURA DO ARQUIVO DE ORIGEM ---
+
+    @staticmethod
+    def _formato_do_arquivo(caminho):
+        extensao = os.path.splitext(caminho)[1].lower()
+        if extensao == '.csv':
+            return 'csv'
+        if extensao in ('.jsonl', '.ndjson', '.json'):
+            return 'jsonl'
+        raise ValueError(f"Formato de arquivo não reconhecido: {caminho}. Use .csv ou .jsonl.")
+
+    @staticmethod
+    def _ler_linhas(caminho, formato, delimitador):
+        """Gera (numero_linha, dicionario_de_campos) ou (numero_linha, None) para linhas ilegíveis."""
+        if formato == 'csv':
+            with open(caminho, 'r', encoding='utf-8-sig', newline='') as f:
+                leitor = csv.DictReader(f, delimiter=delimitador)
+                for linha in leitor:
+                    yield leitor.line_num, linha
+        elif formato == 'jsonl':
+            with open(caminho, 'r', encoding='utf-8') as f:
+                for numero, texto in enumerate(f, start=1):
+                    if not texto.strip():
+                        continue
+                    try:
+                        linha = json.loads(texto)
+                    except ValueError:
+                        linha = None
+                    yield numero, linha if isinstance(linha, dict) else None
+        else:
+            raise ValueError(f"Formato inválido: {formato}. Use 'csv' ou 'jsonl'.")
+
+    @staticmethod
+    def _converter(campos, linha):
+        valores = []
+        for nome, tipo in campos:
+            valor = linha.get(nome)
+            if valor is None or valor == '':
+                raise ValueError(f"campo '{nome}' ausente")
+            if tipo is str:
+                valor = str(valor).strip()
+                # O separador e a quebra de linha corromperiam o registro na Área de Dados
+                if '|' in valor or '\n' in valor:
+                    raise ValueError(f"campo '{nome}' contém '|' ou quebra de linha")
+            else:
+                try:
+                    valor = tipo(valor)
+                except (TypeError, ValueError):
+                    raise ValueError(f"campo '{nome}' inválido: {valor!r}") from None
+            valores.append(valor)
+        return valores
+
+    # --- CONJUNTOS DE CHAVES EM MEMÓRIA ---
+
+    @staticmethod
+    def _chaves(dao):
+        return {chave for chave, _ in dao.pares_em_ordem()}
+
+    def _preparar(self, entidade):
+        """
+        Carrega as chaves necessárias à validação e retorna (validar, reservar): validar(valores)
+        confere as chaves estrangeiras e reservar(valores), chamado só depois de todas as outras
+        verificações da linha (None se a entidade não tem o que reservar), ocupa a vaga do dia.
+        Ambos retornam a mensagem de erro ou None.
+        """
+        k = self.clinica
+
+        if entidade in ("cidades", "especialidades"):
+            return (lambda valores: None), None
+
+        if entidade == "pacientes":
+            cidades = self._chaves(k.cidades_db)
+            return (lambda valores: None if valores[5] in cidades else f"Cidade {valores[5]} não encontrada"), None
+
+        if entidade == "medicos":
+            cidades = self._chaves(k.cidades_db)
+            especialidades = self._chaves(k.especialidades_db)
+
+            def validar_medico(valores):
+                if valores[4] not in cidades:
+                    return f"Cidade {valores[4]} não encontrada"
+                if valores[5] not in especialidades:
+                    return f"Especialidade {valores[5]} não encontrada"
+                return None
+            return validar_medico, None
+
+        if entidade == "exames":
+            especialidades = self._chaves(k.especialidades_db)
+            return (lambda valores: None if valores[2] in especialidades else f"Especialidade {valores[2]} não encontrada"), None
+
+        # Consultas: médico -> especialidade -> (valor, limite), exames e os contadores de Diárias
+        especialidades = {e["codigo"]: e for e in k.especialidades_db.iterar_especialidades()}
+        medicos = {}
+        for registro in k.medicos_db.iterar_todos():
+            medico = k.medicos_db._deserializar(registro)
+            if medico is not None:
+                medicos[medico["codigo"]] = medico["cod_especialidade"]
+        exames = {}
+        for registro in k.exames_db.iterar_todos():
+            exame = k.exames_db._deserializar(registro)
+            if exame is not None:
+                exames[exame["codigo"]] = exame["valor_exame"]
+        pacientes = self._chaves(k.pacientes_db)
+        self._iniciar_lote()
+        consultas = k.consultas_db
+
+        def validar_consulta(valores):
+            _, cod_paciente, cod_medico, cod_exame, _, _ = valores
+            cod_especialidade = medicos.get(cod_medico)
+            if cod_especialidade is None:
+                return f"Médico {cod_medico} não encontrado"
+            if cod_paciente not in pacientes:
+                return f"Paciente {cod_paciente} não encontrado"
+            valor_exame = exames.get(cod_exame)
+            if valor_exame is None:
+                return f"Exame {cod_exame} não encontrado"
+            # O valor do agendamento é gravado no próprio registro (último campo)
+            especialidade = especialidades.get(cod_especialidade)
+            valor_consulta = especialidade["valor_consulta"] if especialidade else 0.0
+            valores.append(round(valor_consulta + valor_exame, 2))
+            return None
+
+        def reservar_vaga(valores):
+            _, _, cod_medico, _, data, _, valor_total = valores
+            cod_especialidade = medicos[cod_medico]
+            especialidade = especialidades.get(cod_especialidade)
+            limite_diario = especialidade["limite_diario"] if especialidade else 0
+
+            chave_diaria = k.diarias_db._gerar_chave_diaria(data, cod_especialidade)
+            if chave_diaria not in self._contadores:
+                # Lido sob a trava do lote: inclusões entre um lote e outro já estão contadas
+                self._contadores[chave_diaria] = k.diarias_db.consultar_diaria(data, cod_especialidade)["quantidade"]
+            ocupadas = self._contadores[chave_diaria]
+            if ocupadas >= limite_diario:
+                return f"Limite diário ({limite_diario}) atingido em {data} para a especialidade {cod_especialidade}"
+            self._contadores[chave_diaria] = self._contadores_alterados[chave_diaria] = ocupadas + 1
+
+            # Aplicado nos agregados só depois da gravação do lote (_gravar_lote)
+            self._agregados_pendentes.append((consultas._limpar_data(data), cod_medico, cod_especialidade, valor_total))
+            return None
+        return validar_consulta, reservar_vaga
+
+    def _iniciar_lote(self):
+        """Descarta o estado de Consultas do lote anterior (já gravado ou desfeito)."""
+        self._contadores = {}
+        self._contadores_alterados = {}
+        self._agregados_pendentes = []
+
+    # --- IMPORTAÇÃO ---
+
+    def importar(self, entidade, caminho, formato=None, delimitador=',', progresso=None):
+        """
+        Importa o arquivo para a entidade e retorna um relatório:
+        {"entidade", "lidos", "importados", "rejeitados", "interrompido", "erros": [(linha, mensagem), ...]}.
+        Linhas rejeitadas (chave repetida, chave estrangeira inexistente, campo inválido,
+        limite diário atingido) não interrompem a importação.
+
+        Cada lote de tamanho_lote linhas (registros, índice e, para Consultas, Diárias e
+        agregados) é uma transação própria feita com a trava de escrita da tabela: o journal
+        e a trava são liberados entre um lote e outro. Uma falha no meio desfaz só o lote
+        corrente; os anteriores ficam gravados e o relatório sai com "interrompido" preenchido.
+        progresso(relatorio), se informado, é chamado após cada lote gravado.
+        """
+        if entidade not in self.ENTIDADES:
+            raise ValueError(f"Entidade inválida: {entidade}. Use {sorted(self.ENTIDADES)}.")
+        atributo, campos = self.ENTIDADES[entidade]
+        dao = getattr(self.clinica, atributo)
+        dao._exigir_journal() # Uma falha desfaz o lote corrente
+        formato = formato or self._formato_do_arquivo(caminho)
+
+        relatorio = {"entidade": entidade, "lidos": 0, "importados": 0, "rejeitados": 0,
+                     "interrompido": None, "erros": []}
+        validar, reservar = self._preparar(entidade)
+        pendentes = []
+        try:
+            for numero, linha in self._ler_linhas(caminho, formato, delimitador):
+                relatorio["lidos"] += 1
+                if linha is None:
+                    self._rejeitar(relatorio, numero, "linha ilegível")
+                    continue
+                try:
+                    valores = self._converter(campos, linha)
+                except ValueError as e:
+                    self._rejeitar(relatorio, numero, str(e))
+                    continue
+                pendentes.append((numero, valores))
+                if len(pendentes) >= self.tamanho_lote:
+                    self._gravar_lote(entidade, dao, validar, reservar, pendentes, relatorio, progresso)
+                    pendentes = []
+            if pendentes:
+                self._gravar_lote(entidade, dao, validar, reservar, pendentes, relatorio, progresso)
+        except Exception as e:
+            if not relatorio["lidos"]:
+                raise # Arquivo nem chegou a ser lido: nada a relatar
+            relatorio["interrompido"] = str(e)
+        finally:
+            dao.salvar_indice()
+            if entidade == "consultas":
+                self.clinica.diarias_db.salvar_indice()
+                dao.agregados.salvar()
+
+        for numero, erro in relatorio["erros"]:
+            print(f"ERRO: {entidade}, linha {numero}: {erro}")
+        if relatorio["interrompido"] is not None:
+            print(f"ERRO: Importação de {entidade} interrompida após {relatorio['lidos']} linhas lidas "
+                  f"({relatorio['interrompido']}). {relatorio['importados']} registros de lotes anteriores "
+                  f"ficaram gravados; o lote corrente foi desfeito.")
+        else:
+            print(f"SUCESSO: {relatorio['importados']} de {relatorio['lidos']} registros importados em {entidade} "
+                  f"({relatorio['rejeitados']} rejeitados).")
+        return relatorio
+
+    def _rejeitar(self, relatorio, numero, erro):
+        relatorio["rejeitados"] += 1
+        if len(relatorio["erros"]) < self.MAXIMO_ERROS_LISTADOS:
+            relatorio["erros"].append((numero, erro))
+
+    def _gravar_lote(self, entidade, dao, validar, reservar, pendentes, relatorio, progresso):
+        gerenciador = dao.gerenciador_arquivo
+        with dao._escrita():
+            # Chaves e contadores conferidos já sob a trava: ninguém grava entre a validação e o append
+            if entidade == "consultas":
+                self._iniciar_lote()
+            chaves_lote = set()
+            lote = []
+            for numero, valores in pendentes:
+                if valores[0] in chaves_lote or dao.indice.buscar(valores[0]) is not None:
+                    erro = f"código {valores[0]} já existe"
+                else:
+                    erro = validar(valores)
+                if erro is None:
+                    registro = "|".join(str(valor) for valor in valores)
+                    erro = gerenciador.validar_registro(registro)
+                if erro is None and reservar is not None:
+                    erro = reservar(valores)
+                if erro is not None:
+                    self._rejeitar(relatorio, numero, erro)
+                    continue
+                chaves_lote.add(valores[0])
+                lote.append(registro)
+
+            if lote:
+                endereco_inicial = gerenciador.tamanho_arquivo()
+                gerenciador.gravar_lote(lote)
+                # Índices primário e secundários do trecho recém-gravado, numa passada
+                dao.indexar_a_partir_de(endereco_inicial)
+
+                if entidade == "consultas":
+                    self.clinica.diarias_db.gravar_contadores(self._contadores_alterados)
+                    for data, cod_medico, cod_especialidade, valor_total in self._agregados_pendentes:
+                        dao.agregados.registrar(data, cod_medico, cod_especialidade, valor_total)
+
+        relatorio["importados"] += len(lote)
+        if progresso is not None:
+            progresso(relatorio)
@@ -1,12 +1,18 @@
 
 
 from ArvoreBinaria.BaseDados import BaseDados
+from Classes.Registros import Medico
 
 
 class Medicos(BaseDados):
-  
-    
-   
+
+    # Layout de tamanho fixo para o motor binário (opcional; ative com FORMATO_BINARIO = True)
+    LAYOUT_BINARIO = [
+        ("codigo", "q"), ("nome", "80s"), ("endereco", "100s"), ("telefone", "20s"),
+        ("cod_cidade", "q"), ("cod_especialidade", "q"),
+    ]
+    FORMATO_BINARIO = False
+
     def __init__(self, cidades_manager, especialidades_manager):
         super().__init__('Medicos')
         
@@ -17,11 +23,11 @@ class Medicos(BaseDados):
     def _deserializar(self, registro_string):
       
         try:
-            campos = registro_string.split('|')
-            return {
-                "codigo": int(campos[0]), "nome": campos[1], "endereco": campos[2], 
-                "telefone": campos[3], "cod_cidade": int(campos[4]), "cod_especialidade": int(campos[5]),
-            }
+            campos = self._separar_campos(registro_string)
+            return Medico(
+                codigo=int(campos[0]), nome=campos[1], endereco=campos[2], 
+                telefone=campos[3], cod_cidade=int(campos[4]), cod_especialidade=int(campos[5]),
+            )
         except Exception:
             return None
 
@@ -41,10 +47,32 @@ class Medicos(BaseDados):
             return False
 
         registro_formatado = f"{codigo}|{nome}|{end}|{tel}|{cod_cidade}|{cod_especialidade}"
-        self.incluir(registro_formatado, codigo)
+        try:
+            incluido = self.incluir(registro_formatado, codigo)
+        except ValueError as e:
+            print(f"ERRO: Médico {codigo} não incluído: {e}")
+            return False
+        if not incluido:
+            print(f"ERRO: Médico com código {codigo} já existe.")
+            return False
         print(f"SUCESSO: Médico {nome} ({codigo}) incluído.")
         return True
 
+    def incluir_medicos_lote(self, medicos):
+        """medicos: [(codigo, nome, end, tel, cod_cidade, cod_especialidade), ...]."""
+        def validar(linha):
+            if not self.cidades_manager.buscar_por_chave(linha[4]):
+                return f"Cidade {linha[4]} não encontrada."
+            if not self.especialidades_manager.buscar_por_chave(linha[5]):
+                return f"Especialidade {linha[5]} não encontrada."
+            return None
+
+        return self._incluir_lote_validado(
+            "Médico", medicos,
+            formatar=lambda linha: "|".join(str(campo) for campo in linha),
+            validar=validar,
+        )
+
     def consultar_medico(self, codigo):
         
         registro_string = self.buscar_por_chave(codigo)
@@ -77,25 +105,23 @@ class Medicos(BaseDados):
             
         return medico_data
     
-    def listar_todos(self):
-
-        registros_strings = self.ler_todos()
-        medicos_completos = []
-        
-        for reg_str in registros_strings:
+    def iterar_medicos(self):
+        """Médicos ativos com cidade e especialidade (descrição, valor, limite diário), na ordem do arquivo."""
+        for reg_str in self.iterar_todos():
             medico_data = self._deserializar(reg_str)
             if medico_data:
                 cidade = self.cidades_manager.consultar_cidade(medico_data["cod_cidade"])
                 medico_data["cidade_nome"] = cidade["descricao"] if cidade else "N/A"
                 medico_data["cidade_estado"] = cidade["estado"] if cidade else "N/A"
-                
                 especialidade = self.especialidades_manager.consultar_especialidade(medico_data["cod_especialidade"])
                 medico_data["especialidade_desc"] = especialidade["descricao"] if especialidade else "N/A"
                 medico_data["valor_consulta"] = especialidade["valor_consulta"] if especialidade else 0.0
                 medico_data["limite_diario"] = especialidade["limite_diario"] if especialidade else 0
-                
-                medicos_completos.append(medico_data)
-        return medicos_completos
+                yield medico_data
+
+    def listar_todos(self):
+
+        return list(self.iterar_medicos())
 
     def excluir_medico(self, codigo):
         
@@ -0,0 +1,227 @@
+
+import ArvoreBinaria.metricas as metricas_mod
+from Classes.Registros import ConsultaCompleta
+
+log = metricas_mod.obter_log('relatorios')
+
+
+class RelatorioCancelado(Exception):
+    """Levantada pelo motor quando cancelar.is_set() durante a leitura de Consultas."""
+
+    def __init__(self, lidos):
+        super().__init__(f"Relatório cancelado após {lidos} registros lidos.")
+        self.lidos = lidos
+
+
+class MotorRelatorios:
+    """
+    Motor de relatórios de faturamento por HASH JOIN.
+
+    Em vez de enriquecer cada consulta com 3 lookups encadeados (nested loop),
+    carrega cada tabela de dimensão (Médicos, Especialidades, Exames, Pacientes,
+    Cidades) uma única vez em um dicionário e percorre Consultas em uma passada:
+    O(N + M) e um número constante de aberturas de arquivo por relatório.
+
+    Filtros (data, médico...) são avaliados no registro bruto, antes do JOIN: só as
+    consultas selecionadas são enriquecidas. Em relatórios filtrados os pacientes
+    são resolvidos pelo índice (sob demanda) em vez de carregar a tabela inteira.
+
+    Consultas é percorrida em streaming (iterar_*): só as dimensões ficam em memória,
+    nunca a lista de registros brutos junto com a lista de registros enriquecidos.
+
+    Execução em segundo plano (ex: thread de trabalho da GUI): progresso(lidos, total)
+    é chamado a cada PROGRESSO_A_CADA registros lidos (total é None quando não se sabe
+    de antemão) e, se cancelar (um threading.Event) for sinalizado, a leitura para no
+    próximo registro com RelatorioCancelado.
+    """
+
+    PROGRESSO_A_CADA = 500
+
+    def __init__(self, consultas_manager, progresso=None, cancelar=None):
+        self.consultas = consultas_manager
+        self.progresso = progresso
+        self.cancelar = cancelar
+        self.pacientes = consultas_manager.pacientes_manager
+        self.medicos = consultas_manager.medicos_manager
+        self.exames = consultas_manager.exames_manager
+        self.especialidades = consultas_manager.especialidades_manager
+        self.cidades = self.pacientes.cidades_manager
+
+        self._medicos = None
+        self._exames = None
+        self._pacientes = None
+        self._pacientes_resolvidos = {}
+
+    # --- CARGA DAS DIMENSÕES (uma leitura sequencial por tabela) ---
+
+    @staticmethod
+    def _mapa_por_codigo(dao):
+        mapa = {}
+        for registro_string in dao.iterar_todos():
+            registro = dao._deserializar(registro_string)
+            if registro is not None:
+                mapa[registro["codigo"]] = registro
+        return mapa
+
+    def _carregar_dimensoes(self):
+        if self._medicos is not None:
+            return
+
+        especialidades = self._mapa_por_codigo(self.especialidades)
+        self._cidades = self._mapa_por_codigo(self.cidades)
+
+        # Médico já resolvido com a especialidade (mesmos padrões de Medicos.consultar_medico)
+        self._medicos = {}
+        for codigo, medico in self._mapa_por_codigo(self.medicos).items():
+            especialidade = especialidades.get(medico["cod_especialidade"])
+            self._medicos[codigo] = {
+                "nome_medico": medico["nome"],
+                "cod_especialidade": medico["cod_especialidade"],
+                "valor_consulta": especialidade["valor_consulta"] if especialidade else 0.0,
+                "limite_diario": especialidade["limite_diario"] if especialidade else 0,
+                "especialidade_desc": especialidade["descricao"] if especialidade else "N/A",
+            }
+
+        self._exames = {
+            codigo: {"desc_exame": exame["descricao"], "valor_exame": exame["valor_exame"]}
+            for codigo, exame in self._mapa_por_codigo(self.exames).items()
+        }
+
+    def _carregar_pacientes(self):
+        if self._pacientes is None:
+            self._pacientes = self._mapa_por_codigo(self.pacientes)
+
+    def medicos_da_especialidade(self, cod_especialidade):
+        """Conjunto dos códigos de médicos da especialidade (resolvido antes da varredura de Consultas)."""
+        self._carregar_dimensoes()
+        return {
+            codigo for codigo, medico in self._medicos.items()
+            if medico["cod_especialidade"] == cod_especialidade
+        }
+
+    def _resolver_paciente(self, cod_paciente):
+        """Cidade e IMC são calculados uma vez por paciente referenciado, não por consulta."""
+        resolvido = self._pacientes_resolvidos.get(cod_paciente)
+        if resolvido is None:
+            if self._pacientes is not None:
+                paciente = self._pacientes.get(cod_paciente)
+            else:
+                # Modo filtrado: busca pontual pelo índice de Pacientes
+                registro_string = self.pacientes.buscar_por_chave(cod_paciente)
+                paciente = self.pacientes._deserializar(registro_string) if registro_string else None
+            if paciente is None:
+                return None
+            cidade = self._cidades.get(paciente["cod_cidade"])
+            imc, diagnostico = self.pacientes._calcular_imc(paciente["peso"], paciente["altura"])
+            resolvido = {
+                "nome_paciente": paciente["nome"],
+                "nome_cidade_paciente": cidade["descricao"] if cidade else "N/A",
+                "imc": imc,
+                "diagnostico_imc": diagnostico,
+            }
+            self._pacientes_resolvidos[cod_paciente] = resolvido
+        return resolvido
+
+    # --- JOIN ---
+
+    def enriquecer(self, consulta_data):
+        """
+        Equivalente a Consultas._realizar_lookups, mas por consulta aos dicionários em memória.
+        Lança ValueError se alguma dependência essencial não for encontrada.
+        Retorna uma ConsultaCompleta (registro com slots) no lugar do registro bruto.
+        """
+        self._carregar_dimensoes()
+        consulta_data = ConsultaCompleta.de_registro(consulta_data)
+
+        medico = self._medicos.get(consulta_data["cod_medico"])
+        if medico is None:
+            raise ValueError(f"Médico {consulta_data['cod_medico']} não encontrado.")
+        consulta_data.update(medico)
+
+        exame = self._exames.get(consulta_data["cod_exame"])
+        if exame is None:
+            raise ValueError(f"Exame {consulta_data['cod_exame']} não encontrado.")
+        consulta_data.update(exame)
+
+        paciente = self._resolver_paciente(consulta_data["cod_paciente"])
+        if paciente is None:
+            raise ValueError(f"Paciente {consulta_data['cod_paciente']} não encontrado.")
+        consulta_data.update(paciente)
+
+        v_total = consulta_data.get("valor_consulta", 0.0) + consulta_data.get("valor_exame", 0.0)
+        consulta_data["valor_total_a_pagar"] = round(v_total, 2)
+        return consulta_data
+
+    def iterar_consultas_com_valor(self, filtro=None, registros=None):
+        """
+        Lê Consultas sequencialmente (uma abertura de arquivo) e gera cada registro ativo já com o JOIN.
+        filtro(consulta_bruta) -> bool é aplicado antes do JOIN (campos: codigo, cod_paciente,
+        cod_medico, cod_exame, data AAAAMMDD, hora).
+        registros: registros brutos já selecionados (ex: por um índice secundário) no lugar da varredura.
+        """
+        if filtro is None and registros is None:
+            # Relatório completo: compensa carregar todos os pacientes de uma vez (hash join)
+            self._carregar_pacientes()
+        if registros is None:
+            registros_strings = self.consultas.iterar_todos()
+            total = len(self.consultas.indice)
+        else:
+            registros_strings = registros
+            total = len(registros) if hasattr(registros, '__len__') else None
+
+        lidos = 0
+        for reg_str in registros_strings:
+            lidos += 1
+            self._acompanhar(lidos, total)
+            consulta_data = self.consultas._deserializar(reg_str)
+            if consulta_data:
+                consulta_data['data'] = self.consultas._limpar_data(consulta_data.get('data', ''))
+                if filtro is not None and not filtro(consulta_data):
+                    continue
+
+                try:
+                    consulta_completa = self.enriquecer(consulta_data)
+                except Exception as e:
+                    log.warning("Falha no JOIN/Lookup da Consulta %s. Erro: %s. O registro é ignorado no faturamento.",
+                                consulta_data.get('codigo'), e)
+                    continue
+                log.debug("Sucesso JOIN Cód: %s | Data: %s", consulta_completa['codigo'], consulta_completa['data'])
+                yield consulta_completa
+
+        log.debug("Total de registros ATIVOS lidos do disco (Consulta): %s", lidos)
+
+    def _acompanhar(self, lidos, total):
+        if self.cancelar is not None and self.cancelar.is_set():
+            raise RelatorioCancelado(lidos - 1)
+        if self.progresso is not None and lidos % self.PROGRESSO_A_CADA == 0:
+            self.progresso(lidos, total)
+
+    def consultas_com_valor(self, filtro=None, registros=None):
+        return list(self.iterar_consultas_com_valor(filtro, registros))
+
+    def iterar_relatorio_ordenado(self):
+        """
+        Percorre o índice em ordem e lê cada consulta pelo descritor persistente do DAO.
+        Usa uma cópia dos endereços: inclusões feitas durante o relatório não o afetam.
+        """
+        self._carregar_pacientes()
+
+        with self.consultas.trava.leitura():
+            geracao = self.consultas._geracao
+            enderecos = [endereco_byte for _, endereco_byte in self.consultas.pares_em_ordem()]
+        for lidos, registro_string in enumerate(self.consultas.ler_enderecos(enderecos, geracao), start=1):
+            self._acompanhar(lidos, len(enderecos))
+
+            consulta_data = self.consultas._deserializar(registro_string)
+            if consulta_data:
+                consulta_data['data'] = self.consultas._limpar_data(consulta_data.get('data', ''))
+
+                try:
+                    consulta_completa = self.enriquecer(consulta_data)
+                except Exception as e:
+                    log.warning("Falha na Consulta %s durante a ordenação. Erro: %s", consulta_data.get('codigo'), e)
+                    continue
+                yield consulta_completa
+
+    def relatorio_ordenado(self):
+        return list(self.iterar_relatorio_ordenado())
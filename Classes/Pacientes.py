@@ -1,10 +1,18 @@
 
 
 from ArvoreBinaria.BaseDados import BaseDados
+from Classes.Registros import Paciente
 
 
 class Pacientes(BaseDados):
-   
+
+    # Layout de tamanho fixo para o motor binário (opcional; ative com FORMATO_BINARIO = True)
+    LAYOUT_BINARIO = [
+        ("codigo", "q"), ("nome", "80s"), ("data_nascimento", "10s"), ("endereco", "100s"),
+        ("telefone", "20s"), ("cod_cidade", "q"), ("peso", "d"), ("altura", "d"),
+    ]
+    FORMATO_BINARIO = False
+
     def __init__(self, cidades_manager): 
         super().__init__('Pacientes')
         self.cidades_manager = cidades_manager 
@@ -35,12 +43,12 @@ class Pacientes(BaseDados):
     def _deserializar(self, registro_string):
       
         try:
-            campos = registro_string.split('|')
-            return {
-                "codigo": int(campos[0]), "nome": campos[1], "data_nascimento": campos[2], 
-                "endereco": campos[3], "telefone": campos[4], "cod_cidade": int(campos[5]), 
-                "peso": float(campos[6]), "altura": float(campos[7]), 
-            }
+            campos = self._separar_campos(registro_string)
+            return Paciente(
+                codigo=int(campos[0]), nome=campos[1], data_nascimento=campos[2], 
+                endereco=campos[3], telefone=campos[4], cod_cidade=int(campos[5]), 
+                peso=float(campos[6]), altura=float(campos[7]), 
+            )
         except Exception:
             return None
 
@@ -55,10 +63,30 @@ class Pacientes(BaseDados):
             return False
 
         registro_formatado = f"{codigo}|{nome}|{dt_nasc}|{end}|{tel}|{cod_cidade}|{peso}|{altura}"
-        self.incluir(registro_formatado, codigo)
+        try:
+            incluido = self.incluir(registro_formatado, codigo)
+        except ValueError as e:
+            print(f"ERRO: Paciente {codigo} não incluído: {e}")
+            return False
+        if not incluido:
+            print(f"ERRO: Paciente com código {codigo} já existe.")
+            return False
         print(f"SUCESSO: Paciente {nome} ({codigo}) incluído.")
         return True
 
+    def incluir_pacientes_lote(self, pacientes):
+        """pacientes: [(codigo, nome, dt_nasc, end, tel, cod_cidade, peso, altura), ...]."""
+        def validar(linha):
+            if not self.cidades_manager.buscar_por_chave(linha[5]):
+                return f"Código da Cidade {linha[5]} não encontrado."
+            return None
+
+        return self._incluir_lote_validado(
+            "Paciente", pacientes,
+            formatar=lambda linha: "|".join(str(campo) for campo in linha),
+            validar=validar,
+        )
+
     def consultar_paciente(self, codigo):
         
         registro_string = self.buscar_por_chave(codigo)
@@ -82,23 +110,22 @@ class Pacientes(BaseDados):
         
         return paciente_data
     
-    def listar_todos(self):
-        registros_strings = self.ler_todos()
-        pacientes_completos = []
-        for reg_str in registros_strings:
+    def iterar_pacientes(self):
+        """Pacientes ativos com IMC, diagnóstico e cidade (nome/estado), na ordem do arquivo."""
+        for reg_str in self.iterar_todos():
             paciente_data = self._deserializar(reg_str)
             if paciente_data:
                 imc, diagnostico = self._calcular_imc(paciente_data["peso"], paciente_data["altura"])
                 paciente_data["imc"] = imc
                 paciente_data["diagnostico"] = diagnostico
-                
-               
                 cidade = self.cidades_manager.consultar_cidade(paciente_data["cod_cidade"])
                 paciente_data["cidade_nome"] = cidade["descricao"] if cidade else "N/A"
                 paciente_data["cidade_estado"] = cidade["estado"] if cidade else "N/A"
-                
-                pacientes_completos.append(paciente_data)
-        return pacientes_completos
+                yield paciente_data
+
+    def listar_todos(self):
+
+        return list(self.iterar_pacientes())
 
     def excluir_paciente(self, codigo):
         
@@ -0,0 +1,153 @@
+
+class Registro:
+    """
+    Registro desserializado com __slots__ (sem __dict__ por instância).
+    Os campos são os slots da classe e de suas bases, em ordem; o acesso
+    no estilo dicionário (registro["campo"], get, items, update...) mantém
+    compatível o código que tratava os registros como dict. Um slot ainda
+    não preenchido se comporta como chave ausente.
+    """
+
+    __slots__ = ()
+    CAMPOS = ()
+    _NOMES = frozenset()
+    _AUSENTE = object()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.CAMPOS = tuple(
+            campo for base in reversed(cls.__mro__) for campo in base.__dict__.get('__slots__', ())
+        )
+        cls._NOMES = frozenset(cls.CAMPOS)
+
+    def __init__(self, *valores, **nomeados):
+        for campo, valor in zip(self.CAMPOS, valores):
+            setattr(self, campo, valor)
+        for campo, valor in nomeados.items():
+            setattr(self, campo, valor) # Campo inexistente: AttributeError (não há __dict__)
+
+    @classmethod
+    def de_registro(cls, origem):
+        """Copia os campos de outro registro (ou dict) para uma instância desta classe."""
+        novo = cls()
+        for campo, valor in origem.items():
+            setattr(novo, campo, valor)
+        return novo
+
+    # --- ACESSO COMPATÍVEL COM DICT ---
+
+    def __getitem__(self, chave):
+        if chave not in self._NOMES:
+            raise KeyError(chave)
+        try:
+            return getattr(self, chave)
+        except AttributeError:
+            raise KeyError(chave) from None
+
+    def __setitem__(self, chave, valor):
+        if chave not in self._NOMES:
+            raise KeyError(f"{type(self).__name__} não tem o campo '{chave}'.")
+        setattr(self, chave, valor)
+
+    def __contains__(self, chave):
+        return chave in self._NOMES and hasattr(self, chave)
+
+    def get(self, chave, padrao=None):
+        try:
+            return self[chave]
+        except KeyError:
+            return padrao
+
+    def items(self):
+        ausente = self._AUSENTE
+        pares = []
+        for campo in self.CAMPOS:
+            valor = getattr(self, campo, ausente)
+            if valor is not ausente:
+                pares.append((campo, valor))
+        return pares
+
+    def keys(self):
+        return [campo for campo, _ in self.items()]
+
+    def values(self):
+        return [valor for _, valor in self.items()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def update(self, outro):
+        try:
+            for campo, valor in outro.items():
+                setattr(self, campo, valor)
+        except AttributeError:
+            raise KeyError(f"{type(self).__name__} não tem o campo '{campo}'.") from None
+
+    def copy(self):
+        novo = type(self)()
+        for campo, valor in self.items():
+            setattr(novo, campo, valor)
+        return novo
+
+    def para_dict(self):
+        return dict(self.items())
+
+    def __eq__(self, outro):
+        if isinstance(outro, (Registro, dict)):
+            return self.para_dict() == dict(outro.items())
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.para_dict()!r})"
+
+
+class Cidade(Registro):
+    __slots__ = ("codigo", "descricao", "estado")
+
+
+class Especialidade(Registro):
+    __slots__ = ("codigo", "descricao", "valor_consulta", "limite_diario")
+
+
+class Paciente(Registro):
+    __slots__ = (
+        "codigo", "nome", "data_nascimento", "endereco", "telefone", "cod_cidade", "peso", "altura",
+        # Preenchidos no enriquecimento (consultar_paciente / iterar_pacientes)
+        "cidade_nome", "cidade_estado", "imc", "diagnostico",
+    )
+
+
+class Medico(Registro):
+    __slots__ = (
+        "codigo", "nome", "endereco", "telefone", "cod_cidade", "cod_especialidade",
+        # Preenchidos no enriquecimento (consultar_medico / iterar_medicos)
+        "cidade_nome", "cidade_estado", "especialidade_desc", "valor_consulta", "limite_diario",
+    )
+
+
+class Exame(Registro):
+    __slots__ = ("codigo", "descricao", "cod_especialidade", "valor_exame", "especialidade_desc")
+
+
+class Consulta(Registro):
+    __slots__ = (
+        "codigo", "cod_paciente", "cod_medico", "cod_exame", "data", "hora",
+        # Valor total gravado no agendamento (ausente nos registros antigos)
+        "valor_total",
+    )
+
+
+class ConsultaCompleta(Consulta):
+    """Linha de relatório: a consulta com o resultado do JOIN e o valor total a pagar."""
+
+    __slots__ = (
+        "nome_medico", "cod_especialidade", "valor_consulta", "limite_diario", "especialidade_desc",
+        "desc_exame", "valor_exame",
+        "nome_paciente", "nome_cidade_paciente", "imc", "diagnostico_imc",
+        "valor_total_a_pagar",
+    )
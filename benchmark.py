@@ -0,0 +1,322 @@
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import date, datetime, timedelta
+
+# Os DAOs abrem os arquivos pelo nome relativo: o benchmark roda dentro do diretório de dados
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, RAIZ)
+
+import ArvoreBinaria.ArvoreBinaria as arvore_mod
+import ArvoreBinaria.metricas as metricas_mod
+from Classes.Clinica import Clinica
+from Classes.ImportadorLote import ImportadorLote
+
+ESCALAS = {
+    "pequena": {"cidades": 20, "especialidades": 10, "exames": 40, "medicos": 200,
+                "pacientes": 5000, "consultas": 20000},
+    "media": {"cidades": 100, "especialidades": 50, "exames": 200, "medicos": 2000,
+              "pacientes": 100000, "consultas": 500000},
+    "grande": {"cidades": 100, "especialidades": 50, "exames": 200, "medicos": 10000,
+               "pacientes": 1000000, "consultas": 5000000},
+}
+DIAS = 365
+DATA_INICIAL = date(2025, 1, 1)
+
+
+class Benchmark:
+    """
+    Benchmark reproduzível da camada de armazenamento (árvore, índices, Área de Dados)
+    e dos relatórios, sobre uma clínica sintética gerada num diretório temporário.
+
+    Os dados são gerados como CSV (com a semente informada) e carregados pelo
+    ImportadorLote; depois são medidos a inicialização (índices persistidos e
+    reconstrução), leituras pontuais, inclusões com chaves sequenciais x aleatórias
+    e todos os relatórios (faturamento_por_* e relatorio_ordenado). Os relatórios são
+    consumidos pelos geradores iterar_* (mesmo caminho das versões em lista, sem
+    manter milhões de registros em memória).
+    """
+
+    def __init__(self, escala, semente=42, amostras=10000, diretorio=None, metricas=False):
+        self.escala = escala
+        self.semente = semente
+        self.amostras = amostras
+        self.diretorio = diretorio
+        self.metricas = metricas
+        self.aleatorio = random.Random(semente)
+        self.resultados = {}
+
+    # --- MEDIÇÃO ---
+
+    def medir(self, nome, funcao, operacoes=1):
+        """Executa funcao() uma vez (sem a saída de SUCESSO/ERRO) e registra o tempo."""
+        with open(os.devnull, 'w') as nulo, redirect_stdout(nulo):
+            inicio = time.perf_counter()
+            retorno = funcao()
+            segundos = time.perf_counter() - inicio
+        resultado = {"segundos": round(segundos, 6), "operacoes": operacoes,
+                     "us_por_operacao": round(segundos * 1e6 / operacoes, 3) if operacoes else None}
+        if isinstance(retorno, int) and not isinstance(retorno, bool):
+            resultado["linhas"] = retorno
+        self.resultados[nome] = resultado
+        print(f"  {nome}: {segundos:.3f} s", file=sys.stderr)
+        return retorno
+
+    @staticmethod
+    def _repetir(funcao, argumentos):
+        for argumento in argumentos:
+            funcao(argumento)
+
+    @staticmethod
+    def _contar(iteravel):
+        quantidade = 0
+        for _ in iteravel:
+            quantidade += 1
+        return quantidade
+
+    # --- GERAÇÃO DOS DADOS ---
+
+    def _data(self, dia):
+        return (DATA_INICIAL + timedelta(days=dia)).strftime("%Y%m%d")
+
+    def _gravar_csv(self, nome, campos, linhas):
+        caminho = os.path.join(self.diretorio, f"{nome}.csv")
+        with open(caminho, 'w', encoding='utf-8', newline='') as f:
+            escritor = csv.writer(f)
+            escritor.writerow(campos)
+            escritor.writerows(linhas)
+        return caminho
+
+    def gerar(self):
+        """Gera um CSV por entidade; retorna [(entidade, caminho)] na ordem de importação."""
+        e, r = self.escala, self.aleatorio
+        # Limite diário folgado: nenhuma consulta sintética é rejeitada por falta de vaga
+        limite = max(30, 2 * e["consultas"] // (e["especialidades"] * DIAS) + 1)
+        arquivos = [
+            ("cidades", self._gravar_csv("cidades", ["codigo", "descricao", "estado"], (
+                (c, f"Cidade {c}", "SP") for c in range(1, e["cidades"] + 1)))),
+            ("especialidades", self._gravar_csv("especialidades", ["codigo", "descricao", "valor_consulta", "limite_diario"], (
+                (c, f"Especialidade {c}", round(50 + r.random() * 250, 2), limite) for c in range(1, e["especialidades"] + 1)))),
+            ("pacientes", self._gravar_csv("pacientes", ["codigo", "nome", "data_nascimento", "endereco", "telefone",
+                                                         "cod_cidade", "peso", "altura"], (
+                (c, f"Paciente {c}", self._data(-r.randrange(365 * 80)), f"Rua {c % 997}", f"18{c:08d}",
+                 r.randint(1, e["cidades"]), round(45 + r.random() * 70, 1), r.randint(145, 200))
+                for c in range(1, e["pacientes"] + 1)))),
+            ("medicos", self._gravar_csv("medicos", ["codigo", "nome", "endereco", "telefone", "cod_cidade",
+                                                     "cod_especialidade"], (
+                (c, f"Medico {c}", f"Av {c % 101}", f"11{c:08d}", r.randint(1, e["cidades"]),
+                 r.randint(1, e["especialidades"])) for c in range(1, e["medicos"] + 1)))),
+            ("exames", self._gravar_csv("exames", ["codigo", "descricao", "cod_especialidade", "valor_exame"], (
+                (c, f"Exame {c}", r.randint(1, e["especialidades"]), round(20 + r.random() * 180, 2))
+                for c in range(1, e["exames"] + 1)))),
+            ("consultas", self._gravar_csv("consultas", ["codigo", "cod_paciente", "cod_medico", "cod_exame", "data", "hora"], (
+                (c, r.randint(1, e["pacientes"]), r.randint(1, e["medicos"]), r.randint(1, e["exames"]),
+                 self._data(r.randrange(DIAS)), f"{8 + c % 10:02d}:{30 * (c % 2):02d}")
+                for c in range(1, e["consultas"] + 1)))),
+        ]
+        return arquivos
+
+    # --- CENÁRIOS ---
+
+    def importar(self, clinica, arquivos):
+        importador = ImportadorLote(clinica)
+        for entidade, caminho in arquivos:
+            self.medir(f"importacao.{entidade}", lambda: importador.importar(entidade, caminho)["importados"],
+                       self.escala.get(entidade, 1))
+
+    @staticmethod
+    def _abrir_indexada():
+        clinica = Clinica()
+        for dao in clinica.daos():
+            dao.garantir_indice()
+        return clinica
+
+    def inicializacao(self):
+        """
+        Abertura da clínica: sem carregar os índices (carga sob demanda), com os .idx válidos
+        e, depois, com a reconstrução a partir dos dados.
+        """
+        self.medir("inicializacao.sob_demanda", Clinica).fechar()
+        clinica = self.medir("inicializacao.indices_persistidos", self._abrir_indexada)
+        for dao in clinica.daos():
+            self.medir(f"carregar_indice.{dao.nome_entidade}", dao._carregar_indice, len(dao.indice))
+        for dao in clinica.daos():
+            self.medir(f"reconstruir_indice.{dao.nome_entidade}", dao._reconstruir_indice, len(dao.indice))
+        clinica.fechar()
+
+        for nome in os.listdir('.'):
+            if nome.endswith('.idx'):
+                os.remove(nome)
+        clinica = self.medir("inicializacao.sem_indices", self._abrir_indexada)
+        clinica.fechar()
+
+    def arvore(self):
+        """ArvoreBinaria em memória: inserção de chaves sequenciais x aleatórias e busca."""
+        n = min(self.escala["consultas"], 1000000)
+        chaves = list(range(n))
+        sequencial = arvore_mod.ArvoreBinaria()
+        self.medir("arvore.inserir_sequencial", lambda: self._repetir(lambda c: sequencial.inserir(c, c), chaves), n)
+        self.aleatorio.shuffle(chaves)
+        aleatoria = arvore_mod.ArvoreBinaria()
+        self.medir("arvore.inserir_aleatorio", lambda: self._repetir(lambda c: aleatoria.inserir(c, c), chaves), n)
+        buscas = [self.aleatorio.randrange(n) for _ in range(self.amostras)]
+        self.medir("arvore.buscar", lambda: self._repetir(aleatoria.buscar, buscas), len(buscas))
+
+    def leituras(self, clinica):
+        e, r = self.escala, self.aleatorio
+        consultas = clinica.consultas_db
+        codigos = [r.randint(1, e["consultas"]) for _ in range(self.amostras)]
+        enderecos = [endereco for endereco in (consultas.indice.buscar(c) for c in codigos) if endereco is not None]
+        gerenciador = consultas.gerenciador_arquivo
+        self.medir("leitura.ler_registro_por_endereco",
+                   lambda: self._repetir(gerenciador.ler_registro_por_endereco, enderecos), len(enderecos))
+        self.medir("leitura.buscar_por_chave", lambda: self._repetir(consultas.buscar_por_chave, codigos), len(codigos))
+
+        pacientes = [r.randint(1, e["pacientes"]) for _ in range(self.amostras)]
+        self.medir("leitura.consultar_paciente",
+                   lambda: self._repetir(clinica.pacientes_db.consultar_paciente, pacientes), len(pacientes))
+        amostra = codigos[:max(1, self.amostras // 10)]
+        self.medir("leitura.consultar_consulta", lambda: self._repetir(consultas.consultar_consulta, amostra), len(amostra))
+
+    def relatorios(self, clinica):
+        e, r = self.escala, self.aleatorio
+        consultas = clinica.consultas_db
+        dia = self._data(DIAS // 2)
+        inicio, fim = self._data(DIAS // 2), self._data(DIAS // 2 + 29)
+        medico = r.randint(1, e["medicos"])
+        especialidade = r.randint(1, e["especialidades"])
+        paciente = r.randint(1, e["pacientes"])
+
+        self.medir("relatorio.faturamento_por_dia", lambda: self._contar(consultas.iterar_faturamento_por_dia(dia)))
+        self.medir("relatorio.faturamento_por_periodo",
+                   lambda: self._contar(consultas.iterar_faturamento_por_periodo(inicio, fim)))
+        self.medir("relatorio.faturamento_por_medico", lambda: self._contar(consultas.iterar_faturamento_por_medico(medico)))
+        self.medir("relatorio.faturamento_por_especialidade",
+                   lambda: self._contar(consultas.iterar_faturamento_por_especialidade(especialidade)))
+        self.medir("relatorio.historico_paciente", lambda: self._contar(consultas.iterar_historico_paciente(paciente)))
+        self.medir("relatorio.relatorio_ordenado", lambda: self._contar(consultas.iterar_relatorio_ordenado()))
+        self.medir("relatorio.consultas_com_valor", lambda: self._contar(consultas.iterar_consultas_com_valor()))
+
+        # O ImportadorLote não materializa os agregados: a primeira consulta de totais os reconstrói
+        self.medir("totais.reconstruir_agregados", consultas.agregados.reconstruir)
+        self.medir("totais.faturamento_por_dia", lambda: consultas.faturamento_por_dia(dia, somente_totais=True)["quantidade"])
+        self.medir("totais.faturamento_por_periodo",
+                   lambda: consultas.faturamento_por_periodo(inicio, fim, somente_totais=True)["quantidade"])
+        self.medir("totais.faturamento_por_medico",
+                   lambda: consultas.faturamento_por_medico(medico, somente_totais=True)["quantidade"])
+        self.medir("totais.faturamento_por_especialidade",
+                   lambda: consultas.faturamento_por_especialidade(especialidade, somente_totais=True)["quantidade"])
+
+    def inclusoes(self, clinica):
+        """BaseDados.incluir (gravação + índices + journal) com chaves sequenciais x aleatórias."""
+        pacientes = clinica.pacientes_db
+        n = self.amostras
+        base = self.escala["pacientes"]
+
+        def incluir(chaves):
+            for c in chaves:
+                pacientes.incluir(f"{c}|Paciente {c}|19900101|Rua 1|1800000000|1|70.0|1.75", c)
+
+        self.medir("inclusao.sequencial", lambda: incluir(range(base + 1, base + n + 1)), n)
+        aleatorias = self.aleatorio.sample(range(base + n + 1, base + 100 * n + 1), n)
+        self.medir("inclusao.aleatoria", lambda: incluir(aleatorias), n)
+
+    # --- EXECUÇÃO ---
+
+    def executar(self):
+        diretorio_original = os.getcwd()
+        temporario = self.diretorio is None
+        if temporario:
+            self.diretorio = tempfile.mkdtemp(prefix="clinica_bench_")
+        os.makedirs(self.diretorio, exist_ok=True)
+        os.chdir(self.diretorio)
+        try:
+            print(f"Gerando dados sintéticos em {self.diretorio}...", file=sys.stderr)
+            arquivos = self.medir("geracao.csv", self.gerar)
+
+            clinica = Clinica()
+            self.importar(clinica, arquivos)
+            clinica.fechar()
+
+            self.inicializacao()
+            self.arvore()
+
+            clinica = Clinica()
+            if self.metricas:
+                # Só a fase de leituras/relatórios/inclusões; os tempos ficam maiores com as métricas
+                metricas_mod.ativar()
+            self.leituras(clinica)
+            self.relatorios(clinica)
+            self.inclusoes(clinica)
+            clinica.fechar()
+        finally:
+            metricas_mod.desativar()
+            os.chdir(diretorio_original)
+            if temporario:
+                shutil.rmtree(self.diretorio, ignore_errors=True)
+        return self.relatorio()
+
+    def relatorio(self):
+        return {
+            "data": datetime.now().isoformat(timespec="seconds"),
+            "versao": self._versao(),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "escala": self.escala,
+            "semente": self.semente,
+            "amostras": self.amostras,
+            "resultados": self.resultados,
+            "metricas": metricas_mod.instantaneo() if self.metricas else None,
+        }
+
+    @staticmethod
+    def _versao():
+        try:
+            return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True,
+                                  text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+
+def main():
+    """
+    Benchmark da camada de armazenamento e dos relatórios.
+    Ex: python benchmark.py --escala media --saida resultados.json
+        python benchmark.py --escala pequena --consultas 100000
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--escala", choices=sorted(ESCALAS), default="pequena")
+    for entidade in ESCALAS["pequena"]:
+        parser.add_argument(f"--{entidade}", type=int, help=f"quantidade de {entidade} (sobrepõe a escala)")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--amostras", type=int, default=10000, help="operações por medida de leitura/inclusão")
+    parser.add_argument("--diretorio", help="diretório dos dados (padrão: temporário, removido ao final)")
+    parser.add_argument("--saida", help="arquivo JSON de saída (padrão: saída padrão)")
+    parser.add_argument("--metricas", action="store_true", help="inclui as métricas de instrumentação no resultado")
+    argumentos = parser.parse_args()
+
+    escala = dict(ESCALAS[argumentos.escala])
+    for entidade in escala:
+        if getattr(argumentos, entidade) is not None:
+            escala[entidade] = getattr(argumentos, entidade)
+
+    resultado = Benchmark(escala, argumentos.semente, argumentos.amostras, argumentos.diretorio,
+                          argumentos.metricas).executar()
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if argumentos.saida:
+        with open(argumentos.saida, 'w', encoding='utf-8') as f:
+            f.write(texto + "\n")
+    else:
+        print(texto)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+import argparse
+import csv
+import itertools
+import json
+import sys
+from contextlib import redirect_stdout
+
+# Só ArvoreBinaria e Classes: nada de customtkinter/tkinter (roda em servidores sem display)
+import ArvoreBinaria.perfil as perfil_mod
+from Classes.Clinica import Clinica
+from Classes.Consultas import Consultas
+from Classes.ImportadorLote import ImportadorLote
+
+# entidade -> (atributo do DAO na Clinica, sufixo dos métodos incluir_/consultar_/excluir_, gerador da listagem)
+ENTIDADES = {
+    "cidades": ("cidades_db", "cidade", "iterar_cidades"),
+    "especialidades": ("especialidades_db", "especialidade", "iterar_especialidades"),
+    "pacientes": ("pacientes_db", "paciente", "iterar_pacientes"),
+    "medicos": ("medicos_db", "medico", "iterar_medicos"),
+    "exames": ("exames_db", "exame", "iterar_exames"),
+    "consultas": ("consultas_db", "consulta", "iterar_consultas"),
+}
+
+FORMATOS = ("csv", "json", "jsonl")
+COMANDOS = ("incluir", "consultar", "excluir", "listar", "importar", "faturamento", "historico", "ordenado", "compactar")
+
+
+# --- SAÍDA ---
+
+def _como_dict(registro):
+    return registro if isinstance(registro, dict) else registro.para_dict()
+
+def escrever_registros(registros, formato, saida):
+    """Grava os registros (dicts ou Registros) em streaming no formato pedido. Retorna a quantidade."""
+    quantidade = 0
+    if formato == "csv":
+        registros = iter(registros)
+        primeiro = next(registros, None)
+        if primeiro is None:
+            return 0
+        campos = getattr(primeiro, "CAMPOS", None)
+        if campos is None:
+            # dicts (totais, relatórios de importação/compactação): poucas linhas, cabeçalho com a união das chaves
+            registros = [primeiro, *registros]
+            campos = dict.fromkeys(chave for registro in registros for chave in registro)
+        else:
+            # Registros: todos os campos declarados, mesmo os que a primeira linha não preencheu
+            registros = itertools.chain([primeiro], registros)
+        escritor = csv.DictWriter(saida, fieldnames=list(campos), lineterminator="\n")
+        escritor.writeheader()
+        for registro in registros:
+            escritor.writerow(_como_dict(registro))
+            quantidade += 1
+    elif formato == "jsonl":
+        for registro in registros:
+            saida.write(json.dumps(_como_dict(registro), ensure_ascii=False, default=str) + "\n")
+            quantidade += 1
+    else:
+        saida.write("[")
+        for registro in registros:
+            saida.write(("," if quantidade else "") + "\n  " + json.dumps(_como_dict(registro), ensure_ascii=False, default=str))
+            quantidade += 1
+        saida.write("\n]\n" if quantidade else "]\n")
+    return quantidade
+
+
+# --- COMANDOS ---
+
+def _dao(clinica, entidade):
+    atributo, sufixo, listagem = ENTIDADES[entidade]
+    return getattr(clinica, atributo), sufixo, listagem
+
+def _data(texto):
+    data = Consultas._limpar_data(texto)
+    if not data.isdigit() or len(data) != 8:
+        raise argparse.ArgumentTypeError(f"data inválida: {texto} (use AAAAMMDD)")
+    return data
+
+def comando_incluir(clinica, argumentos, saida):
+    dao, sufixo, _ = _dao(clinica, argumentos.entidade)
+    campos = ImportadorLote.ENTIDADES[argumentos.entidade][1]
+    if len(argumentos.valores) != len(campos):
+        print(f"ERRO: {argumentos.entidade} espera {len(campos)} valores: {' '.join(nome for nome, _ in campos)}")
+        return False
+    try:
+        valores = [tipo(valor) for (_, tipo), valor in zip(campos, argumentos.valores)]
+    except ValueError as e:
+        print(f"ERRO: Valor inválido: {e}")
+        return False
+    return getattr(dao, f"incluir_{sufixo}")(*valores)
+
+def comando_consultar(clinica, argumentos, saida):
+    dao, sufixo, _ = _dao(clinica, argumentos.entidade)
+    registro = getattr(dao, f"consultar_{sufixo}")(argumentos.codigo)
+    if registro is None:
+        print(f"ERRO: {argumentos.entidade} com código {argumentos.codigo} não encontrado(a).")
+        return False
+    escrever_registros([registro], argumentos.formato, saida)
+    return True
+
+def comando_excluir(clinica, argumentos, saida):
+    dao, sufixo, _ = _dao(clinica, argumentos.entidade)
+    return getattr(dao, f"excluir_{sufixo}")(argumentos.codigo)
+
+def comando_listar(clinica, argumentos, saida):
+    dao, _, listagem = _dao(clinica, argumentos.entidade)
+    escrever_registros(getattr(dao, listagem)(), argumentos.formato, saida)
+    return True
+
+def comando_importar(clinica, argumentos, saida):
+    try:
+        relatorio = ImportadorLote(clinica).importar(argumentos.entidade, argumentos.arquivo)
+    except (OSError, ValueError) as e:
+        print(f"ERRO: {e}")
+        return False
+    # As linhas rejeitadas já foram listadas (ERRO) em stderr
+    escrever_registros([{chave: valor for chave, valor in relatorio.items() if chave != "erros"}], argumentos.formato, saida)
+    return not relatorio["rejeitados"] and relatorio["interrompido"] is None
+
+def comando_faturamento(clinica, argumentos, saida):
+    consultas = clinica.consultas_db
+    tipo = argumentos.tipo
+    if tipo == "dia":
+        parametros = (argumentos.data,)
+    elif tipo == "periodo":
+        parametros = (argumentos.data_inicial, argumentos.data_final)
+    else:
+        parametros = (argumentos.codigo,)
+
+    if argumentos.totais:
+        totais = getattr(consultas, f"faturamento_por_{tipo}")(*parametros, somente_totais=True)
+        escrever_registros([totais], argumentos.formato, saida)
+    else:
+        escrever_registros(getattr(consultas, f"iterar_faturamento_por_{tipo}")(*parametros), argumentos.formato, saida)
+    return True
+
+def comando_historico(clinica, argumentos, saida):
+    escrever_registros(clinica.consultas_db.iterar_historico_paciente(argumentos.cod_paciente), argumentos.formato, saida)
+    return True
+
+def comando_ordenado(clinica, argumentos, saida):
+    escrever_registros(clinica.consultas_db.iterar_relatorio_ordenado(), argumentos.formato, saida)
+    return True
+
+def comando_compactar(clinica, argumentos, saida):
+    relatorios = clinica.compactar()
+    escrever_registros(relatorios, argumentos.formato, saida)
+    return True
+
+
+# --- ARGUMENTOS ---
+
+def criar_parser():
+    saida = argparse.ArgumentParser(add_help=False)
+    saida.add_argument("--formato", choices=FORMATOS, default="csv", help="formato da saída (padrão: csv)")
+    saida.add_argument("--saida", help="arquivo de saída (padrão: saída padrão)")
+    saida.add_argument("--perfil", nargs="?", const="pstats", choices=perfil_mod.MODOS,
+                       help="grava um perfil do relatório (o mesmo que CLINICA_PERFIL)")
+
+    parser = argparse.ArgumentParser(
+        prog="cli.py", description="Operações e relatórios da clínica sem interface gráfica.",
+        epilog="Ex: python cli.py faturamento periodo 20250101 20250131 --formato json --saida janeiro.json",
+    )
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    incluir = comandos.add_parser("incluir", parents=[saida], help="inclui um registro (valores na ordem dos campos)")
+    incluir.add_argument("entidade", choices=ENTIDADES)
+    incluir.add_argument("valores", nargs="+")
+    incluir.set_defaults(executar=comando_incluir)
+
+    for nome, funcao, ajuda in (("consultar", comando_consultar, "mostra um registro pelo código"),
+                                ("excluir", comando_excluir, "exclui um registro pelo código")):
+        sub = comandos.add_parser(nome, parents=[saida], help=ajuda)
+        sub.add_argument("entidade", choices=ENTIDADES)
+        sub.add_argument("codigo", type=int)
+        sub.set_defaults(executar=funcao)
+
+    listar = comandos.add_parser("listar", parents=[saida], help="lista todos os registros ativos da entidade")
+    listar.add_argument("entidade", choices=ENTIDADES)
+    listar.set_defaults(executar=comando_listar)
+
+    importar = comandos.add_parser("importar", parents=[saida], help="importação em massa (.csv ou .jsonl)")
+    importar.add_argument("entidade", choices=ImportadorLote.ENTIDADES)
+    importar.add_argument("arquivo")
+    importar.set_defaults(executar=comando_importar)
+
+    faturamento = comandos.add_parser("faturamento", help="relatórios de faturamento (item 6)")
+    tipos = faturamento.add_subparsers(dest="tipo", required=True)
+    dia = tipos.add_parser("dia", parents=[saida])
+    dia.add_argument("data", type=_data)
+    periodo = tipos.add_parser("periodo", parents=[saida])
+    periodo.add_argument("data_inicial", type=_data)
+    periodo.add_argument("data_final", type=_data)
+    for tipo in ("medico", "especialidade"):
+        tipos.add_parser(tipo, parents=[saida]).add_argument("codigo", type=int)
+    for sub in tipos.choices.values():
+        sub.add_argument("--totais", action="store_true", help="só quantidade e valor total (agregados)")
+    faturamento.set_defaults(executar=comando_faturamento)
+
+    historico = comandos.add_parser("historico", parents=[saida], help="consultas de um paciente")
+    historico.add_argument("cod_paciente", type=int)
+    historico.set_defaults(executar=comando_historico)
+
+    comandos.add_parser("ordenado", parents=[saida], help="todas as consultas por código (item 7)").set_defaults(
+        executar=comando_ordenado)
+    comandos.add_parser("compactar", parents=[saida], help="remove os registros excluídos de todas as tabelas").set_defaults(
+        executar=comando_compactar)
+    return parser
+
+def main(argv=None):
+    """Retorna 0 em caso de sucesso, 1 se a operação falhou."""
+    argumentos = criar_parser().parse_args(argv)
+    if argumentos.perfil:
+        perfil_mod.configurar(argumentos.perfil)
+
+    saida = open(argumentos.saida, "w", encoding="utf-8", newline="") if argumentos.saida else sys.stdout
+    try:
+        # Mensagens SUCESSO/ERRO/AVISO dos DAOs vão para stderr: a saída padrão fica só com os dados
+        with redirect_stdout(sys.stderr):
+            clinica = Clinica()
+            try:
+                sucesso = argumentos.executar(clinica, argumentos, saida)
+            finally:
+                clinica.fechar()
+    finally:
+        if saida is not sys.stdout:
+            saida.close()
+    return 0 if sucesso else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,18 @@
+from Classes.Clinica import Clinica
+
+def main():
+    """
+    Ferramenta de compactação: reescreve todas as tabelas sem os registros
+    excluídos logicamente e reconstrói os índices.
+    """
+    print("Compactando as tabelas do Sistema de Gestão Clínica...")
+
+    clinica = Clinica()
+    relatorios = clinica.compactar()
+    clinica.fechar()
+
+    total = sum(r["bytes_recuperados"] for r in relatorios)
+    print(f"Compactação concluída. Total recuperado: {total} bytes.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import sys
+
+from Classes.Clinica import Clinica
+from Classes.ImportadorLote import ImportadorLote
+
+def main():
+    """
+    Importação em massa: python importar.py <entidade> <arquivo> [<entidade> <arquivo> ...]
+    Entidades: cidades, especialidades, pacientes, medicos, exames, consultas.
+    Arquivos .csv (com cabeçalho com os nomes dos campos) ou .jsonl (um objeto por linha).
+    Importe na ordem das dependências (cidades e especialidades antes de pacientes e médicos).
+    """
+    argumentos = sys.argv[1:]
+    if not argumentos or len(argumentos) % 2:
+        print(main.__doc__)
+        return
+
+    clinica = Clinica()
+    importador = ImportadorLote(clinica)
+    try:
+        for entidade, caminho in zip(argumentos[::2], argumentos[1::2]):
+            print(f"Importando {caminho} em {entidade}...")
+            if importador.importar(entidade, caminho)["interrompido"] is not None:
+                break # As entidades seguintes dependem desta
+    finally:
+        clinica.fechar()
+
+if __name__ == "__main__":
+    main()
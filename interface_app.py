@@ -1,48 +1,59 @@
+import os
+import queue
+import tempfile
+import threading
+import time
+
 import customtkinter as ctk
 from tkinter import messagebox, simpledialog 
 from datetime import datetime
 
 # Importações dos módulos (DAOs)
-import Classes.Cidade as cid_mod
-import Classes.Especialidades as esp_mod
-import Classes.Pacientes as pac_mod
-import Classes.Medicos as med_mod
-import Classes.Exames as exa_mod
-import Classes.Consultas as con_mod 
-import Classes.Diarias as dia_mod 
+import Classes.Clinica as clinica_mod
+import ArvoreBinaria.perfil as perfil_mod
+from Classes.MotorRelatorios import RelatorioCancelado
 
 class ClinicaApp(ctk.CTk):
     """Classe principal da aplicação com interface gráfica (GUI)."""
+
+    # Relatórios rodam numa thread de trabalho; a GUI lê a fila de mensagens a cada INTERVALO_FILA_MS
+    INTERVALO_FILA_MS = 50
+    # Exibição incremental: a thread envia o texto em lotes de até LINHAS_POR_LOTE consultas
+    # (ou o que tiver a cada INTERVALO_LOTE segundos) e a GUI desenha até LOTES_POR_CICLO por vez
+    LINHAS_POR_LOTE = 500
+    INTERVALO_LOTE = 0.1
+    LOTES_POR_CICLO = 4
+    # Fila limitada: se a GUI fica para trás, a thread espera em vez de acumular o relatório em memória
+    MAXIMO_MENSAGENS_FILA = 16
+    # A caixa de texto mostra uma página por vez; o texto formatado fica num arquivo temporário
+    CONSULTAS_POR_PAGINA = 2000
     
     def __init__(self):
+        self._inicio = time.perf_counter()
         super().__init__()
         self.title("Sistema de Gestão Clínica - Arquivos Indexados")
         self.geometry("900x650") 
 
         # --- CRIAÇÃO CENTRALIZADA DE INSTÂNCIAS (INJEÇÃO DE DEPENDÊNCIA) ---
-        
-        # 1. Classes Raiz
-        self.cidades_db = cid_mod.Cidades()
-        self.especialidades_db = esp_mod.Especialidades()
-        self.diarias_db = dia_mod.Diarias() 
-
-        # 2. Classes Dependentes (Resolvendo a ordem de dependência)
-        
-        self.pacientes_db = pac_mod.Pacientes(cidades_manager=self.cidades_db)
-        self.exames_db = exa_mod.Exames(especialidades_manager=self.especialidades_db)
-        self.medicos_db = med_mod.Medicos(
-            cidades_manager=self.cidades_db,
-            especialidades_manager=self.especialidades_db
-        )
-        
-        # Consultas (Depende de TODOS)
-        self.consultas_db = con_mod.Consultas(
-            pacientes_manager=self.pacientes_db,
-            medicos_manager=self.medicos_db,
-            exames_manager=self.exames_db,
-            diarias_manager=self.diarias_db,
-            especialidades_manager=self.especialidades_db
-        )
+        # Os DAOs não carregam os índices ao serem criados: a janela aparece antes da indexação
+        self.clinica = clinica_mod.Clinica()
+
+        self.cidades_db = self.clinica.cidades_db
+        self.especialidades_db = self.clinica.especialidades_db
+        self.diarias_db = self.clinica.diarias_db
+        self.pacientes_db = self.clinica.pacientes_db
+        self.exames_db = self.clinica.exames_db
+        self.medicos_db = self.clinica.medicos_db
+        self.consultas_db = self.clinica.consultas_db
+
+        # Relatório em segundo plano: a thread só publica na fila do relatório; os widgets são
+        # atualizados via after(). Cada relatório tem a sua fila e o seu evento de cancelamento.
+        self._thread_relatorio = None
+        self._relatorio_atual = None
+
+        self._fila_indexacao = queue.Queue()
+        self.status_label = ctk.CTkLabel(self, text="", anchor="w")
+        self.status_label.pack(side="bottom", fill="x", padx=20, pady=(0, 5))
 
         # --- Criação do Notebook (Abas) ---
         self.notebook = ctk.CTkTabview(self, width=880, height=580)
@@ -55,6 +66,66 @@ class ClinicaApp(ctk.CTk):
         self._setup_cadastro_tab() 
         self._setup_relatorios_tab()
 
+        # Ao fechar a janela, persiste os índices (.idx) alterados durante a sessão
+        self.protocol("WM_DELETE_WINDOW", self._ao_fechar)
+
+        self.after(0, self._janela_exibida)
+        self._iniciar_indexacao()
+
+    def _janela_exibida(self):
+        print(f"Janela exibida em {time.perf_counter() - self._inicio:.3f} s.")
+
+    # --- INDEXAÇÃO EM SEGUNDO PLANO ---
+
+    def _iniciar_indexacao(self):
+        """
+        Carrega os índices numa thread, das tabelas menores para as maiores. Uma operação
+        que precise de um índice ainda não carregado espera só por ele (ou o carrega).
+        """
+        daos = sorted(self.clinica.daos(), key=lambda dao: dao.gerenciador_arquivo.tamanho_arquivo())
+        self.status_label.configure(text="Indexando…")
+        threading.Thread(target=self._indexar, args=(daos,), name="indexacao", daemon=True).start()
+        self.after(self.INTERVALO_FILA_MS, self._verificar_fila_indexacao)
+
+    def _indexar(self, daos):
+        fila = self._fila_indexacao
+        try:
+            for dao in daos:
+                fila.put(("indexando", dao.nome_entidade))
+                dao.garantir_indice()
+            fila.put(("concluido", time.perf_counter() - self._inicio))
+        except Exception as e:
+            fila.put(("erro", e))
+
+    def _verificar_fila_indexacao(self):
+        try:
+            while True:
+                tipo, conteudo = self._fila_indexacao.get_nowait()
+                if tipo == "indexando":
+                    self.status_label.configure(text=f"Indexando… ({conteudo})")
+                elif tipo == "concluido":
+                    print(f"Índices carregados em {conteudo:.3f} s.")
+                    self.status_label.configure(text=f"Índices carregados em {conteudo:.1f} s.")
+                    return
+                else:
+                    self.status_label.configure(text=f"Erro na indexação: {conteudo}")
+                    return
+        except queue.Empty:
+            pass
+        self.after(self.INTERVALO_FILA_MS, self._verificar_fila_indexacao)
+
+    def _ao_fechar(self):
+        """Grava os índices de todas as tabelas antes de destruir a janela."""
+        atual = self._relatorio_atual
+        if self._relatorio_em_execucao():
+            atual["cancelar"].set()
+            atual["encerrado"] = True # A thread não espera mais a GUI consumir a fila
+            self._thread_relatorio.join(timeout=5)
+        if atual is not None:
+            self._remover_paginas(atual)
+        self.clinica.fechar()
+        self.destroy()
+
    
     def _setup_cadastro_tab(self):
         """Configura a interface de inclusão de dados."""
@@ -361,6 +432,10 @@ class ClinicaApp(ctk.CTk):
         report_frame_row2 = ctk.CTkFrame(frame, fg_color="transparent")
         report_frame_row2.pack(pady=5)
 
+        # Modo resumo: responde os totais pelos agregados, sem ler Consultas.txt
+        self.somente_totais_var = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(frame, text="Somente totais (agregados pré-calculados)", variable=self.somente_totais_var).pack(pady=5)
+
         # Linha 1: Faturamento (Dia, Período, Médico)
         ctk.CTkButton(report_frame_row1, text="6.1 Faturamento por Dia", command=lambda: self._executar_relatorio_faturamento("dia")).pack(side="left", padx=5)
         ctk.CTkButton(report_frame_row1, text="6.2 Faturamento por Período", command=lambda: self._executar_relatorio_faturamento("periodo")).pack(side="left", padx=5) 
@@ -368,8 +443,33 @@ class ClinicaApp(ctk.CTk):
         
         # Linha 2: Faturamento (Especialidade) e Relatório Completo
         ctk.CTkButton(report_frame_row2, text="6.4 Faturamento por Especialidade", command=lambda: self._executar_relatorio_faturamento("especialidade")).pack(side="left", padx=5)
+        ctk.CTkButton(report_frame_row2, text="Histórico do Paciente", command=lambda: self._executar_relatorio_faturamento("paciente")).pack(side="left", padx=5)
         ctk.CTkButton(report_frame_row2, text="7. RELATÓRIO ORDENADO (ITEM 7)", command=self._executar_relatorio_ordenado).pack(side="left", padx=5)
 
+        # Progresso do relatório em execução (registros lidos) e cancelamento
+        progresso_frame = ctk.CTkFrame(frame, fg_color="transparent")
+        progresso_frame.pack(pady=5)
+        self.barra_progresso = ctk.CTkProgressBar(progresso_frame, width=400)
+        self.barra_progresso.set(0)
+        self.barra_progresso.pack(side="left", padx=5)
+        self.progresso_label = ctk.CTkLabel(progresso_frame, text="", width=220)
+        self.progresso_label.pack(side="left", padx=5)
+        self.botao_cancelar = ctk.CTkButton(progresso_frame, text="Cancelar Relatório", command=self._cancelar_relatorio_gui,
+                                            fg_color="gray", hover_color="#555555", state="disabled")
+        self.botao_cancelar.pack(side="left", padx=5)
+
+        # Páginas do relatório (CONSULTAS_POR_PAGINA consultas por página)
+        paginacao_frame = ctk.CTkFrame(frame, fg_color="transparent")
+        paginacao_frame.pack(pady=5)
+        self.botao_pagina_anterior = ctk.CTkButton(paginacao_frame, text="< Página Anterior", width=140, state="disabled",
+                                                   command=lambda: self._mudar_pagina(-1))
+        self.botao_pagina_anterior.pack(side="left", padx=5)
+        self.pagina_label = ctk.CTkLabel(paginacao_frame, text="", width=220)
+        self.pagina_label.pack(side="left", padx=5)
+        self.botao_pagina_seguinte = ctk.CTkButton(paginacao_frame, text="Próxima Página >", width=140, state="disabled",
+                                                   command=lambda: self._mudar_pagina(1))
+        self.botao_pagina_seguinte.pack(side="left", padx=5)
+
     def _limpar_area_consulta(self):
         """Limpa o campo de entrada e o resultado da consulta rápida."""
         self.consulta_entry.delete(0, 'end')
@@ -410,39 +510,54 @@ class ClinicaApp(ctk.CTk):
         except ValueError:
             messagebox.showerror("Erro de Input", "Código da consulta deve ser um número inteiro.")
 
-    def _display_report_details(self, lista_consultas, titulo, filtro_valor=None):
-        """Método auxiliar para formatar e exibir os detalhes dos relatórios na GUI."""
-        valor_total_geral = sum(c.get('valor_total_a_pagar', 0.0) for c in lista_consultas)
-        
+    # --- FORMATAÇÃO DOS RELATÓRIOS (usada linha a linha pela thread de trabalho) ---
+
+    SEPARADOR = "="*80 + "\n"
+    SEPARADOR_LINHA = "-"*80 + "\n"
+
+    def _cabecalho_detalhes(self, titulo, filtro_valor=None):
+        partes = ["\n", self.SEPARADOR, f"RELATÓRIO: {titulo}\n", self.SEPARADOR]
+        if filtro_valor:
+            partes += [f"Filtro: {filtro_valor}\n", self.SEPARADOR_LINHA]
+        return "".join(partes)
+
+    def _formatar_detalhe(self, c):
+        return (f"Cód: {c['codigo']} ({c.get('data', 'N/A')}) | Paciente: {c['nome_paciente']}\n"
+                f"  > Médico: {c['nome_medico']} | Valor: R$ {c['valor_total_a_pagar']:.2f}\n"
+                + self.SEPARADOR_LINHA)
+
+    def _rodape_detalhes(self, resumo):
+        partes = []
+        if not resumo["quantidade"]:
+            partes.append("Nenhum registro encontrado para este filtro.\n")
+        partes += ["\n", self.SEPARADOR, f"VALOR TOTAL: R$ {resumo['valor_total']:.2f}\n"]
+        return "".join(partes)
+
+    def _display_report_totais(self, totais, titulo, filtro_valor=None):
+        """Exibe o resultado do modo 'somente totais' (quantidade e valor dos agregados)."""
         output = "\n" + "="*80 + "\n"
-        output += f"RELATÓRIO: {titulo}\n"
+        output += f"RELATÓRIO (TOTAIS): {titulo}\n"
         output += "="*80 + "\n"
-
         if filtro_valor:
             output += f"Filtro: {filtro_valor}\n"
             output += "-"*80 + "\n"
+        output += f"QUANTIDADE DE CONSULTAS: {totais['quantidade']}\n"
+        output += f"VALOR TOTAL: R$ {totais['valor_total']:.2f}\n"
 
-        if not lista_consultas:
-            output += "Nenhum registro encontrado para este filtro.\n"
-        else:
-            for c in lista_consultas:
-                output += f"Cód: {c['codigo']} ({c.get('data', 'N/A')}) | Paciente: {c['nome_paciente']}\n"
-                output += f"  > Médico: {c['nome_medico']} | Valor: R$ {c['valor_total_a_pagar']:.2f}\n"
-                output += "-"*80 + "\n"
-            
-        output += "\n" + "="*80 + "\n"
-        output += f"VALOR TOTAL: R$ {valor_total_geral:.2f}\n"
-
-        self.resultado_label.delete("1.0", "end") 
+        self.resultado_label.delete("1.0", "end")
         self.resultado_label.insert("1.0", output)
-        
-        return valor_total_geral
+        return totais['valor_total']
 
     def _executar_relatorio_faturamento(self, tipo):
         
+        if self._relatorio_em_execucao():
+            messagebox.showwarning("Relatório em Andamento", "Aguarde o relatório atual terminar ou cancele-o.")
+            return
+
         try:
-            reports = []
+            totais = linhas = None # Consulta aos agregados (modo somente totais) / gerador das linhas
             filtro = ""
+            somente_totais = self.somente_totais_var.get()
             
             if tipo == "dia":
                 data_raw = ctk.CTkInputDialog(text="Digite a DATA (AAAAMMDD, ex: 20251130):", title="Faturamento por Dia").get_input()
@@ -455,7 +570,8 @@ class ClinicaApp(ctk.CTk):
                     messagebox.showerror("Erro de Formato", "A data deve conter 8 dígitos numéricos (AAAAMMDD).")
                     return
                 
-                reports = self.consultas_db.faturamento_por_dia(data)
+                totais = lambda: self.consultas_db.faturamento_por_dia(data, somente_totais=True)
+                linhas = lambda progresso, cancelar: self.consultas_db.iterar_faturamento_por_dia(data, progresso, cancelar)
                 titulo = "Faturamento por Dia"; filtro = f"Data: {data}"
             
             elif tipo == "periodo":
@@ -472,24 +588,48 @@ class ClinicaApp(ctk.CTk):
                     messagebox.showerror("Erro de Formato", "Ambas as datas devem conter 8 dígitos numéricos (AAAAMMDD).")
                     return
 
-                reports = self.consultas_db.faturamento_por_periodo(data_inicial, data_final)
+                totais = lambda: self.consultas_db.faturamento_por_periodo(data_inicial, data_final, somente_totais=True)
+                linhas = lambda progresso, cancelar: self.consultas_db.iterar_faturamento_por_periodo(
+                    data_inicial, data_final, progresso, cancelar)
                 titulo = "Faturamento por Período"; filtro = f"Período: {data_inicial} a {data_final}"
                         
             elif tipo == "medico":
                 cod_str = ctk.CTkInputDialog(text="Digite o CÓDIGO do Médico:", title="Faturamento por Médico").get_input()
                 if not cod_str or not cod_str.isdigit(): return
-                reports = self.consultas_db.faturamento_por_medico(int(cod_str))
+                totais = lambda: self.consultas_db.faturamento_por_medico(int(cod_str), somente_totais=True)
+                linhas = lambda progresso, cancelar: self.consultas_db.iterar_faturamento_por_medico(int(cod_str), progresso, cancelar)
                 titulo = "Faturamento por Médico"; filtro = f"Código: {cod_str}"
             
             elif tipo == "especialidade":
                 cod_esp_str = ctk.CTkInputDialog(text="Digite o CÓDIGO da Especialidade:", title="Faturamento por Especialidade").get_input()
                 if not cod_esp_str or not cod_esp_str.isdigit(): return
-                reports = self.consultas_db.faturamento_por_especialidade(int(cod_esp_str))
+                totais = lambda: self.consultas_db.faturamento_por_especialidade(int(cod_esp_str), somente_totais=True)
+                linhas = lambda progresso, cancelar: self.consultas_db.iterar_faturamento_por_especialidade(
+                    int(cod_esp_str), progresso, cancelar)
                 titulo = "Faturamento por Especialidade"; filtro = f"Código: {cod_esp_str}"
+
+            elif tipo == "paciente":
+                cod_pac_str = ctk.CTkInputDialog(text="Digite o CÓDIGO do Paciente:", title="Histórico do Paciente").get_input()
+                if not cod_pac_str or not cod_pac_str.isdigit(): return
+                linhas = lambda progresso, cancelar: self.consultas_db.iterar_historico_paciente(
+                    int(cod_pac_str), progresso, cancelar)
+                titulo = "Histórico do Paciente"; filtro = f"Código: {cod_pac_str}"
             
-            # Exibe o resultado na área de texto da GUI
-            if reports is not None:
-                self._display_report_details(reports, titulo, filtro)
+            if linhas is None:
+                return
+
+            if somente_totais and totais is not None:
+                self._iniciar_relatorio(
+                    titulo, lambda progresso, cancelar: totais(),
+                    exibir_totais=lambda resultado: self._display_report_totais(resultado, titulo, filtro),
+                )
+            else:
+                self._iniciar_relatorio(
+                    titulo, linhas,
+                    cabecalho=self._cabecalho_detalhes(titulo, filtro),
+                    formatar=self._formatar_detalhe,
+                    rodape=self._rodape_detalhes,
+                )
 
         except ValueError as e:
             messagebox.showerror("Erro de Input", f"Código ou Data inválida. Detalhes: {e}")
@@ -497,37 +637,269 @@ class ClinicaApp(ctk.CTk):
             messagebox.showerror("Erro de Processamento", f"Ocorreu um erro na lógica de faturamento. Detalhes: {e}")
 
     def _executar_relatorio_ordenado(self):
-        """Executa o relatório ordenado e exibe o resultado (Item 7)."""
+        """Executa o relatório ordenado em segundo plano, exibindo as linhas conforme chegam (Item 7)."""
+        if self._relatorio_em_execucao():
+            messagebox.showwarning("Relatório em Andamento", "Aguarde o relatório atual terminar ou cancele-o.")
+            return
+        self._iniciar_relatorio(
+            "Relatório Ordenado (Item 7)",
+            lambda progresso, cancelar: self.consultas_db.iterar_relatorio_ordenado(progresso, cancelar),
+            cabecalho="".join(["\n", self.SEPARADOR, "RELATÓRIO DE CONSULTAS ORDENADO POR CÓDIGO (ITEM 7)\n", self.SEPARADOR]),
+            formatar=self._formatar_ordenado,
+            rodape=self._rodape_ordenado,
+            ao_concluir=lambda resumo: messagebox.showinfo(
+                "Relatório Concluído", f"Valor Total Geral a Pagar: R$ {resumo['valor_total']:.2f}. Detalhes na tela."),
+        )
+
+    def _formatar_ordenado(self, c):
+        return (f"Cód: {c['codigo']} | Paciente: {c['nome_paciente']} (IMC: {c['imc']} - {c['diagnostico_imc']})\n"
+                f"  > Médico: {c['nome_medico']} | Exame: {c['desc_exame']} | Valor: R$ {c['valor_total_a_pagar']:.2f}\n"
+                + self.SEPARADOR_LINHA)
+
+    def _rodape_ordenado(self, resumo):
+        return "".join([
+            "\n", self.SEPARADOR,
+            f"QUANTIDADE TOTAL DE REGISTROS: {resumo['quantidade']}\n",
+            f"QUANTIDADE TOTAL DE PACIENTES ATENDIDOS: {len(resumo['pacientes'])}\n",
+            f"VALOR TOTAL GERAL A SER PAGO: R$ {resumo['valor_total']:.2f}\n",
+        ])
+
+    # --- EXECUÇÃO DOS RELATÓRIOS EM SEGUNDO PLANO ---
+
+    def _relatorio_em_execucao(self):
+        # Até a GUI consumir a mensagem final: a thread pode terminar com linhas ainda na fila
+        return self._relatorio_atual is not None and not self._relatorio_atual["encerrado"]
+
+    def _iniciar_relatorio(self, titulo, gerar, cabecalho="", formatar=None, rodape=None,
+                           ao_concluir=None, exibir_totais=None):
+        """
+        Executa gerar(progresso, cancelar) numa thread de trabalho, fora do mainloop do Tk.
+        gerar retorna um dict de totais (exibido por exibir_totais) ou um gerador de consultas:
+        a thread formata as linhas com formatar(consulta), grava o texto num arquivo temporário
+        e publica a primeira página em lotes, que a GUI acrescenta à caixa de texto conforme
+        chegam (via after()); as demais páginas são lidas do arquivo pelos botões de página.
+        No fim, rodape(resumo) (na última página) e ao_concluir(resumo), com
+        resumo = {"quantidade", "valor_total", "pacientes"}.
+        """
+        if self._relatorio_atual is not None:
+            self._remover_paginas(self._relatorio_atual)
+        descritor, arquivo = tempfile.mkstemp(prefix="relatorio-", suffix=".txt")
+        os.close(descritor)
+        relatorio = {
+            "rodape": rodape, "ao_concluir": ao_concluir, "exibir_totais": exibir_totais,
+            "fila": queue.Queue(maxsize=self.MAXIMO_MENSAGENS_FILA), "cancelar": threading.Event(),
+            "encerrado": False, "cabecalho": cabecalho, "arquivo": arquivo,
+            "paginas": [0],      # Posição (em bytes) do início de cada página no arquivo
+            "pagina": 0, "texto_final": "",
+        }
+        self._relatorio_atual = relatorio
+
         self.resultado_label.delete("1.0", "end")
-        self.resultado_label.insert("1.0", "Gerando Relatório Ordenado (Item 7). Aguarde o processamento...")
-        
+        self.resultado_label.insert("1.0", cabecalho)
+        self._atualizar_paginacao(relatorio)
+        self.barra_progresso.configure(mode="indeterminate")
+        self.barra_progresso.start()
+        self._progresso_determinado = False
+        self.progresso_label.configure(text=f"Gerando {titulo}...")
+        self.botao_cancelar.configure(state="normal")
+
+        self._thread_relatorio = threading.Thread(
+            target=self._trabalhar_relatorio, args=(gerar, formatar, relatorio), name="relatorio", daemon=True,
+        )
+        self._thread_relatorio.start()
+        self.after(self.INTERVALO_FILA_MS, self._verificar_fila_relatorio, relatorio)
+
+    @staticmethod
+    def _publicar(relatorio, mensagem, lidos=0):
+        """Põe a mensagem na fila limitada, esperando a GUI consumir; levanta RelatorioCancelado se cancelado."""
+        while True:
+            try:
+                relatorio["fila"].put(mensagem, timeout=0.1)
+                return
+            except queue.Full:
+                if relatorio["cancelar"].is_set():
+                    raise RelatorioCancelado(lidos)
+
+    @staticmethod
+    def _publicar_final(relatorio, mensagem):
+        # A mensagem final sempre é entregue, a menos que a GUI tenha desistido (janela fechada)
+        while not relatorio["encerrado"]:
+            try:
+                relatorio["fila"].put(mensagem, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    @perfil_mod.perfilado
+    def _trabalhar_relatorio(self, gerar, formatar, relatorio):
+        """Corpo da thread de trabalho: não toca nos widgets (Tk não é thread-safe)."""
+        fila = relatorio["fila"]
+
+        def progresso(lidos, total):
+            try:
+                fila.put_nowait(("progresso", lidos, total))
+            except queue.Full:
+                pass # Progresso é descartável: a próxima atualização substitui esta
+
         try:
-            lista_consultas = self.consultas_db.relatorio_ordenado()
-            
-            valor_total_geral = sum(c['valor_total_a_pagar'] for c in lista_consultas)
-            total_pacientes_atendidos = len(set(c['cod_paciente'] for c in lista_consultas))
-            
-            output = "\n" + "="*80 + "\n"
-            output += "RELATÓRIO DE CONSULTAS ORDENADO POR CÓDIGO (ITEM 7)\n"
-            output += "="*80 + "\n"
-            
-            for c in lista_consultas:
-                output += f"Cód: {c['codigo']} | Paciente: {c['nome_paciente']} (IMC: {c['imc']} - {c['diagnostico_imc']})\n"
-                output += f"  > Médico: {c['nome_medico']} | Exame: {c['desc_exame']} | Valor: R$ {c['valor_total_a_pagar']:.2f}\n"
-                output += "-"*80 + "\n"
-                
-            output += "\n" + "="*80 + "\n"
-            output += f"QUANTIDADE TOTAL DE REGISTROS: {len(lista_consultas)}\n"
-            output += f"QUANTIDADE TOTAL DE PACIENTES ATENDIDOS: {total_pacientes_atendidos}\n"
-            output += f"VALOR TOTAL GERAL A SER PAGO: R$ {valor_total_geral:.2f}\n"
-            
-            self.resultado_label.delete("1.0", "end") 
-            self.resultado_label.insert("1.0", output)
-            messagebox.showinfo("Relatório Concluído", f"Valor Total Geral a Pagar: R$ {valor_total_geral:.2f}. Detalhes na tela.")
-            
+            resultado = gerar(progresso, relatorio["cancelar"])
+            if isinstance(resultado, dict):
+                self._publicar_final(relatorio, ("totais", resultado))
+                return
+
+            resumo = {"quantidade": 0, "valor_total": 0.0, "pacientes": set()}
+            lote = []
+            ultimo_envio = time.monotonic()
+            with open(relatorio["arquivo"], "wb") as paginas:
+                for consulta in resultado:
+                    resumo["quantidade"] += 1
+                    resumo["valor_total"] += consulta.get("valor_total_a_pagar", 0.0)
+                    resumo["pacientes"].add(consulta.get("cod_paciente"))
+                    texto = formatar(consulta)
+                    paginas.write(texto.encode("utf-8"))
+                    if resumo["quantidade"] <= self.CONSULTAS_POR_PAGINA:
+                        # Só a primeira página vai para a tela enquanto o relatório roda
+                        lote.append(texto)
+                        # Lotes pequenos no início (as primeiras linhas aparecem já), maiores depois
+                        if len(lote) >= self.LINHAS_POR_LOTE or time.monotonic() - ultimo_envio >= self.INTERVALO_LOTE:
+                            self._publicar(relatorio, ("linhas", "".join(lote)), resumo["quantidade"])
+                            lote = []
+                            ultimo_envio = time.monotonic()
+                    if resumo["quantidade"] % self.CONSULTAS_POR_PAGINA == 0:
+                        if lote:
+                            self._publicar(relatorio, ("linhas", "".join(lote)), resumo["quantidade"])
+                            lote = []
+                        paginas.flush()
+                        self._publicar(relatorio, ("pagina", paginas.tell()), resumo["quantidade"])
+                if lote:
+                    self._publicar(relatorio, ("linhas", "".join(lote)), resumo["quantidade"])
+                if resumo["quantidade"] % self.CONSULTAS_POR_PAGINA:
+                    paginas.flush()
+                    self._publicar(relatorio, ("pagina", paginas.tell()), resumo["quantidade"])
+            resumo["valor_total"] = round(resumo["valor_total"], 2)
+            self._publicar_final(relatorio, ("concluido", resumo))
+        except RelatorioCancelado as e:
+            self._publicar_final(relatorio, ("cancelado", e.lidos))
         except Exception as e:
-             messagebox.showerror("Erro", f"Erro ao gerar relatório ordenado: {e}")
-             self.resultado_label.insert("end", f"\nERRO: {e}")
+            self._publicar_final(relatorio, ("erro", e))
+
+    def _verificar_fila_relatorio(self, relatorio):
+        """
+        Consome as mensagens da thread de trabalho e reagenda-se até o relatório terminar.
+        No máximo LOTES_POR_CICLO lotes de texto por chamada: o Tk continua respondendo
+        (rolagem, botão Cancelar) enquanto um relatório grande é desenhado.
+        """
+        if relatorio is not self._relatorio_atual:
+            return # Relatório substituído: a fila dele não é mais desenhada
+        lotes = 0
+        try:
+            while lotes < self.LOTES_POR_CICLO:
+                mensagem = relatorio["fila"].get_nowait()
+                tipo = mensagem[0]
+                if tipo == "progresso":
+                    self._exibir_progresso(*mensagem[1:])
+                    continue
+                if tipo == "linhas":
+                    self.resultado_label.insert("end", mensagem[1])
+                    lotes += 1
+                    continue
+                if tipo == "pagina":
+                    relatorio["paginas"].append(mensagem[1])
+                    self._atualizar_paginacao(relatorio)
+                    continue
+                self._concluir_relatorio(relatorio, tipo, mensagem[1])
+                return
+        except queue.Empty:
+            pass
+        self.after(1 if lotes else self.INTERVALO_FILA_MS, self._verificar_fila_relatorio, relatorio)
+
+    def _concluir_relatorio(self, atual, tipo, conteudo):
+        atual["encerrado"] = True
+        self._encerrar_progresso()
+        if tipo == "totais":
+            atual["exibir_totais"](conteudo)
+        elif tipo == "concluido":
+            if atual["rodape"] is not None:
+                atual["texto_final"] = atual["rodape"](conteudo)
+            if atual["ao_concluir"] is not None:
+                atual["ao_concluir"](conteudo)
+        elif tipo == "cancelado":
+            atual["texto_final"] = f"\nRelatório cancelado após {conteudo} registros lidos.\n"
+        else:
+            messagebox.showerror("Erro de Processamento", f"Ocorreu um erro ao gerar o relatório. Detalhes: {conteudo}")
+        if atual["texto_final"] and (tipo == "cancelado" or atual["pagina"] == self._total_paginas(atual) - 1):
+            self.resultado_label.insert("end", atual["texto_final"])
+        self._atualizar_paginacao(atual)
+
+    # --- PÁGINAS DO RELATÓRIO ---
+
+    @staticmethod
+    def _total_paginas(relatorio):
+        return max(len(relatorio["paginas"]) - 1, 1)
+
+    def _atualizar_paginacao(self, relatorio):
+        pagina, total = relatorio["pagina"], self._total_paginas(relatorio)
+        em_execucao = not relatorio["encerrado"]
+        self.pagina_label.configure(text=f"Página {pagina + 1} de {total}{'+' if em_execucao else ''}")
+        # Só as páginas já completas no arquivo podem ser abertas
+        self.botao_pagina_anterior.configure(state="normal" if pagina > 0 else "disabled")
+        self.botao_pagina_seguinte.configure(state="normal" if pagina + 2 < len(relatorio["paginas"]) else "disabled")
+
+    def _mudar_pagina(self, deslocamento):
+        relatorio = self._relatorio_atual
+        if relatorio is None:
+            return
+        pagina = relatorio["pagina"] + deslocamento
+        if not 0 <= pagina < len(relatorio["paginas"]) - 1:
+            return
+        inicio, fim = relatorio["paginas"][pagina], relatorio["paginas"][pagina + 1]
+        try:
+            with open(relatorio["arquivo"], "rb") as f:
+                f.seek(inicio)
+                texto = f.read(fim - inicio).decode("utf-8")
+        except OSError as e:
+            messagebox.showerror("Erro", f"Não foi possível ler a página do relatório. Detalhes: {e}")
+            return
+
+        relatorio["pagina"] = pagina
+        self.resultado_label.delete("1.0", "end")
+        self.resultado_label.insert("1.0", relatorio["cabecalho"])
+        self.resultado_label.insert("end", texto)
+        if relatorio["encerrado"] and pagina == self._total_paginas(relatorio) - 1:
+            self.resultado_label.insert("end", relatorio["texto_final"])
+        self._atualizar_paginacao(relatorio)
+
+    @staticmethod
+    def _remover_paginas(relatorio):
+        try:
+            os.remove(relatorio["arquivo"])
+        except OSError:
+            pass
+
+    def _exibir_progresso(self, lidos, total):
+        if total:
+            if not self._progresso_determinado:
+                # Total conhecido (ex: relatório ordenado): sai do modo "animado"
+                self.barra_progresso.stop()
+                self.barra_progresso.configure(mode="determinate")
+                self._progresso_determinado = True
+            self.barra_progresso.set(min(lidos / total, 1.0))
+            self.progresso_label.configure(text=f"{lidos} de {total} registros lidos")
+        else:
+            self.progresso_label.configure(text=f"{lidos} registros lidos")
+
+    def _encerrar_progresso(self):
+        self.barra_progresso.stop()
+        self.barra_progresso.configure(mode="determinate")
+        self.barra_progresso.set(0)
+        self.progresso_label.configure(text="")
+        self.botao_cancelar.configure(state="disabled")
+
+    def _cancelar_relatorio_gui(self):
+        """O motor confere o evento a cada registro lido e interrompe a varredura."""
+        if self._relatorio_em_execucao():
+            self._relatorio_atual["cancelar"].set()
+            self.progresso_label.configure(text="Cancelando...")
 
 
 if __name__ == "__main__":
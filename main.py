@@ -1,20 +1,37 @@
+import argparse
+import sys
 
-from interface_app import ClinicaApp
+import ArvoreBinaria.perfil as perfil_mod
+import cli
 
 def main():
     """
     Função principal que inicia a aplicação GUI (CustomTkinter).
+    Com um comando do cli.py (ex: python main.py faturamento dia 20251130) roda sem interface.
     """
+    if len(sys.argv) > 1 and sys.argv[1] in cli.COMANDOS:
+        return cli.main(sys.argv[1:])
+
+    parser = argparse.ArgumentParser(description="Sistema de Gestão Clínica")
+    parser.add_argument("--perfil", nargs="?", const="pstats", choices=perfil_mod.MODOS,
+                        help="grava um perfil de cada relatório (pstats ou amostras); o mesmo que CLINICA_PERFIL")
+    parser.add_argument("--perfil-dir", help="diretório dos perfis (padrão: ./perfis); liga --perfil se ele faltar")
+    argumentos = parser.parse_args()
+    if argumentos.perfil or argumentos.perfil_dir:
+        perfil_mod.configurar(argumentos.perfil or "pstats", argumentos.perfil_dir)
+
     print("Iniciando o Sistema de Gestão Clínica (GUI)...")
-    
+    # Importada só aqui: o modo linha de comando não carrega customtkinter/tkinter
+    from interface_app import ClinicaApp
+
     # 1. Cria a instância da aplicação ClinicaApp
     app = ClinicaApp()
-    
+
     # 2. Inicia o loop principal da interface gráfica
     app.mainloop()
-    
+
     # Esta mensagem aparece no console assim que a janela da aplicação é fechada.
     print("Aplicação encerrada. Os dados foram salvos no disco.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,103 @@
+import os
+import random
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ArvoreBinaria.concorrencia import TravaLeituraEscrita
+from Classes.Clinica import Clinica
+from Classes.Consultas import Consultas
+
+ESCRITORES = 4
+LEITORES = 3
+OPERACOES = 300
+CODIGOS = 600
+
+
+@pytest.fixture
+def clinica(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # Compactação automática disparando durante o teste (poucos bytes mortos já bastam)
+    monkeypatch.setattr(Consultas, "LIMIAR_COMPACTACAO", 0.1)
+    monkeypatch.setattr(Consultas, "MINIMO_BYTES_COMPACTACAO", 256)
+
+    k = Clinica(politica_fsync='nunca')
+    k.cidades_db.incluir_cidade(1, 'Assis', 'SP')
+    k.especialidades_db.incluir_especialidade(1, 'Cardio', 100.0, 100000)
+    k.especialidades_db.incluir_especialidade(2, 'Orto', 80.0, 5)
+    k.pacientes_db.incluir_paciente(1, 'Ana', '20000101', 'R', '1', 1, 60, 170)
+    k.medicos_db.incluir_medico(1, 'Dr', 'R', '1', 1, 1)
+    k.medicos_db.incluir_medico(2, 'Dra', 'R', '1', 1, 2)
+    k.exames_db.incluir_exame(1, 'ECG', 1, 50.0)
+    yield k
+    k.fechar()
+
+
+def _executar(funcao, erros, *args):
+    try:
+        funcao(*args)
+    except Exception as e: # Qualquer exceção numa thread reprova o teste
+        erros.append(e)
+
+
+def test_operacoes_concorrentes_mantem_tabelas_consistentes(clinica):
+    consultas = clinica.consultas_db
+    erros = []
+
+    def escritor(numero):
+        aleatorio = random.Random(numero)
+        for i in range(OPERACOES):
+            codigo = aleatorio.randint(1, CODIGOS)
+            consultas.incluir_consulta(codigo, 1, 1 + codigo % 2, 1, f'202511{10 + codigo % 5}', '10:00')
+            if i % 3 == 0:
+                consultas.excluir_consulta(aleatorio.randint(1, CODIGOS))
+            if i % 40 == 0:
+                base = 10000 + numero * 1000 + i
+                consultas.incluir_consultas_lote([(base + j, 1, 1, 1, '20251111', '09:00') for j in range(5)])
+
+    def leitor(numero):
+        aleatorio = random.Random(100 + numero)
+        for i in range(OPERACOES):
+            consultas.buscar_por_chave(aleatorio.randint(1, CODIGOS))
+            consultas.consultar_consulta(aleatorio.randint(1, CODIGOS))
+            if i % 25 == 0:
+                anterior = 0
+                for linha in consultas.iterar_relatorio_ordenado():
+                    assert linha["codigo"] > anterior
+                    anterior = linha["codigo"]
+                consultas.faturamento_por_dia('20251111')
+
+    threads = [threading.Thread(target=_executar, args=(escritor, erros, n)) for n in range(ESCRITORES)]
+    threads += [threading.Thread(target=_executar, args=(leitor, erros, n)) for n in range(LEITORES)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert erros == []
+    for dao in clinica.daos():
+        assert dao.verificar_consistencia() == [], dao.nome_entidade
+
+    ativas = list(consultas.iterar_consultas())
+    contadores = sum(diaria["quantidade"] for diaria in clinica.diarias_db.iterar_diarias())
+    assert contadores == len(ativas)
+
+    totais = consultas.agregados.totais_periodo('20000101', '20991231')
+    assert totais["quantidade"] == len(ativas)
+    consultas.agregados.reconstruir()
+    assert consultas.agregados.totais_periodo('20000101', '20991231') == totais
+
+
+def test_promover_leitura_a_escrita_levanta_runtime_error():
+    trava = TravaLeituraEscrita()
+    with trava.leitura():
+        with pytest.raises(RuntimeError):
+            trava.adquirir_escrita()
+
+    # A tentativa recusada não deixa a trava presa
+    with trava.escrita():
+        with trava.leitura():
+            pass